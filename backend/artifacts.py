@@ -0,0 +1,215 @@
+"""
+Path index and cache validators for downloadable artifacts.
+
+/api/download and /api/preview used to probe the disk for up to five
+alternate extensions on every request and answered with a bare file, so
+the frontend or a CDN had to transfer the whole video again each time.
+
+An ArtifactIndex lists one directory once (at startup, and again at most
+every SCANNON_ARTIFACT_RESCAN_SECONDS when a name is not known), keeps
+filename -> path and stem -> filenames maps and resolves a request with a
+single stat of the indexed path. Each artifact gets a strong ETag built
+from that stat (size, mtime in nanoseconds and inode): finished artifacts
+are only ever replaced by a new file, which changes at least one of them,
+so nothing is read from the file before the first byte is sent.
+
+`artifact_response` answers If-None-Match / If-Modified-Since with 304 and
+otherwise returns a FileResponse carrying the ETag, Last-Modified and
+Cache-Control headers, which also serves Range and If-Range requests for
+video seeking. Finished artifacts are never rewritten under the same name,
+so they are cached as immutable. Files of running jobs get no-store and
+no validators at all, so a conditional request for them is never
+answered with 304.
+"""
+import os
+import stat
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+import metrics
+
+CACHE_CONTROL = os.getenv("SCANNON_ARTIFACT_CACHE_CONTROL", "public, max-age=31536000, immutable")
+RESCAN_SECONDS = float(os.getenv("SCANNON_ARTIFACT_RESCAN_SECONDS", "2"))
+
+MEDIA_TYPES = {
+    '.mp4': 'video/mp4',
+    '.avi': 'video/x-msvideo',
+    '.mov': 'video/quicktime',
+    '.webm': 'video/webm',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.zip': 'application/zip',
+}
+
+ARTIFACT_RESPONSES = metrics.Counter("scannon_artifact_responses_total",
+                                     "Download/preview responses by result (sent, not_modified)")
+metrics.REGISTRY.append(ARTIFACT_RESPONSES)
+
+
+def _file_key(stat_result: os.stat_result) -> tuple:
+    return (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino)
+
+
+class ArtifactIndex:
+    def __init__(self, directory: Path, fallback_extensions: Iterable[str] = ()):
+        """`fallback_extensions`: tried in order when the requested name is not found"""
+        self.directory = Path(directory)
+        self.fallback_extensions = tuple(fallback_extensions)
+        self._names: Dict[str, str] = {}  # filename -> path
+        self._stems: Dict[str, Set[str]] = {}  # stem -> filenames
+        self._lock = threading.Lock()
+        self._scanned_at = 0.0
+        self._rescans = 0
+        self.rescan()
+
+    def rescan(self):
+        names = {}
+        if self.directory.exists():
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file(follow_symlinks=False):
+                        names[entry.name] = os.path.abspath(entry.path)
+        stems: Dict[str, Set[str]] = {}
+        for name in names:
+            stems.setdefault(name.rsplit('.', 1)[0], set()).add(name)
+        with self._lock:
+            self._names, self._stems = names, stems
+            self._scanned_at = time.monotonic()
+            self._rescans += 1
+
+    def register(self, path):
+        """Add a file written by this process (saves a rescan on its first download)"""
+        path = os.path.abspath(path)
+        name = os.path.basename(path)
+        with self._lock:
+            self._names[name] = path
+            self._stems.setdefault(name.rsplit('.', 1)[0], set()).add(name)
+
+    def forget(self, name: str):
+        with self._lock:
+            self._names.pop(name, None)
+            stem = name.rsplit('.', 1)[0]
+            self._stems.get(stem, set()).discard(name)
+            if not self._stems.get(stem, True):
+                self._stems.pop(stem, None)
+
+    def _lookup(self, filename: str) -> Optional[str]:
+        with self._lock:
+            if filename in self._names:
+                return filename
+            candidates = self._stems.get(filename.rsplit('.', 1)[0], ())
+            for ext in self.fallback_extensions:
+                for name in candidates:
+                    if name.lower().endswith(ext):
+                        return name
+        return None
+
+    def _stat(self, name: str) -> Optional[Tuple[Path, os.stat_result]]:
+        path = self._names.get(name) or str(self.directory / name)
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            self.forget(name)
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+        return Path(path), stat_result
+
+    def resolve(self, filename: str) -> Optional[Tuple[Path, os.stat_result]]:
+        """Indexed path and stat of `filename` (or of its stem with a fallback extension)"""
+        if not filename or os.path.basename(filename) != filename or filename in ('.', '..'):
+            return None
+        name = self._lookup(filename)
+        if name is not None:
+            found = self._stat(name)
+            if found is not None:
+                return found
+        # Written by another worker process since the last scan
+        found = self._stat(filename)
+        if found is not None:
+            self.register(found[0])
+            return found
+        if time.monotonic() - self._scanned_at >= RESCAN_SECONDS:
+            self.rescan()
+            name = self._lookup(filename)
+            if name is not None:
+                return self._stat(name)
+        return None
+
+    @staticmethod
+    def etag(stat_result: os.stat_result) -> str:
+        """Strong ETag of one file version (size, mtime_ns and inode)"""
+        return '"%x-%x-%x"' % _file_key(stat_result)
+
+    def stats(self) -> dict:
+        return {
+            "directory": str(self.directory),
+            "files": len(self._names),
+            "rescans": self._rescans,
+        }
+
+
+class _MutableFileResponse(FileResponse):
+    """FileResponse without the validators Starlette derives from the stat"""
+
+    def set_stat_headers(self, stat_result: os.stat_result) -> None:
+        self.headers.setdefault("content-length", str(stat_result.st_size))
+
+    def _should_use_range(self, http_if_range: str) -> bool:
+        # No validator was sent, so If-Range can never match: send the whole file
+        return False
+
+
+def _not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison (RFC 9110 13.1.2)
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def artifact_response(request: Request, index: ArtifactIndex, path: Path, stat_result: os.stat_result,
+                            mutable: bool = False) -> Response:
+    """
+    Response for an artifact resolved by `index`. `mutable` files (still
+    being written) are sent with no-store and no validators, so they are
+    never answered with 304.
+    """
+    if mutable:
+        headers = {"Cache-Control": "no-store"}
+    else:
+        etag = index.etag(stat_result)
+        headers = {
+            "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "ETag": etag,
+            "Cache-Control": CACHE_CONTROL,
+        }
+        if request.method in ("GET", "HEAD") and _not_modified(request, etag, stat_result):
+            ARTIFACT_RESPONSES.inc(result="not_modified")
+            return Response(status_code=304, headers=headers)
+
+    ARTIFACT_RESPONSES.inc(result="sent")
+    response_class = _MutableFileResponse if mutable else FileResponse
+    return response_class(
+        path=str(path),
+        filename=path.name,
+        media_type=MEDIA_TYPES.get(path.suffix.lower(), 'application/octet-stream'),
+        headers=headers,
+        stat_result=stat_result,
+    )
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Offline batch redaction over a directory tree.
+
+Runs the SCANNON.AI pipeline directly (no HTTP) across a process pool. Every
+finished file is appended to a JSONL manifest in the output directory, so an
+interrupted run picks up where it stopped when started again with the same
+arguments.
+
+Usage (from the backend directory, or via `python manager.py redact <in> <out>`):
+    python batch_redact.py <input_dir> <output_dir> [--workers N] [--blur-type pixelate]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.webm', '.mkv', '.m4v'}
+MANIFEST_NAME = ".scannon_manifest.jsonl"
+
+_pipeline = None
+
+
+def _init_worker():
+    """Load the models once per worker process"""
+    global _pipeline
+    import main
+    _pipeline = main
+
+
+def _redact_file(source: str, destination: str, kind: str, options: dict) -> dict:
+    """Worker body: redact one file and return its manifest record (minus identity fields)"""
+    import asyncio
+
+    started = time.perf_counter()
+    Path(destination).parent.mkdir(parents=True, exist_ok=True)
+    record = {"status": "error", "frames": 0, "detections": {}}
+
+    try:
+        if kind == "image":
+            success, message, stats = _pipeline.process_image(source, destination, **options)
+            record.update(status="completed" if success else "error", frames=1 if success else 0,
+                          detections=stats, output=destination)
+            if not success:
+                record["error"] = message
+        else:
+            job_id = f"cli_{os.getpid()}_{time.time_ns()}"
+            # One-shot run: nothing would resume the job, so it is not left for the server to pick up
+            asyncio.run(_pipeline.process_video_async(source, destination, job_id, resumable=False, **options))
+            status = _pipeline.processing_status.pop(job_id, {})
+            _pipeline.job_timings.pop(job_id, None)
+            record.update(status=status.get("status", "error"), frames=status.get("frames_processed", 0),
+                          detections=status.get("detections", {}),
+                          output=str(Path(destination).with_name(status.get("processed_file", Path(destination).name))))
+            if record["status"] != "completed":
+                record["error"] = status.get("message")
+    except Exception as e:
+        record["error"] = str(e)
+
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+def discover(input_dir: Path):
+    """Yield (relative_path, kind) for every supported media file, in a stable order"""
+    for path in sorted(input_dir.rglob("*")):
+        if not path.is_file():
+            continue
+        suffix = path.suffix.lower()
+        if suffix in IMAGE_EXTENSIONS:
+            yield path.relative_to(input_dir), "image"
+        elif suffix in VIDEO_EXTENSIONS:
+            yield path.relative_to(input_dir), "video"
+
+
+def output_path_for(output_dir: Path, relative: Path, kind: str) -> Path:
+    target = output_dir / relative
+    return target.with_suffix(".mp4") if kind == "video" else target
+
+
+def load_manifest(manifest_path: Path) -> dict:
+    """Completed entries from previous runs, keyed by relative path"""
+    done = {}
+    if not manifest_path.exists():
+        return done
+    with open(manifest_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a killed run
+            if entry.get("status") == "completed":
+                done[entry["file"]] = entry
+    return done
+
+
+def run(input_dir: Path, output_dir: Path, workers: int, options: dict) -> int:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+    completed = load_manifest(manifest_path)
+
+    todo = []
+    resumed = 0
+    for relative, kind in discover(input_dir):
+        source = input_dir / relative
+        stat = source.stat()
+        previous = completed.get(str(relative))
+        if (previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns
+                and Path(previous.get("output", "")).exists()):
+            resumed += 1
+            continue
+        todo.append((relative, kind, stat))
+
+    print(f"Found {len(todo) + resumed} media files: {resumed} already done, {len(todo)} to process "
+          f"with {workers} workers")
+    if not todo:
+        return 0
+
+    files_done = frames_done = failures = 0
+    started = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+
+    with open(manifest_path, "a") as manifest, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as executor:
+        pending = {}
+        queue = iter(todo)
+        try:
+            while True:
+                # Keep every worker busy without queueing the whole tree up front
+                for relative, kind, stat in queue:
+                    destination = output_path_for(output_dir, relative, kind)
+                    future = executor.submit(_redact_file, str(input_dir / relative), str(destination), kind, options)
+                    pending[future] = (relative, kind, stat)
+                    if len(pending) >= workers * 2:
+                        break
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    relative, kind, stat = pending.pop(future)
+                    record = future.result()
+                    record.update(file=str(relative), kind=kind, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                    manifest.write(json.dumps(record) + "\n")
+                    manifest.flush()
+
+                    files_done += 1
+                    frames_done += record["frames"]
+                    if record["status"] != "completed":
+                        failures += 1
+                    elapsed = time.perf_counter() - started
+                    print(f"[{files_done}/{len(todo)}] {record['status']:<9} {relative} "
+                          f"({record['frames']} frames, {record['seconds']:.1f}s) - "
+                          f"{files_done / elapsed:.2f} files/s, {frames_done / elapsed:.1f} frames/s")
+        except KeyboardInterrupt:
+            print("\nInterrupted - finished files are recorded, re-run the same command to resume")
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    elapsed = time.perf_counter() - started
+    print(f"\nProcessed {files_done} files ({frames_done} frames) in {elapsed:.1f}s: "
+          f"{files_done / elapsed:.2f} files/s, {frames_done / elapsed:.1f} frames/s, {failures} failed")
+    print(f"Manifest: {manifest_path}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redact every image and video in a directory tree")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--blur-type", default="gaussian", choices=["gaussian", "pixelate", "median", "solid"])
+    parser.add_argument("--no-faces", action="store_true", help="Do not blur faces")
+    parser.add_argument("--no-plates", action="store_true", help="Do not blur plates, screens and objects")
+    parser.add_argument("--text", action="store_true", help="Also run OCR for sensitive text (slow)")
+    args = parser.parse_args()
+
+    input_dir = Path(args.input_dir).resolve()
+    output_dir = Path(args.output_dir).resolve()
+    if not input_dir.is_dir():
+        print(f"Input directory not found: {input_dir}")
+        return 2
+    if output_dir == input_dir or input_dir in output_dir.parents:
+        print("Output directory must not be inside the input directory")
+        return 2
+
+    options = {
+        "blur_faces": not args.no_faces,
+        "blur_plates": not args.no_plates,
+        "blur_text": args.text,
+        "blur_type": args.blur_type,
+    }
+    try:
+        return run(input_dir, output_dir, max(1, args.workers), options)
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+SCANNON.AI performance benchmarks.
+Run from the backend directory, e.g. `python -m benchmarks.bench_encoder`
+"""
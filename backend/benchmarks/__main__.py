@@ -0,0 +1,430 @@
+"""
+SCANNON.AI benchmark suite: per-detector and end-to-end pipeline timings on
+synthetic media, with JSON baselines and regression flagging.
+
+Usage (from the backend directory):
+    python -m benchmarks                       # run, compare with baseline (record it on first run)
+    python -m benchmarks --save-baseline       # overwrite the baseline with this run
+    python -m benchmarks --quick               # 480p only, fewer repeats
+    python -m benchmarks --resolutions 720p,1080p --repeats 20
+
+Exit status is 1 when a regression beyond --tolerance is detected.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+
+BENCH_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCH_DIR / "baselines" / "baseline.json"
+
+# Regressions smaller than this (ms) are treated as timer noise
+MIN_REGRESSION_MS = 0.5
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow pipeline console and log output so it does not dominate the run log"""
+    handlers = [h for h in logging.getLogger("scannon").handlers if isinstance(h, logging.StreamHandler)]
+    buffer = io.StringIO()
+    previous = [h.setStream(buffer) for h in handlers]
+    try:
+        with contextlib.redirect_stdout(buffer):
+            yield buffer
+    finally:
+        for handler, stream in zip(handlers, previous):
+            handler.setStream(stream)
+
+
+@contextlib.contextmanager
+def frame_logging(level):
+    """Temporarily set the per-frame logger level (DEBUG = every detection is logged)"""
+    frame_logger = logging.getLogger("scannon.frame")
+    previous = frame_logger.level
+    frame_logger.setLevel(level)
+    try:
+        yield
+    finally:
+        frame_logger.setLevel(previous)
+
+
+def time_call(fn, repeats, warmup=1, setup=None):
+    """
+    Time `fn(*setup())` `repeats` times (setup excluded from timing)
+    Returns median/p95/min in milliseconds plus the last return value
+    """
+    result = None
+    samples = []
+    for i in range(warmup + repeats):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        if i >= warmup:
+            samples.append(elapsed)
+    samples.sort()
+    p95_index = min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[p95_index], 3),
+        "min_ms": round(samples[0], 3),
+        "runs": len(samples),
+    }, result
+
+
+def count_regions(result):
+    if isinstance(result, dict):
+        return sum(len(v) for v in result.values())
+    if isinstance(result, tuple) and len(result) == 2 and isinstance(result[1], dict):
+        return result[1].get("total", 0)
+    if isinstance(result, list):
+        return len(result)
+    return None
+
+
+def recall(truth_boxes, detected_boxes):
+    """Share of ground-truth boxes whose centre is covered by a detection"""
+    if not truth_boxes:
+        return None
+    hits = 0
+    for x, y, w, h in truth_boxes:
+        cx, cy = x + w / 2, y + h / 2
+        if any(dx <= cx <= dx + dw and dy <= cy <= dy + dh for dx, dy, dw, dh in detected_boxes):
+            hits += 1
+    return round(hits / len(truth_boxes), 3)
+
+
+def run_suite(resolutions, repeats, video_frames):
+    from benchmarks.synthetic import RESOLUTIONS, make_frame, make_group_frame, make_static_sequence, make_video
+
+    with quiet():
+        import main
+    import budget
+    from framepool import FRAME_POOL
+    from memprofile import memory_profiler
+
+    availability = {
+        "detect_faces_mediapipe": (main.MEDIAPIPE_AVAILABLE, "mediapipe"),
+        "detect_privacy_objects_yolo": (main.YOLO_AVAILABLE, "ultralytics"),
+        "detect_text_with_ocr": (main.EASYOCR_AVAILABLE, "easyocr"),
+        "detect_faces_tiled": (main.MEDIAPIPE_AVAILABLE, "mediapipe"),
+        "detect_privacy_objects_tiled": (main.YOLO_AVAILABLE, "ultralytics"),
+    }
+
+    results = {}
+
+    def record(key, fn, setup, runs=repeats, truth_boxes=None):
+        name = key.split("@")[0]
+        available, package = availability.get(name, (True, None))
+        if not available:
+            results[key] = {"skipped": f"{package} not installed"}
+            print(f"  {key:<48} skipped ({package} not installed)")
+            return
+        with quiet():
+            timing, result = time_call(fn, runs, setup=setup)
+        timing["regions"] = count_regions(result)
+        extra = ""
+        if truth_boxes is not None:
+            timing["recall"] = recall(truth_boxes, result)
+            extra = f"   recall {timing['recall']:.2f}"
+        results[key] = timing
+        print(f"  {key:<48} median {timing['median_ms']:>9.2f} ms   p95 {timing['p95_ms']:>9.2f} ms{extra}")
+
+    for label in resolutions:
+        width, height = RESOLUTIONS[label]
+        frame, truth = make_frame(width, height, seed=42)
+        rects = [r for regions in truth.values() for r in regions] * 4
+        print(f"\n[{label}] {width}x{height}")
+
+        same_frame = lambda: (frame,)
+        fresh_frame = lambda: (frame.copy(),)
+        record(f"detect_faces_mediapipe@{label}", main.detect_faces_mediapipe, same_frame)
+        record(f"detect_license_plates@{label}", main.detect_license_plates, same_frame)
+        record(f"detect_license_plates[vehicle-gated]@{label}",
+               lambda f: main.detect_license_plates(f, vehicle_boxes=truth["vehicles"]), same_frame)
+        record(f"detect_document_shapes@{label}", main.detect_document_shapes, same_frame)
+        record(f"detect_privacy_objects_yolo@{label}", main.detect_privacy_objects_yolo, same_frame)
+        record(f"detect_text_with_ocr@{label}", main.detect_text_with_ocr, same_frame, runs=max(1, repeats // 5))
+        record(f"merge_overlapping_rectangles@{label}", main.merge_overlapping_rectangles, lambda: (rects,))
+        for blur_type in ("gaussian", "pixelate", "median", "solid"):
+            x, y, w, h = truth["documents"][0]
+            record(f"apply_blur[{blur_type}]@{label}",
+                   lambda f, bt=blur_type: main.apply_blur(f, x, y, w, h, blur_type=bt), fresh_frame)
+        record(f"process_frame@{label}",
+               lambda f: main.process_frame(f, blur_faces=True, blur_text=False, blur_plates=True), fresh_frame)
+        # Same frame with every per-detection log line enabled - the cost of hot-path logging
+        with frame_logging(logging.DEBUG):
+            record(f"process_frame[debug-logging]@{label}",
+                   lambda f: main.process_frame(f, blur_faces=True, blur_text=False, blur_plates=True), fresh_frame)
+
+    # Tiled vs full-frame detection on a 4K group photo (throughput and recall)
+    frame, truth = make_group_frame(3840, 2160, seed=7)
+    print(f"\n[tiling] 3840x2160 group photo, {len(truth['faces'])} faces, "
+          f"{len(main.tiling.tile_grid(3840, 2160))} tiles of {main.tiling.TILE_SIZE}px")
+    same_frame = lambda: (frame,)
+    tile_runs = max(1, repeats // 3)
+    record("detect_faces_mediapipe@4k-group", main.detect_faces_mediapipe, same_frame,
+           runs=tile_runs, truth_boxes=truth["faces"])
+    record("detect_faces_tiled@4k-group", main.detect_faces_tiled, same_frame,
+           runs=tile_runs, truth_boxes=truth["faces"])
+    record("detect_privacy_objects_yolo@4k-group", main.detect_privacy_objects_yolo, same_frame, runs=tile_runs)
+    record("detect_privacy_objects_tiled@4k-group", main.detect_privacy_objects_tiled, same_frame, runs=tile_runs)
+
+    def tiling_overhead(f):
+        """Tiling machinery alone: views, thread hand-off, offsets, de-duplication"""
+        boxes = []
+        for dx, dy, tile_boxes in main.tiling.run_tiled(f, lambda view: [(0, 0, 8, 8)], main.tile_executor):
+            boxes.extend(main.tiling.offset_box(box, dx, dy) for box in tile_boxes)
+        return main.tiling.dedupe_boxes(boxes)
+
+    record("tiling_overhead@4k-group", tiling_overhead, same_frame)
+
+    # Incremental (dirty-rectangle) detection on a fixed camera where one small face moves
+    label = resolutions[0]
+    width, height = RESOLUTIONS[label]
+    sequence = make_static_sequence(width, height, frames=max(10, repeats * 4))
+    print(f"\n[incremental] {len(sequence)} frames of a static camera @ {label}")
+    everything = {"blur_faces": True, "blur_text": False, "blur_plates": True}
+
+    def run_sequence(incremental):
+        changes = main.IncrementalDetector() if incremental else None
+        boxes = []
+        for frame, _ in sequence:
+            regions = []
+            main.process_frame(frame.copy(), regions_out=regions, incremental=changes, **everything)
+            boxes.append([r[:4] for r in regions])
+        return boxes, changes
+
+    for mode in ("full", "incremental"):
+        with quiet():
+            timing, (boxes, changes) = time_call(lambda: run_sequence(mode == "incremental"), 1, warmup=0)
+        key = f"process_frame[{mode}]@{label}-static"
+        # Share of ground-truth regions covered, over the whole sequence
+        truth = [box for _, t in sequence for kind in ("faces", "documents", "plates") for box in t[kind]]
+        found = sum(recall([box], frame_boxes) or 0
+                    for (_, t), frame_boxes in zip(sequence, boxes)
+                    for kind in ("faces", "documents", "plates") for box in t[kind])
+        results[key] = {"median_ms": round(timing["median_ms"] / len(sequence), 3),
+                        "recall": round(found / len(truth), 3)}
+        extra = f"   analysed {changes.stats()['analysed_share']:.0%} of pixels" if changes else ""
+        print(f"  {key:<48} median {results[key]['median_ms']:>9.2f} ms/frame   "
+              f"recall {results[key]['recall']:.2f}{extra}")
+
+    # Realtime: aggregate throughput of concurrent sessions, one scheduled call per frame
+    label = resolutions[0]
+    width, height = RESOLUTIONS[label]
+    frame, _ = make_frame(width, height, seed=3)
+    frames_each = max(5, repeats * 2)
+    print(f"\n[realtime] {frames_each} frames per session @ {label}")
+
+    async def run_sessions(count):
+        async def session(number):
+            timings = main.StageTimings()
+            for _ in range(frames_each):
+                await main.run_scheduled("realtime", f"session-{number}", main.process_frame, frame.copy(),
+                                         timings=timings, source="realtime", **main.REALTIME_OPTIONS)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(session(n) for n in range(count)))
+        return time.perf_counter() - start
+
+    for count in (1, 4, 16):
+        key = f"realtime[per-frame]x{count}@{label}"
+        with quiet():
+            elapsed = asyncio.run(run_sessions(count))
+        total = count * frames_each
+        results[key] = {"median_ms": round(elapsed * 1000 / total, 3), "fps": round(total / elapsed, 2),
+                        "sessions": count}
+        print(f"  {key:<48} {results[key]['fps']:>9.1f} frames/s aggregate "
+              f"({results[key]['median_ms']:.2f} ms/frame)")
+
+    # End-to-end video job on the smallest requested resolution
+    label = resolutions[0]
+    width, height = RESOLUTIONS[label]
+    print(f"\n[video] {video_frames} frames @ {label}")
+    with tempfile.TemporaryDirectory() as tmp:
+        source = make_video(os.path.join(tmp, "input.mp4"), width, height, frames=video_frames)
+
+        run_ids = itertools.count(1)
+        video_ids = []
+
+        def run_video():
+            run_id = next(run_ids)
+            video_ids.append(run_id)
+            output = os.path.join(tmp, f"output_{run_id}.mp4")
+            asyncio.run(main.process_video_async(source, output, f"bench_{run_id}",
+                                                 blur_faces=True, blur_text=False, blur_plates=True))
+            main.job_timings.pop(f"bench_{run_id}", None)
+            return main.processing_status.pop(f"bench_{run_id}", {})
+
+        def report_video(key, timing, status):
+            timing["fps"] = round(video_frames / (timing["median_ms"] / 1000), 2) if timing["median_ms"] else 0
+            timing["status"] = status.get("status")
+            results[key] = timing
+            print(f"  {key:<48} median {timing['median_ms']:>9.2f} ms   "
+                  f"{timing['fps']:.1f} frames/s ({timing['status']})")
+
+        with quiet():
+            timing, status = time_call(run_video, max(1, repeats // 5), warmup=0)
+        report_video(f"process_video_async@{label}", timing, status)
+
+        # Decode -> process_frame -> encode with pooled buffers vs a fresh allocation for each one
+        def frame_loop():
+            cap = cv2.VideoCapture(source)
+            out, _, _ = main.open_video_writer(os.path.join(tmp, "frame_loop.mp4"), 25, (width, height))
+            faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+            frames = 0
+            while True:
+                frame = main.read_frame(cap, (height, width, 3))
+                if frame is None:
+                    break
+                frame, _ = main.process_frame(frame, blur_faces=True, blur_text=False, blur_plates=True)
+                out.write(frame)
+                main.frame_pool.release(frame)
+                frames += 1
+            out.release()
+            cap.release()
+            return frames, (resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults) / max(1, frames)
+
+        for mode in ("unpooled", "pooled"):
+            main.frame_pool.enabled = mode == "pooled"
+            main.frame_pool.clear()
+            before = main.frame_pool.stats()["allocated"]
+            try:
+                with quiet():
+                    timing, (frames, faults) = time_call(frame_loop, max(1, repeats // 5))
+            finally:
+                main.frame_pool.enabled = FRAME_POOL
+            key = f"frame_loop[{mode}]@{label}"
+            allocated = (main.frame_pool.stats()["allocated"] - before) / (frames * (max(1, repeats // 5) + 1))
+            results[key] = {"median_ms": round(timing["median_ms"] / frames, 3),
+                            "fps": round(frames / (timing["median_ms"] / 1000), 2),
+                            "buffers_allocated_per_frame": round(allocated, 2),
+                            "minor_faults_per_frame": round(faults, 1)}
+            print(f"  {key:<48} median {results[key]['median_ms']:>9.2f} ms/frame   "
+                  f"{results[key]['fps']:.1f} frames/s, {allocated:.2f} buffers allocated/frame, "
+                  f"{faults:.0f} page faults/frame")
+
+        # Re-render the last job from its detection sidecar (decode + blur + encode only)
+        sidecar_file = main.sidecar_path(f"bench_{video_ids[-1]}")
+        if sidecar_file.exists():
+            sidecar = main.Sidecar(str(sidecar_file))
+
+            def run_rerender():
+                run_id = next(run_ids)
+                output = os.path.join(tmp, f"rerender_{run_id}.mp4")
+                asyncio.run(main.rerender_video_async(source, output, f"bench_{run_id}", sidecar,
+                                                      blur_type="pixelate"))
+                main.job_timings.pop(f"bench_{run_id}", None)
+                return main.processing_status.pop(f"bench_{run_id}", {})
+
+            with quiet():
+                timing, status = time_call(run_rerender, max(1, repeats // 5), warmup=0)
+            report_video(f"rerender_video_async@{label}", timing, status)
+
+        # Same job with a 30 fps frame budget: lower-priority detectors run at a reduced cadence
+        previous, budget.TARGET_FPS = budget.TARGET_FPS, 30.0
+        try:
+            with quiet():
+                timing, status = time_call(run_video, max(1, repeats // 5), warmup=0)
+        finally:
+            budget.TARGET_FPS = previous
+        report_video(f"process_video_async[budget-30fps]@{label}", timing, status)
+
+        # Same job with memory profiling: RSS only (canary setting), then with tracemalloc
+        for mode in ("rss", "tracemalloc"):
+            memory_profiler.enable(mode)
+            try:
+                with quiet():
+                    timing, status = time_call(run_video, max(1, repeats // 5), warmup=0)
+            finally:
+                memory_profiler.disable()
+            report_video(f"process_video_async[memory-{mode}]@{label}", timing, status)
+            memory = status.get("memory") or {}
+            print(f"  {'':<48} peak RSS {memory.get('rss_peak_mb')} MB, "
+                  f"traced peak +{memory.get('traced_peak_growth_mb', '-')} MB")
+        for path in main.SIDECAR_DIR.glob("bench_*.npz"):
+            path.unlink()
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of (key, baseline_ms, current_ms, ratio) for regressed benchmarks"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get("results", {}).get(key)
+        if not previous or "median_ms" not in previous or "median_ms" not in current:
+            continue
+        base_ms, now_ms = previous["median_ms"], current["median_ms"]
+        if now_ms > base_ms * (1 + tolerance) and now_ms - base_ms > MIN_REGRESSION_MS:
+            regressions.append((key, base_ms, now_ms, now_ms / base_ms if base_ms else float("inf")))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SCANNON.AI detector and pipeline benchmarks")
+    parser.add_argument("--resolutions", default="480p,720p,1080p", help="Comma separated: 480p,720p,1080p")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--video-frames", type=int, default=60)
+    parser.add_argument("--quick", action="store_true", help="480p only, 3 repeats, 20 video frames")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--output", help="Also write this run's results to a JSON file")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.resolutions, args.repeats, args.video_frames = "480p", 3, 20
+    resolutions = [r.strip() for r in args.resolutions.split(",") if r.strip()]
+
+    print("=" * 60)
+    print("SCANNON.AI benchmark suite")
+    print("=" * 60)
+    results = run_suite(resolutions, args.repeats, args.video_frames)
+
+    run = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "opencv": cv2.__version__, "cpus": os.cpu_count()},
+        "config": {"resolutions": resolutions, "repeats": args.repeats, "video_frames": args.video_frames},
+        "results": results,
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(run, indent=2))
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline or not baseline_path.exists():
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(run, indent=2))
+        print(f"\nBaseline saved to {baseline_path}")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text())
+    regressions = compare(results, baseline, args.tolerance)
+    print(f"\nCompared with baseline from {baseline.get('created', '?')} (tolerance {args.tolerance:.0%})")
+    if not regressions:
+        print("✓ No performance regressions")
+        return 0
+
+    for key, base_ms, now_ms, ratio in regressions:
+        print(f"✗ REGRESSION {key}: {base_ms:.2f} ms -> {now_ms:.2f} ms ({ratio:.2f}x)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
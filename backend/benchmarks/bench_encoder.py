@@ -0,0 +1,97 @@
+"""
+Encoder benchmark: output size and encode throughput of the ffmpeg/libx264
+pipe encoder versus the legacy OpenCV mp4v writer.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_encoder --width 1280 --height 720 --frames 300
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from fractions import Fraction
+
+import cv2
+import numpy as np
+
+from encoder import FFmpegVideoWriter, ffmpeg_available, open_opencv_writer
+
+
+def synthetic_frames(width, height, count, seed=0):
+    """Moving shapes over a noisy gradient - compresses like real footage, not like a flat color"""
+    rng = np.random.default_rng(seed)
+    gradient = np.tile(np.linspace(40, 200, width, dtype=np.uint8), (height, 1))
+    base = cv2.merge([gradient, gradient[::-1], np.full_like(gradient, 120)])
+    for i in range(count):
+        frame = base.copy()
+        noise = rng.integers(0, 12, size=frame.shape, dtype=np.uint8)
+        cv2.add(frame, noise, dst=frame)
+        cx = int((i * 7) % width)
+        cv2.circle(frame, (cx, height // 2), height // 8, (30, 180, 240), -1)
+        cv2.rectangle(frame, (width // 4, (i * 3) % height), (width // 4 + 160, (i * 3) % height + 50),
+                      (240, 240, 240), -1)
+        yield frame
+
+
+def run_writer(name, writer, output_path, frames):
+    start = time.perf_counter()
+    count = 0
+    for frame in frames:
+        writer.write(frame)
+        count += 1
+    writer.release()
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    return {
+        "writer": name,
+        "frames": count,
+        "seconds": round(elapsed, 3),
+        "fps": round(count / elapsed, 1) if elapsed > 0 else 0,
+        "bytes": size,
+        "error": getattr(writer, "error", None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark video encoder backends")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--fps", default="30000/1001")
+    parser.add_argument("--presets", default="ultrafast,veryfast,medium")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    fps = Fraction(args.fps)
+    size = (args.width, args.height)
+    frames = list(synthetic_frames(args.width, args.height, args.frames))
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writer, path = open_opencv_writer(os.path.join(tmp, "opencv.mp4"), fps, size)
+        results.append(run_writer("opencv-mp4v", writer, path, frames))
+
+        if ffmpeg_available():
+            for preset in args.presets.split(","):
+                path = os.path.join(tmp, f"ffmpeg-{preset}.mp4")
+                writer = FFmpegVideoWriter(path, fps, size, preset=preset)
+                results.append(run_writer(f"ffmpeg-x264-{preset}", writer, path, frames))
+        else:
+            print("ffmpeg not found - skipping libx264 backends")
+
+    baseline = results[0]
+    print(f"\n{'writer':<24}{'fps':>10}{'size (KB)':>14}{'vs mp4v':>10}")
+    for result in results:
+        ratio = result["bytes"] / baseline["bytes"] if baseline["bytes"] else 0
+        result["size_vs_opencv"] = round(ratio, 3)
+        print(f"{result['writer']:<24}{result['fps']:>10}{result['bytes'] / 1024:>14.1f}{ratio:>10.2f}"
+              + (f"  ERROR: {result['error']}" if result["error"] else ""))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"width": args.width, "height": args.height, "fps": str(fps), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+"""
+Load generator: image uploads, video uploads with /api/progress polling and
+/ws/realtime webcam sessions against one server, all at the same time.
+
+Usage (from the backend directory):
+    python -m benchmarks.loadtest --spawn --stub --duration 30     # own server, stubbed detectors
+    python -m benchmarks.loadtest --spawn --realtime-sessions 8 --realtime-fps 15
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --image-users 16 --video-users 2 --json load.json
+
+Every virtual user runs until --duration is over:
+  - image users upload a synthetic JPEG to /api/upload and wait for the result
+  - video users upload a short synthetic clip, poll /api/progress every
+    --poll-interval until the job finishes and start the next one
+  - realtime sessions send synthetic webcam frames at --realtime-fps without
+    waiting for replies (like the frontend) and time each processed frame
+/api/health is sampled every --sample-interval for the scheduler queue
+depth, running compute slots and server memory.
+
+Reported per operation: count, errors, throughput and p50/p95/p99/max
+latency. --spawn starts uvicorn on a free local port in a temporary working
+directory; with --stub that server runs with SCANNON_STUB_DETECTORS=1, so the
+numbers are the HTTP, websocket, decode/encode and scheduling overhead on
+their own (against --url, set that variable on the server instead). Needs
+httpx and websockets.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import cv2
+
+from benchmarks.synthetic import RESOLUTIONS, make_frame, make_video
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted `samples`"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))]
+
+
+class Recorder:
+    """Latency samples and errors per operation"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Dict[str, int]] = {}
+
+    def ok(self, operation: str, seconds: float):
+        self.latencies.setdefault(operation, []).append(seconds)
+
+    def error(self, operation: str, reason: str):
+        reasons = self.errors.setdefault(operation, {})
+        reasons[reason] = reasons.get(reason, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        report = {}
+        for operation in sorted(set(self.latencies) | set(self.errors)):
+            samples = sorted(self.latencies.get(operation, []))
+            failed = sum(self.errors.get(operation, {}).values())
+            total = len(samples) + failed
+            report[operation] = {
+                "count": total,
+                "errors": failed,
+                "error_rate": round(failed / total, 4) if total else 0,
+                "throughput_per_s": round(len(samples) / elapsed, 2) if elapsed > 0 else 0,
+                "p50_ms": round(percentile(samples, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 1),
+                "max_ms": round(samples[-1] * 1000, 1) if samples else 0.0,
+                "error_reasons": self.errors.get(operation, {}),
+            }
+        return report
+
+
+class QueueMonitor:
+    """Server-side queue depth from /api/health"""
+
+    def __init__(self):
+        self.samples: List[dict] = []
+
+    async def run(self, client, interval: float, stop: asyncio.Event, recorder: Recorder):
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                response = await client.get("/api/health")
+                response.raise_for_status()
+                health = response.json()
+            except Exception as e:
+                recorder.error("health", type(e).__name__)
+            else:
+                recorder.ok("health", time.perf_counter() - started)
+                scheduler = health.get("scheduler", {})
+                self.samples.append({
+                    "queued": sum(scheduler.get("queued", {}).values()),
+                    "running": scheduler.get("running", 0),
+                    "rss_mb": health.get("process", {}).get("memory", {}).get("rss_mb"),
+                })
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def summary(self) -> dict:
+        report = {"samples": len(self.samples)}
+        for key in ("queued", "running", "rss_mb"):
+            values = sorted(sample[key] for sample in self.samples if sample[key] is not None)
+            if values:
+                report[key] = {"mean": round(sum(values) / len(values), 2),
+                               "p95": percentile(values, 0.95), "max": values[-1]}
+        return report
+
+
+async def image_user(client, number: int, deadline: float, image: bytes, options: dict, recorder: Recorder):
+    count = 0
+    while time.monotonic() < deadline:
+        count += 1
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/upload", params=options,
+                                         files={"file": (f"load_image_{number}_{count}.jpg", image, "image/jpeg")})
+        except Exception as e:
+            recorder.error("image_upload", type(e).__name__)
+            continue
+        if response.status_code == 200:
+            recorder.ok("image_upload", time.perf_counter() - started)
+        else:
+            recorder.error("image_upload", f"http_{response.status_code}")
+
+
+async def video_user(client, number: int, deadline: float, drain_deadline: float, video: bytes, options: dict,
+                     poll_interval: float, recorder: Recorder):
+    count = 0
+    while time.monotonic() < deadline:
+        count += 1
+        started = time.perf_counter()
+        try:
+            response = await client.post("/api/upload", params=options,
+                                         files={"file": (f"load_video_{number}_{count}.mp4", video, "video/mp4")})
+        except Exception as e:
+            recorder.error("video_upload", type(e).__name__)
+            await asyncio.sleep(poll_interval)
+            continue
+        if response.status_code != 200:
+            recorder.error("video_upload", f"http_{response.status_code}")
+            await asyncio.sleep(poll_interval)
+            continue
+        recorder.ok("video_upload", time.perf_counter() - started)
+        file_id = response.json()["file_id"]
+
+        status = "processing"
+        while status in ("processing", "queued") and time.monotonic() < drain_deadline:
+            await asyncio.sleep(poll_interval)
+            poll_started = time.perf_counter()
+            try:
+                progress = await client.get(f"/api/progress/{file_id}")
+            except Exception as e:
+                recorder.error("progress_poll", type(e).__name__)
+                continue
+            if progress.status_code != 200:
+                recorder.error("progress_poll", f"http_{progress.status_code}")
+                continue
+            recorder.ok("progress_poll", time.perf_counter() - poll_started)
+            status = progress.json().get("status")
+
+        if status == "completed":
+            recorder.ok("video_job", time.perf_counter() - started)
+        else:
+            recorder.error("video_job", "unfinished" if status in ("processing", "queued") else str(status))
+
+
+async def realtime_session(url: str, number: int, deadline: float, drain_deadline: float, message: str,
+                           fps: float, recorder: Recorder, sessions: List[dict]):
+    import websockets
+
+    session = {"sent": 0, "received": 0, "max_in_flight": 0, "seconds": 0.0}
+    sessions.append(session)
+    started = time.perf_counter()
+    try:
+        websocket = await websockets.connect(f"{url.replace('http', 'ws', 1)}/ws/realtime", max_size=None,
+                                             additional_headers={"X-Client-Id": f"loadtest-realtime-{number}"})
+    except Exception as e:
+        recorder.error("realtime_connect", type(e).__name__)
+        return
+    recorder.ok("realtime_connect", time.perf_counter() - started)
+
+    in_flight = deque()  # send times; replies come back in order
+
+    async def receive():
+        while True:
+            reply = json.loads(await websocket.recv())
+            sent = in_flight.popleft() if in_flight else None
+            if reply.get("type") == "processed_frame" and sent is not None:
+                recorder.ok("realtime_frame", time.perf_counter() - sent)
+                session["received"] += 1
+            else:
+                recorder.error("realtime_frame", str(reply.get("type")))
+
+    receiver = asyncio.create_task(receive())
+    try:
+        interval = 1 / fps
+        next_send = time.perf_counter()
+        while time.monotonic() < deadline and not receiver.done():
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+            in_flight.append(time.perf_counter())
+            await websocket.send(message)
+            session["sent"] += 1
+            session["max_in_flight"] = max(session["max_in_flight"], len(in_flight))
+            next_send += interval
+        # Let the frames already sent come back
+        while in_flight and not receiver.done() and time.monotonic() < drain_deadline:
+            await asyncio.sleep(0.05)
+        await websocket.send(json.dumps({"type": "close"}))
+    except Exception as e:
+        recorder.error("realtime_frame", type(e).__name__)
+    finally:
+        session["seconds"] = time.perf_counter() - started
+        if receiver.done() and receiver.exception() is not None:
+            # The server closed the connection or sent something unreadable
+            recorder.error("realtime_session", type(receiver.exception()).__name__)
+        receiver.cancel()
+        await asyncio.gather(receiver, return_exceptions=True)
+        for _ in in_flight:
+            recorder.error("realtime_frame", "unanswered")
+        await websocket.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(workdir: str, port: int, stub: bool, stub_ms: float, log_file) -> subprocess.Popen:
+    """uvicorn main:app in `workdir` (uploads/processed are created there)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(BACKEND_DIR), env.get("PYTHONPATH")]))
+    if stub:
+        env["SCANNON_STUB_DETECTORS"] = "1"
+        env["SCANNON_STUB_DETECTOR_MS"] = str(stub_ms)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_for_server(client, timeout: float, server: Optional[subprocess.Popen] = None) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"server exited with code {server.returncode}")
+        try:
+            response = await client.get("/api/health")
+            if response.status_code == 200:
+                return response.json()
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"server did not answer /api/health within {timeout:g}s")
+
+
+async def run_load(args, url: str, server: Optional[subprocess.Popen] = None) -> dict:
+    import httpx
+
+    width, height = RESOLUTIONS[args.resolution]
+    frame, _ = make_frame(width, height, seed=11)
+    image = cv2.imencode(".jpg", frame, (cv2.IMWRITE_JPEG_QUALITY, 90))[1].tobytes()
+    webcam = cv2.imencode(".jpg", frame, (cv2.IMWRITE_JPEG_QUALITY, 80))[1].tobytes()
+    message = json.dumps({"type": "frame", "data": "data:image/jpeg;base64," + base64.b64encode(webcam).decode()})
+    with tempfile.TemporaryDirectory() as tmp:
+        video = Path(make_video(os.path.join(tmp, "load.mp4"), width, height, frames=args.video_frames)).read_bytes()
+
+    options = {"blur_text": str(args.blur_text).lower()}
+    recorder = Recorder()
+    monitor = QueueMonitor()
+    sessions: List[dict] = []
+    limits = httpx.Limits(max_connections=args.image_users + args.video_users + 4)
+    async with httpx.AsyncClient(base_url=url, timeout=args.request_timeout, limits=limits) as client:
+        health = await wait_for_server(client, args.startup_timeout, server)
+        stop = asyncio.Event()
+        monitor_task = asyncio.create_task(monitor.run(client, args.sample_interval, stop, recorder))
+
+        started = time.perf_counter()
+        deadline = time.monotonic() + args.duration
+        drain_deadline = deadline + args.drain
+        users = [image_user(client, n, deadline, image, options, recorder) for n in range(args.image_users)]
+        users += [video_user(client, n, deadline, drain_deadline, video, options, args.poll_interval, recorder)
+                  for n in range(args.video_users)]
+        users += [realtime_session(url, n, deadline, drain_deadline, message, args.realtime_fps, recorder, sessions)
+                  for n in range(args.realtime_sessions)]
+        await asyncio.gather(*users)
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await monitor_task
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "url": url,
+        "stub_detectors": health.get("capabilities", {}).get("stub_detectors", False),
+        "config": {key: value for key, value in vars(args).items() if key not in ("json",)},
+        "elapsed_seconds": round(elapsed, 2),
+        "operations": recorder.summary(elapsed),
+        "realtime": {
+            "sessions": len(sessions),
+            "target_fps": args.realtime_fps,
+            "achieved_fps": [round(s["received"] / s["seconds"], 2) if s["seconds"] else 0 for s in sessions],
+            "max_in_flight": max((s["max_in_flight"] for s in sessions), default=0),
+        },
+        "server_queue": monitor.summary(),
+    }
+
+
+def print_report(report: dict):
+    print(f"\n{report['elapsed_seconds']:.1f}s against {report['url']}"
+          f"{' (stub detectors)' if report['stub_detectors'] else ''}")
+    print(f"  {'operation':<18} {'count':>7} {'errors':>7} {'per s':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    for operation, stats in report["operations"].items():
+        print(f"  {operation:<18} {stats['count']:>7} {stats['errors']:>7} {stats['throughput_per_s']:>8.2f} "
+              f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}"
+              + (f"   {stats['error_reasons']}" if stats["errors"] else ""))
+    realtime = report["realtime"]
+    if realtime["sessions"]:
+        print(f"  realtime: {realtime['sessions']} sessions at {realtime['target_fps']:g} fps target, achieved "
+              f"{', '.join(f'{fps:.1f}' for fps in realtime['achieved_fps'])} fps, "
+              f"up to {realtime['max_in_flight']} frames in flight")
+    queue = report["server_queue"]
+    for key, label in (("queued", "scheduler queue"), ("running", "compute slots busy"),
+                       ("rss_mb", "server RSS MB")):
+        if key in queue:
+            print(f"  {label:<24} mean {queue[key]['mean']:>8.2f}   p95 {queue[key]['p95']:>8}   "
+                  f"max {queue[key]['max']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SCANNON.AI load generator")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Server to load (ignored with --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="Start a local uvicorn server for the run")
+    parser.add_argument("--stub", action="store_true", help="With --spawn: stub detectors (SCANNON_STUB_DETECTORS=1)")
+    parser.add_argument("--stub-ms", type=float, default=0.0, help="Simulated inference time per frame for --stub")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--drain", type=float, default=60.0, help="Extra seconds for running video jobs to finish")
+    parser.add_argument("--image-users", type=int, default=4)
+    parser.add_argument("--video-users", type=int, default=1)
+    parser.add_argument("--realtime-sessions", type=int, default=2)
+    parser.add_argument("--realtime-fps", type=float, default=15.0, help="Frames per second per session (frontend: 15)")
+    parser.add_argument("--resolution", default="480p", choices=sorted(RESOLUTIONS))
+    parser.add_argument("--video-frames", type=int, default=30, help="Length of the uploaded clip")
+    parser.add_argument("--blur-text", action="store_true", help="Enable OCR on uploads (off: it dominates on CPU)")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="/api/health sampling interval")
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--json", help="Write the report to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        import httpx  # noqa: F401
+        import websockets  # noqa: F401
+    except ImportError as e:
+        print(f"❌ The load generator needs httpx and websockets ({e}): pip install httpx websockets")
+        return 2
+
+    print("=" * 60)
+    print("SCANNON.AI load test")
+    print("=" * 60)
+    print(f"{args.image_users} image users, {args.video_users} video users, "
+          f"{args.realtime_sessions} realtime sessions at {args.realtime_fps:g} fps, "
+          f"{args.resolution}, {args.duration:g}s")
+
+    if args.spawn:
+        with tempfile.TemporaryDirectory() as workdir:
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            with open(os.path.join(workdir, "server.log"), "w+") as log_file:
+                server = spawn_server(workdir, port, args.stub, args.stub_ms, log_file)
+                try:
+                    report = asyncio.run(run_load(args, url, server))
+                except RuntimeError as e:
+                    log_file.seek(0)
+                    print(f"❌ {e}\n{log_file.read()[-2000:]}")
+                    return 1
+                finally:
+                    server.terminate()
+                    try:
+                        server.wait(timeout=30)
+                    except subprocess.TimeoutExpired:
+                        server.kill()
+    else:
+        try:
+            report = asyncio.run(run_load(args, args.url.rstrip("/")))
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Deterministic synthetic test media for the benchmark suite.
+
+Frames contain known content - cartoon faces, a light paper document with
+sensitive text, a license plate and a screen-like dark rectangle - so that
+timings are reproducible and detection counts can be sanity-checked.
+"""
+import os
+from fractions import Fraction
+
+import cv2
+import numpy as np
+
+RESOLUTIONS = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+}
+
+
+def _background(width, height, rng):
+    gradient = np.tile(np.linspace(40, 140, width, dtype=np.uint8), (height, 1))
+    frame = cv2.merge([gradient, np.full_like(gradient, 90), gradient[:, ::-1]])
+    noise = rng.integers(0, 10, size=frame.shape, dtype=np.uint8)
+    cv2.add(frame, noise, dst=frame)
+    return frame
+
+
+def _draw_face(frame, cx, cy, size):
+    cv2.ellipse(frame, (cx, cy), (size // 2, int(size * 0.65)), 0, 0, 360, (120, 160, 215), -1)
+    eye_dx, eye_y = size // 5, cy - size // 6
+    for ex in (cx - eye_dx, cx + eye_dx):
+        cv2.circle(frame, (ex, eye_y), max(2, size // 14), (40, 30, 30), -1)
+    cv2.ellipse(frame, (cx, cy + size // 4), (size // 5, size // 12), 0, 0, 180, (60, 60, 150), 2)
+    return (cx - size // 2, cy - int(size * 0.65), size, int(size * 1.3))
+
+
+def _draw_document(frame, x, y, w, h):
+    cv2.rectangle(frame, (x, y), (x + w, y + h), (235, 235, 235), -1)
+    lines = ["CERTIFICATE OF BIRTH", "Name: JANE DOE", "jane.doe@example.com", "555-123-4567"]
+    scale = max(0.4, w / 500)
+    for i, text in enumerate(lines):
+        ty = y + int((i + 1) * h / (len(lines) + 1))
+        cv2.putText(frame, text, (x + w // 12, ty), cv2.FONT_HERSHEY_SIMPLEX, scale, (20, 20, 20), 2)
+    return (x, y, w, h)
+
+
+def _draw_vehicle(frame, plate_x, plate_y, plate_w, frame_height):
+    """Car body around where the plate will be drawn (what YOLO would report as a vehicle)"""
+    x1 = max(0, plate_x - plate_w // 3)
+    y1 = max(0, plate_y - plate_w // 2)
+    x2 = plate_x + plate_w + plate_w // 3
+    y2 = min(frame_height - 1, plate_y + plate_w // 4 + plate_w // 8)
+    cv2.rectangle(frame, (x1, y1), (x2, y2), (90, 40, 40), -1)
+    return (x1, y1, x2 - x1, y2 - y1)
+
+
+def _draw_plate(frame, x, y, w):
+    h = w // 4
+    cv2.rectangle(frame, (x, y), (x + w, y + h), (245, 245, 245), -1)
+    cv2.rectangle(frame, (x, y), (x + w, y + h), (10, 10, 10), 3)
+    cv2.putText(frame, "ABC 1234", (x + w // 10, y + int(h * 0.75)), cv2.FONT_HERSHEY_SIMPLEX,
+                w / 220, (10, 10, 10), 2)
+    return (x, y, w, h)
+
+
+def make_frame(width, height, seed=0, t=0):
+    """
+    Build one synthetic frame.
+    `t` shifts the moving content so consecutive video frames differ.
+    Returns (frame, ground_truth) where ground_truth maps kind -> list of (x, y, w, h)
+    """
+    rng = np.random.default_rng(seed + t)
+    frame = _background(width, height, rng)
+    unit = min(width, height)
+    shift = (t * 4) % max(1, width // 10)
+
+    truth = {"faces": [], "documents": [], "plates": [], "screens": [], "vehicles": []}
+    truth["faces"].append(_draw_face(frame, width // 6 + shift, height // 3, unit // 5))
+    truth["faces"].append(_draw_face(frame, width // 6 + shift + unit // 4, height // 3, unit // 8))
+    truth["documents"].append(_draw_document(frame, width // 2, height // 10, unit // 2, int(unit * 0.6)))
+    plate_x, plate_y, plate_w = width // 10, int(height * 0.75), unit // 3
+    truth["vehicles"].append(_draw_vehicle(frame, plate_x, plate_y, plate_w, height))
+    truth["plates"].append(_draw_plate(frame, plate_x, plate_y, plate_w))
+
+    sx, sy, sw, sh = int(width * 0.55), int(height * 0.75), unit // 3, unit // 6
+    cv2.rectangle(frame, (sx, sy), (sx + sw, sy + sh), (25, 25, 25), -1)
+    truth["screens"].append((sx, sy, sw, sh))
+    return frame, truth
+
+
+def make_group_frame(width=3840, height=2160, rows=4, cols=8, seed=0):
+    """
+    High-resolution "group photo": a grid of small faces (about 1/40 of the
+    short side) plus one large face, for tiled vs full-frame detection
+    Returns (frame, ground_truth) like make_frame
+    """
+    rng = np.random.default_rng(seed)
+    frame = _background(width, height, rng)
+    unit = min(width, height)
+    truth = {"faces": [], "documents": [], "plates": [], "screens": [], "vehicles": []}
+    small = max(12, unit // 40)
+    for row in range(rows):
+        for col in range(cols):
+            cx = int((col + 0.5) * width / cols) + int(rng.integers(-small, small))
+            cy = int(height * 0.35 + row * height * 0.15)
+            truth["faces"].append(_draw_face(frame, cx, cy, small))
+    truth["faces"].append(_draw_face(frame, width // 2, height // 8, unit // 6))
+    return frame, truth
+
+
+def make_static_sequence(width, height, frames=30, seed=0):
+    """
+    Fixed-camera sequence: the scene of make_frame stays put, only one small
+    face walks across the lower left part of the picture
+    Returns [(frame, ground_truth), ...]
+    """
+    base, truth = make_frame(width, height, seed=seed)
+    size = min(width, height) // 8
+    sequence = []
+    for t in range(frames):
+        frame = base.copy()
+        walker = _draw_face(frame, width // 8 + t * max(1, width // (2 * frames)), int(height * 0.55), size)
+        sequence.append((frame, {**truth, "faces": truth["faces"] + [walker]}))
+    return sequence
+
+
+def make_video(path, width, height, frames=60, fps=Fraction(30000, 1001), seed=0):
+    """Write a synthetic mp4 (OpenCV mp4v) and return its path"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), float(fps), (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not create synthetic video at {path}")
+    for t in range(frames):
+        frame, _ = make_frame(width, height, seed=seed, t=t)
+        writer.write(frame)
+    writer.release()
+    if not os.path.exists(path):
+        raise RuntimeError(f"Synthetic video was not written: {path}")
+    return path
@@ -0,0 +1,378 @@
+"""
+Job broker for distributed video processing.
+
+With SCANNON_BROKER_URL set, an uploaded video is not processed by the API
+process that received it. It is split into segment tasks (one per
+SCANNON_SEGMENT_SECONDS of video) on the broker, and stateless workers
+(`python segment_worker.py`, on any node) pull tasks, run the usual
+process_frame pipeline on their frame range and write the encoded segment
+and its detection sidecar to shared storage. When every segment of a job is
+done, an API process stitches them into the output (see main.py).
+
+Workers hold a lease on their task and renew it with every heartbeat. A task
+whose lease has expired (worker crashed, node lost) goes back to the queue
+for another worker, up to SCANNON_TASK_MAX_ATTEMPTS attempts.
+
+Only a SQLite backend exists: enough for one host or for testing, with the
+database on a filesystem every process can lock (not NFS).
+
+    sqlite:///shared/scannon-broker.db
+"""
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+BROKER_URL = os.getenv("SCANNON_BROKER_URL", "")
+HEARTBEAT_SECONDS = float(os.getenv("SCANNON_WORKER_HEARTBEAT", "5"))
+LEASE_SECONDS = float(os.getenv("SCANNON_TASK_LEASE_SECONDS", "30"))
+TASK_MAX_ATTEMPTS = int(os.getenv("SCANNON_TASK_MAX_ATTEMPTS", "3"))
+POLL_SECONDS = float(os.getenv("SCANNON_BROKER_POLL_SECONDS", "1"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    input_path TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    segment_dir TEXT NOT NULL,
+    options TEXT NOT NULL,
+    fps TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    total_frames INTEGER NOT NULL,
+    audio_codec TEXT,
+    status TEXT NOT NULL,
+    message TEXT,
+    processed_file TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    segment INTEGER NOT NULL,
+    start_frame INTEGER NOT NULL,
+    end_frame INTEGER,
+    status TEXT NOT NULL,
+    worker_id TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL,
+    frames INTEGER NOT NULL DEFAULT 0,
+    output_path TEXT,
+    sidecar_path TEXT,
+    encoder TEXT,
+    stats TEXT,
+    error TEXT,
+    UNIQUE (job_id, segment)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    started REAL,
+    last_seen REAL,
+    task_id INTEGER,
+    tasks_done INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+ACTIVE_JOB_STATUSES = ("processing", "assembling")
+
+
+class SQLiteBroker:
+    def __init__(self, path: str, lease_seconds: float = LEASE_SECONDS, max_attempts: int = TASK_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call: safe from any thread or process
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database lock up front (claims must not race)"""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    # Jobs ------------------------------------------------------------------
+
+    def submit_job(self, job_id: str, input_path: str, output_path: str, segment_dir: str, options: dict,
+                   fps: str, width: int, height: int, total_frames: int, audio_codec: Optional[str],
+                   segment_frames: int, start_frame: int = 0, end_frame: Optional[int] = None) -> int:
+        """
+        Queue a video job as one task per segment of frames [start_frame, end_frame).
+        Returns the number of tasks
+        """
+        now = time.time()
+        segment_frames = max(1, segment_frames)
+        stop = end_frame if end_frame is not None else max(start_frame + 1, total_frames)
+        starts = list(range(start_frame, stop, segment_frames))
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO jobs (job_id, input_path, output_path, segment_dir, options, fps, width, height,"
+                " total_frames, audio_codec, status, processed_file, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'processing', ?, ?, ?)",
+                (job_id, input_path, output_path, segment_dir, json.dumps(options), fps, width, height,
+                 stop - start_frame, audio_codec, os.path.basename(output_path), now, now)
+            )
+            for segment, start in enumerate(starts):
+                # The frame count in the header can be off: the last task reads to the end of the stream
+                end = start + segment_frames if segment < len(starts) - 1 else end_frame
+                db.execute(
+                    "INSERT INTO tasks (job_id, segment, start_frame, end_frame, status) VALUES (?, ?, ?, ?, 'queued')",
+                    (job_id, segment, start, end)
+                )
+        return len(starts)
+
+    def job(self, job_id: str) -> Optional[dict]:
+        """Status of a job in the shape of main.processing_status entries"""
+        with self._connect() as db:
+            job = db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            tasks = db.execute("SELECT status, frames, stats FROM tasks WHERE job_id = ?", (job_id,)).fetchall()
+
+        detections = {}
+        frames = 0
+        for task in tasks:
+            frames += task["frames"]
+            for key, value in json.loads(task["stats"] or "{}").items():
+                detections[key] = detections.get(key, 0) + value
+        done = sum(1 for task in tasks if task["status"] == "done")
+
+        status = {
+            "status": "processing" if job["status"] == "assembling" else job["status"],
+            "progress": 100 if job["status"] == "completed" else min(99, int(frames / max(1, job["total_frames"]) * 100)),
+            "message": job["message"] or f"Processed {done}/{len(tasks)} segments",
+            "detections": detections,
+            "frames_processed": frames,
+            "segments": len(tasks),
+            "distributed": True
+        }
+        if job["status"] == "completed" and job["processed_file"]:
+            status["processed_file"] = job["processed_file"]
+        return status
+
+    def job_for_file(self, processed_file: str) -> Optional[dict]:
+        """Status of the newest job writing `processed_file` (what the frontend polls /api/status with)"""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT job_id FROM jobs WHERE processed_file = ? ORDER BY created DESC LIMIT 1", (processed_file,)
+            ).fetchone()
+        return self.job(row["job_id"]) if row is not None else None
+
+    def job_record(self, job_id: str) -> Optional[dict]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["options"] = json.loads(record["options"])
+        return record
+
+    def segments(self, job_id: str) -> List[dict]:
+        """Finished segments of a job in order, in the shape of checkpoint segments"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT start_frame, output_path, sidecar_path, encoder, frames, stats FROM tasks"
+                " WHERE job_id = ? AND status = 'done' ORDER BY segment", (job_id,)
+            ).fetchall()
+        return [{"start_frame": row["start_frame"], "path": row["output_path"], "sidecar": row["sidecar_path"], "encoder": row["encoder"],
+                 "frames": row["frames"], "stats": json.loads(row["stats"] or "{}")} for row in rows]
+
+    def active_jobs(self) -> List[dict]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT job_id, input_path, output_path, segment_dir FROM jobs WHERE status IN (?, ?)",
+                ACTIVE_JOB_STATUSES
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def ready_jobs(self) -> List[str]:
+        """Jobs whose segments are all done and that nobody is assembling yet"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT job_id FROM jobs WHERE status = 'processing' AND NOT EXISTS"
+                " (SELECT 1 FROM tasks WHERE tasks.job_id = jobs.job_id AND tasks.status != 'done')"
+            ).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def start_assembly(self, job_id: str) -> bool:
+        """Claim a ready job for stitching; False if another process got it first"""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'assembling', message = 'Joining segments...', updated = ?"
+                " WHERE job_id = ? AND status = 'processing'", (time.time(), job_id)
+            )
+        return cursor.rowcount == 1
+
+    def finish_job(self, job_id: str, status: str, message: str, processed_file: Optional[str] = None):
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, message = ?, processed_file = COALESCE(?, processed_file), updated = ?"
+                " WHERE job_id = ?",
+                (status, message, processed_file, time.time(), job_id)
+            )
+
+    def cancel_job(self, job_id: str) -> bool:
+        """Cancel a queued or running job; its workers notice at their next heartbeat"""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'cancelled', message = 'Cancelled', updated = ?"
+                " WHERE job_id = ? AND status = 'processing'", (time.time(), job_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            db.execute("UPDATE tasks SET status = 'cancelled' WHERE job_id = ? AND status IN ('queued', 'running')",
+                       (job_id,))
+        return True
+
+    # Tasks -----------------------------------------------------------------
+
+    def _reap(self, db, now: float):
+        """Requeue tasks whose worker stopped renewing its lease"""
+        expired = db.execute(
+            "SELECT task_id, job_id, attempts, worker_id FROM tasks WHERE status = 'running' AND lease_until < ?",
+            (now,)
+        ).fetchall()
+        for task in expired:
+            self._retry_or_fail(db, task, f"worker {task['worker_id']} stopped responding", now)
+        # Forget workers that have been gone for a while
+        db.execute("DELETE FROM workers WHERE last_seen < ?", (now - 10 * self.lease_seconds,))
+
+    def _retry_or_fail(self, db, task, error: str, now: float):
+        if task["attempts"] < self.max_attempts:
+            db.execute("UPDATE tasks SET status = 'queued', worker_id = NULL, frames = 0, error = ? WHERE task_id = ?",
+                       (error, task["task_id"]))
+        else:
+            db.execute("UPDATE tasks SET status = 'failed', error = ? WHERE task_id = ?", (error, task["task_id"]))
+            db.execute(
+                "UPDATE jobs SET status = 'error', message = ?, updated = ? WHERE job_id = ? AND status = 'processing'",
+                (f"Error: segment failed {task['attempts']} times ({error})", now, task["job_id"])
+            )
+
+    def claim(self, worker_id: str) -> Optional[dict]:
+        """Lease the next queued task (oldest job first) to a worker"""
+        now = time.time()
+        with self._transaction() as db:
+            self._reap(db, now)
+            row = db.execute(
+                "SELECT tasks.*, jobs.input_path, jobs.segment_dir, jobs.options, jobs.fps, jobs.width, jobs.height"
+                " FROM tasks JOIN jobs USING (job_id)"
+                " WHERE tasks.status = 'queued' AND jobs.status = 'processing'"
+                " ORDER BY jobs.created, tasks.segment LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE tasks SET status = 'running', worker_id = ?, attempts = attempts + 1, lease_until = ?,"
+                " frames = 0 WHERE task_id = ?",
+                (worker_id, now + self.lease_seconds, row["task_id"])
+            )
+            db.execute("UPDATE workers SET task_id = ?, last_seen = ? WHERE worker_id = ?",
+                       (row["task_id"], now, worker_id))
+        task = dict(row)
+        task["options"] = json.loads(task["options"])
+        task["attempts"] += 1
+        return task
+
+    def heartbeat(self, worker_id: str, task_id: Optional[int] = None, frames: int = 0) -> bool:
+        """
+        Renew the worker's lease. Returns False when the task is no longer
+        this worker's (cancelled, or reassigned after the lease expired)
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("UPDATE workers SET last_seen = ?, task_id = ? WHERE worker_id = ?", (now, task_id, worker_id))
+            if task_id is None:
+                return True
+            cursor = db.execute(
+                "UPDATE tasks SET lease_until = ?, frames = ? WHERE task_id = ? AND worker_id = ? AND status = 'running'",
+                (now + self.lease_seconds, frames, task_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, worker_id: str, task_id: int, frames: int, output_path: Optional[str],
+                 sidecar_path: Optional[str], encoder: Optional[str], stats: dict) -> bool:
+        """Record a finished segment; False if the task was taken away in the meantime"""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET status = 'done', frames = ?, output_path = ?, sidecar_path = ?, encoder = ?,"
+                " stats = ?, lease_until = NULL WHERE task_id = ? AND worker_id = ? AND status = 'running'",
+                (frames, output_path, sidecar_path, encoder, json.dumps(stats), task_id, worker_id)
+            )
+            db.execute("UPDATE workers SET task_id = NULL, tasks_done = tasks_done + 1, last_seen = ?"
+                       " WHERE worker_id = ?", (time.time(), worker_id))
+        return cursor.rowcount == 1
+
+    def fail(self, worker_id: str, task_id: int, error: str):
+        with self._transaction() as db:
+            task = db.execute(
+                "SELECT task_id, job_id, attempts FROM tasks WHERE task_id = ? AND worker_id = ? AND status = 'running'",
+                (task_id, worker_id)
+            ).fetchone()
+            if task is not None:
+                self._retry_or_fail(db, task, error, time.time())
+            db.execute("UPDATE workers SET task_id = NULL WHERE worker_id = ?", (worker_id,))
+
+    # Workers ---------------------------------------------------------------
+
+    def register_worker(self, worker_id: str, host: str, pid: int):
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO workers (worker_id, host, pid, started, last_seen, task_id, tasks_done)"
+                " VALUES (?, ?, ?, ?, ?, NULL, 0)", (worker_id, host, pid, now, now)
+            )
+
+    def unregister_worker(self, worker_id: str):
+        with self._transaction() as db:
+            db.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._connect() as db:
+            tasks = dict(db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+            jobs = dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            workers = db.execute("SELECT * FROM workers ORDER BY started").fetchall()
+        return {
+            "url": f"sqlite:///{self.path}",
+            "jobs": jobs,
+            "tasks": tasks,
+            "workers": [
+                {"worker_id": w["worker_id"], "host": w["host"], "pid": w["pid"], "task_id": w["task_id"],
+                 "tasks_done": w["tasks_done"], "alive": now - w["last_seen"] < self.lease_seconds,
+                 "last_seen_seconds": round(now - w["last_seen"], 1)}
+                for w in workers
+            ],
+        }
+
+
+def open_broker(url: str = BROKER_URL) -> Optional[SQLiteBroker]:
+    """Broker for SCANNON_BROKER_URL, or None when distributed processing is off"""
+    if not url:
+        return None
+    if not url.startswith("sqlite:///"):
+        raise ValueError(f"Unsupported SCANNON_BROKER_URL {url!r} (expected sqlite:///path/to/broker.db)")
+    return SQLiteBroker(url[len("sqlite:///"):])
@@ -0,0 +1,111 @@
+"""
+Per-frame compute budget for video jobs.
+
+process_frame normally runs every enabled detector on every frame, however
+long they take. With SCANNON_VIDEO_TARGET_FPS set, a video job gets a
+FrameBudget instead: the time per frame (1 / target fps) minus what
+decoding, blurring and encoding cost is the detection budget. Detectors are
+taken in priority order (faces first, OCR last) and each one gets a cadence,
+run every frame, every 2nd frame, ..., up to every SCANNON_BUDGET_MAX_SKIP
+frames, so that the amortized cost of all of them fits the budget. Faces
+always run on every frame.
+
+Costs are exponential moving averages of each detector's measured time, so
+the cadences follow the content (a busy scene makes OCR slower, the
+budget then runs it less often). On frames where a detector is skipped its
+last regions are reused; a region is never older than the detector's
+cadence.
+"""
+import math
+import os
+from typing import Dict, Iterable, Optional
+
+import metrics
+
+TARGET_FPS = float(os.getenv("SCANNON_VIDEO_TARGET_FPS", "0"))  # 0 = no budget, run everything
+MAX_SKIP = int(os.getenv("SCANNON_BUDGET_MAX_SKIP", "5"))
+EMA_ALPHA = float(os.getenv("SCANNON_BUDGET_EMA_ALPHA", "0.2"))
+
+# Order of the stages in process_frame = priority
+DETECTORS = ("faces", "documents", "yolo", "plates", "ocr")
+REQUIRED = ("faces",)
+
+DETECTOR_SKIPS = metrics.Counter("scannon_detector_skips_total",
+                                 "Detector runs skipped by the frame budget (last regions reused)")
+metrics.REGISTRY.append(DETECTOR_SKIPS)
+
+
+class FrameBudget:
+    def __init__(self, target_fps: float, max_skip: int = MAX_SKIP, alpha: float = EMA_ALPHA,
+                 detectors: Iterable[str] = DETECTORS):
+        self.frame_seconds = 1.0 / target_fps
+        self.max_skip = max(1, max_skip)
+        self.alpha = alpha
+        self.detectors = tuple(detectors)
+        self.cost: Dict[str, float] = {}  # EMA seconds per run
+        self.overhead: Optional[float] = None  # EMA of frame time spent outside detectors
+        self.cadence = {name: 1 for name in self.detectors}
+        self.frame_index = -1
+        self._last_run = {name: -math.inf for name in self.detectors}
+        self._last_result = {}
+        self._runs = {name: 0 for name in self.detectors}
+        self._skips = {name: 0 for name in self.detectors}
+        self._detector_time = 0.0
+
+    def _ema(self, previous: Optional[float], value: float) -> float:
+        return value if previous is None else previous + self.alpha * (value - previous)
+
+    def start_frame(self):
+        """Plan the next frame: recompute cadences from the current cost estimates"""
+        self.frame_index += 1
+        self._detector_time = 0.0
+        remaining = self.frame_seconds - (self.overhead or 0.0)
+        for name in self.detectors:
+            cost = self.cost.get(name)
+            if cost is None or name in REQUIRED:
+                cadence = 1  # unmeasured detectors run once so they get a cost
+            else:
+                cadence = self.max_skip
+                for candidate in range(1, self.max_skip + 1):
+                    if cost / candidate <= remaining:
+                        cadence = candidate
+                        break
+            self.cadence[name] = cadence
+            remaining -= (cost or 0.0) / cadence
+
+    def should_run(self, name: str) -> bool:
+        if self.frame_index - self._last_run[name] >= self.cadence[name] or name not in self._last_result:
+            return True
+        self._skips[name] += 1
+        DETECTOR_SKIPS.inc(detector=name)
+        return False
+
+    def record(self, name: str, seconds: float, result):
+        self.cost[name] = self._ema(self.cost.get(name), seconds)
+        self._last_run[name] = self.frame_index
+        self._last_result[name] = result
+        self._runs[name] += 1
+        self._detector_time += seconds
+
+    def last(self, name: str):
+        return self._last_result[name]
+
+    def end_frame(self, frame_seconds: float):
+        """Whole-frame time (decode to encode) of the frame just finished"""
+        self.overhead = self._ema(self.overhead, max(0.0, frame_seconds - self._detector_time))
+
+    def summary(self) -> dict:
+        return {
+            "target_fps": round(1.0 / self.frame_seconds, 2),
+            "overhead_ms": round((self.overhead or 0.0) * 1000, 2),
+            "detectors": {
+                name: {"cost_ms": round(self.cost[name] * 1000, 2), "cadence": self.cadence[name],
+                       "runs": self._runs[name], "skipped": self._skips[name]}
+                for name in self.detectors if name in self.cost
+            },
+        }
+
+
+def video_budget() -> Optional[FrameBudget]:
+    """A fresh budget for one video job, or None when SCANNON_VIDEO_TARGET_FPS is not set"""
+    return FrameBudget(TARGET_FPS) if TARGET_FPS > 0 else None
@@ -0,0 +1,172 @@
+"""
+Checkpoints for long video jobs.
+
+A video job is encoded as a series of segments of SCANNON_SEGMENT_SECONDS.
+Each finished segment (video + detection sidecar) is kept in the job's own
+directory and the job state is checkpointed to job.json:
+
+    jobs/<file_id>/job.json           input, output, options, next frame,
+                                      cumulative stats, finished segments
+    jobs/<file_id>/lease.json         owner and expiry of the job's lease
+    jobs/<file_id>/segment_00000.mp4  encoded frames of segment 0
+    jobs/<file_id>/segment_00000.npz  detection sidecar of segment 0
+
+The process running a job holds its lease and renews it every
+SCANNON_CHECKPOINT_LEASE_SECONDS / 3. Owners are identified by a boot id
+drawn when the process starts plus its PID, so a restarted container whose
+PIDs repeat does not mistake an old lease for its own. A process that
+stops cleanly (deploy, `reload=True`) releases the lease and its jobs are
+resumed right away; a crashed owner's lease expires and the job is then
+picked up by any process scanning the jobs directory. Only those crash
+resumes count towards SCANNON_RESUME_MAX_ATTEMPTS. At most one segment of
+work is lost. When the last segment is done the segments are stitched into
+the final output and the directory is removed.
+"""
+import fcntl
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+SEGMENT_SECONDS = float(os.getenv("SCANNON_SEGMENT_SECONDS", "10"))
+RESUME_MAX_ATTEMPTS = int(os.getenv("SCANNON_RESUME_MAX_ATTEMPTS", "3"))
+LEASE_SECONDS = float(os.getenv("SCANNON_CHECKPOINT_LEASE_SECONDS", "60"))
+
+BOOT_ID = uuid.uuid4().hex[:12]
+
+
+def owner_id() -> str:
+    """This process: boot id plus PID (forked prefork workers share the boot id)"""
+    return f"{BOOT_ID}-{os.getpid()}"
+
+
+class JobCheckpoint:
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.path = self.directory / "job.json"
+        self.lease_path = self.directory / "lease.json"
+
+    @property
+    def file_id(self) -> str:
+        return self.directory.name
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load(self) -> Optional[dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save(self, state: dict):
+        """Atomic write: a crash mid-save leaves the previous checkpoint intact"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_suffix(".tmp")
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+    def segment_path(self, index: int, extension: str = ".mp4") -> Path:
+        return self.directory / f"segment_{index:05d}{extension}"
+
+    def sidecar_path(self, index: int) -> Path:
+        return self.directory / f"segment_{index:05d}.npz"
+
+    # Lease -----------------------------------------------------------------
+
+    def lease(self) -> Optional[dict]:
+        try:
+            with open(self.lease_path) as f:
+                fcntl.flock(f, fcntl.LOCK_SH)
+                return json.loads(f.read() or "null")
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def leased(self) -> bool:
+        """True while some process holds an unexpired lease on this job"""
+        lease = self.lease()
+        return bool(lease) and not lease.get("released") and lease.get("expires", 0) > time.time()
+
+    def _update_lease(self, update) -> Optional[dict]:
+        """
+        Read-modify-write of lease.json under an exclusive lock. `update(lease)`
+        returns the new lease, or None to leave it as it is
+        """
+        try:
+            f = open(self.lease_path, "a+")
+        except FileNotFoundError:  # job directory removed meanwhile
+            return None
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                lease = json.loads(f.read() or "null")
+            except json.JSONDecodeError:
+                lease = None
+            new = update(lease)
+            if new is not None:
+                f.seek(0)
+                f.truncate()
+                json.dump(new, f)
+                f.flush()
+            return new
+
+    def claim(self) -> Optional[dict]:
+        """
+        Take the job's lease for this process if nobody holds a live one.
+        Returns the previous lease ({} for none) or None if the job is taken
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        previous = {}
+
+        def take(lease):
+            nonlocal previous
+            if lease and not lease.get("released") and lease.get("expires", 0) > time.time() \
+                    and lease.get("owner") != owner_id():
+                return None
+            previous = lease or {}
+            return {"owner": owner_id(), "expires": time.time() + LEASE_SECONDS, "released": False}
+
+        return previous if self._update_lease(take) is not None else None
+
+    def renew_lease(self) -> bool:
+        """Extend this process's lease; False if another process has taken the job over"""
+        def renew(lease):
+            if not lease or lease.get("owner") != owner_id():
+                return None
+            return {**lease, "expires": time.time() + LEASE_SECONDS}
+
+        return self._update_lease(renew) is not None
+
+    def release_lease(self):
+        """Clean stop: the job can be resumed right away, and it does not count as a crash"""
+        def release(lease):
+            if not lease or lease.get("owner") != owner_id():
+                return None
+            return {**lease, "released": True}
+
+        self._update_lease(release)
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def interrupted_jobs(root: Path) -> List[JobCheckpoint]:
+    """Checkpoints of resumable jobs that are still processing but whose owner stopped or crashed"""
+    jobs = []
+    if not root.exists():
+        return jobs
+    for directory in sorted(root.iterdir()):
+        checkpoint = JobCheckpoint(directory)
+        state = checkpoint.load() if directory.is_dir() else None
+        if (state and state.get("status") == "processing" and state.get("resumable", True)
+                and not checkpoint.leased()):
+            jobs.append(checkpoint)
+    return jobs
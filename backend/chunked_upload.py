@@ -0,0 +1,242 @@
+"""
+Resumable, parallel chunked uploads.
+
+A multipart POST to /api/upload that drops at 90% has to start again from
+zero, and a single TCP stream is slow on high-latency links. With the
+chunked protocol the client creates a session, PUTs numbered chunks in any
+order and in parallel (each with its SHA-256 in X-Chunk-SHA256), asks the
+session which chunks are still missing after a disconnect and finally
+completes it:
+
+    upload_sessions/<upload_id>/session.json   filename, size, chunk size, options
+    upload_sessions/<upload_id>/data.part      the file, preallocated to its final size
+    upload_sessions/<upload_id>/chunks/<n>     written once chunk n is verified (its SHA-256)
+
+Chunks are streamed straight to their offset in data.part, so nothing is
+buffered beyond SCANNON_UPLOAD_WRITE_KB and completing a session is a
+rename, not a copy. All state lives on disk, so chunks of one session can
+land on different prefork workers.
+
+Sessions count against the storage quota with their full size from the
+moment they are created (data.part is preallocated), a client can have at
+most SCANNON_UPLOAD_MAX_SESSIONS open at once, and sessions that received
+nothing for SCANNON_UPLOAD_SESSION_HOURS are removed by the storage janitor.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+
+CHUNK_SIZE_MB = float(os.getenv("SCANNON_UPLOAD_CHUNK_MB", "8"))  # default chunk size offered to clients
+MAX_CHUNK_MB = float(os.getenv("SCANNON_UPLOAD_MAX_CHUNK_MB", "64"))
+SESSION_HOURS = float(os.getenv("SCANNON_UPLOAD_SESSION_HOURS", "24"))
+MAX_SESSIONS_PER_CLIENT = int(os.getenv("SCANNON_UPLOAD_MAX_SESSIONS", "4"))
+WRITE_BYTES = int(os.getenv("SCANNON_UPLOAD_WRITE_KB", "1024")) * 1024
+
+_UPLOAD_ID = re.compile(r"[0-9a-f]{32}")
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+class UploadError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class UploadSession:
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.path = self.directory / "session.json"
+        self.data_path = self.directory / "data.part"
+        self.chunks_dir = self.directory / "chunks"
+
+    @property
+    def upload_id(self) -> str:
+        return self.directory.name
+
+    @classmethod
+    def create(cls, root: Path, filename: str, content_type: str, size: int,
+               chunk_size: Optional[int] = None, options: Optional[dict] = None,
+               client: str = "anonymous") -> "UploadSession":
+        chunk_size = chunk_size or int(CHUNK_SIZE_MB * 1024 * 1024)
+        if not 0 < chunk_size <= MAX_CHUNK_MB * 1024 * 1024:
+            raise UploadError(400, f"chunk_size must be between 1 byte and {MAX_CHUNK_MB:g} MB")
+        session = cls(Path(root) / uuid.uuid4().hex)
+        session.chunks_dir.mkdir(parents=True)
+        with open(session.data_path, "wb") as f:
+            f.truncate(size)  # sparse: chunks are written at their offsets
+        state = {
+            "filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "chunk_size": chunk_size,
+            "total_chunks": max(1, -(-size // chunk_size)),
+            "options": options or {},
+            "client": client,
+            "created": time.time(),
+        }
+        temporary = session.path.with_suffix(".tmp")
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+        os.replace(temporary, session.path)
+        return session
+
+    @classmethod
+    def open(cls, root: Path, upload_id: str) -> "UploadSession":
+        if not _UPLOAD_ID.fullmatch(upload_id):
+            raise UploadError(404, "Upload not found")
+        session = cls(Path(root) / upload_id)
+        if session.load() is None:
+            raise UploadError(404, "Upload not found")
+        return session
+
+    def load(self) -> Optional[dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def last_activity(self) -> float:
+        """When the session was created or last received a chunk"""
+        times = []
+        for path in (self.path, self.data_path, self.chunks_dir):
+            try:
+                times.append(os.stat(path).st_mtime)
+            except FileNotFoundError:
+                pass
+        return max(times) if times else 0.0
+
+    def is_stale(self, max_age_seconds: float = SESSION_HOURS * 3600) -> bool:
+        return time.time() - self.last_activity() > max_age_seconds
+
+    def received(self) -> List[int]:
+        try:
+            return sorted(int(name) for name in os.listdir(self.chunks_dir) if name.isdigit())
+        except FileNotFoundError:
+            return []
+
+    def status(self) -> dict:
+        state = self.load()
+        if state is None:
+            raise UploadError(404, "Upload not found")
+        received = self.received()
+        done = set(received)
+        return {
+            "upload_id": self.upload_id,
+            "filename": state["filename"],
+            "size": state["size"],
+            "chunk_size": state["chunk_size"],
+            "total_chunks": state["total_chunks"],
+            "received": len(received),
+            "missing": [i for i in range(state["total_chunks"]) if i not in done],
+        }
+
+    async def write_chunk(self, index: int, body: AsyncIterator[bytes], sha256: Optional[str]) -> dict:
+        """Stream chunk `index` to its offset in data.part and mark it received once its hash matches"""
+        state = self.load()
+        if state is None:
+            raise UploadError(404, "Upload not found")
+        if not 0 <= index < state["total_chunks"]:
+            raise UploadError(400, f"Chunk index must be between 0 and {state['total_chunks'] - 1}")
+        sha256 = (sha256 or "").strip().lower()
+        if not _SHA256.fullmatch(sha256):
+            raise UploadError(400, "X-Chunk-SHA256 header with the chunk's hex SHA-256 is required")
+
+        marker = self.chunks_dir / str(index)
+        if marker.exists():
+            # Retry of a chunk that already arrived (e.g. the response was lost)
+            if marker.read_text() == sha256:
+                return {"index": index, "status": "already_received"}
+            raise UploadError(409, f"Chunk {index} was already received with a different hash")
+
+        offset = index * state["chunk_size"]
+        expected = min(state["chunk_size"], state["size"] - offset)
+        digest = hashlib.sha256()
+        received = 0
+        pending = bytearray()
+        fd = os.open(self.data_path, os.O_WRONLY)
+        try:
+            async for piece in body:
+                received += len(piece)
+                if received > expected:
+                    raise UploadError(413, f"Chunk {index} must be {expected} bytes")
+                digest.update(piece)
+                pending += piece
+                if len(pending) >= WRITE_BYTES:
+                    await asyncio.to_thread(os.pwrite, fd, bytes(pending), offset)
+                    offset += len(pending)
+                    pending.clear()
+            if pending:
+                await asyncio.to_thread(os.pwrite, fd, bytes(pending), offset)
+        finally:
+            os.close(fd)
+        if received != expected:
+            raise UploadError(400, f"Chunk {index} must be {expected} bytes, got {received}")
+        if digest.hexdigest() != sha256:
+            raise UploadError(422, f"Chunk {index} does not match its SHA-256, send it again")
+
+        temporary = marker.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        temporary.write_text(sha256)
+        os.replace(temporary, marker)
+        return {"index": index, "status": "received"}
+
+    def complete(self, destination: Path) -> dict:
+        """Move the assembled file to `destination` and drop the session; returns the session state"""
+        state = self.load()
+        if state is None:
+            raise UploadError(404, "Upload not found")
+        missing = self.status()["missing"]
+        if missing:
+            raise UploadError(409, f"{len(missing)} chunks are missing: {missing[:20]}")
+        try:
+            with open(self.data_path, "rb+") as f:
+                os.fsync(f.fileno())
+            os.replace(self.data_path, destination)
+        except FileNotFoundError:
+            raise UploadError(409, "Upload is already being completed")
+        except OSError:
+            shutil.move(str(self.data_path), str(destination))  # sessions on another filesystem
+        self.remove()
+        return state
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def expire_sessions(root: Path, max_age_seconds: float = SESSION_HOURS * 3600) -> int:
+    """Remove sessions that received nothing for `max_age_seconds`"""
+    removed = 0
+    if not Path(root).exists():
+        return removed
+    for directory in Path(root).iterdir():
+        session = UploadSession(directory)
+        if directory.is_dir() and session.is_stale(max_age_seconds):
+            session.remove()
+            removed += 1
+    return removed
+
+
+def session_in_use(path: str) -> bool:
+    """Storage manager check: a session still receiving chunks is not evicted"""
+    return not UploadSession(Path(path)).is_stale()
+
+
+def open_sessions(root: Path, client: str) -> int:
+    """Sessions of `client` that are not stale yet"""
+    count = 0
+    if not Path(root).exists():
+        return count
+    for directory in Path(root).iterdir():
+        session = UploadSession(directory)
+        state = session.load()
+        if state and state.get("client") == client and not session.is_stale():
+            count += 1
+    return count
@@ -0,0 +1,277 @@
+"""
+Video encoder backends for SCANNON.AI processed output.
+
+The default backend pipes raw BGR frames into a local ffmpeg process that
+encodes H.264 with multi-threaded libx264, copies the original audio track
+and keeps the exact (rational) source frame rate. When ffmpeg is not
+installed we fall back to OpenCV's VideoWriter (mp4v, then XVID/AVI).
+"""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from fractions import Fraction
+from typing import List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# Encoder configuration (override through environment variables)
+FFMPEG_BIN = os.getenv("SCANNON_FFMPEG", "ffmpeg")
+FFPROBE_BIN = os.getenv("SCANNON_FFPROBE", "ffprobe")
+ENCODER_BACKEND = os.getenv("SCANNON_ENCODER", "auto")  # auto | ffmpeg | opencv
+X264_PRESET = os.getenv("SCANNON_X264_PRESET", "veryfast")
+X264_CRF = int(os.getenv("SCANNON_X264_CRF", "23"))
+ENCODER_THREADS = int(os.getenv("SCANNON_ENCODER_THREADS", "0"))  # 0 = let x264 decide
+
+# Audio codecs that can be stream-copied into an MP4 container as-is
+MP4_AUDIO_COPY_CODECS = {'aac', 'mp3', 'ac3', 'eac3', 'alac', 'opus', 'flac'}
+
+DEFAULT_FPS = Fraction(30)
+
+
+def ffmpeg_available():
+    """Return True when the ffmpeg binary can be found"""
+    return shutil.which(FFMPEG_BIN) is not None
+
+
+def ffprobe_available():
+    """Return True when the ffprobe binary can be found"""
+    return shutil.which(FFPROBE_BIN) is not None
+
+
+def fps_to_fraction(fps) -> Fraction:
+    """
+    Convert a float frame rate reported by OpenCV into an exact fraction
+    (29.97002997 -> 30000/1001, 25.0 -> 25/1)
+    """
+    if not fps or fps <= 0 or fps != fps:
+        return DEFAULT_FPS
+    return Fraction(fps).limit_denominator(1001)
+
+
+def probe_video(input_path: str) -> dict:
+    """
+    Probe the frame rate and audio codec of a video.
+    Uses ffprobe when available (exact rational rate), otherwise OpenCV.
+    Returns {'fps': Fraction, 'audio_codec': str or None}
+    audio_codec is "unknown" when the streams could not be inspected.
+    """
+    info = {"fps": None, "audio_codec": None}
+
+    if ffprobe_available():
+        try:
+            result = subprocess.run(
+                [FFPROBE_BIN, "-v", "error", "-show_streams", "-of", "json", input_path],
+                capture_output=True, text=True, timeout=30, check=True
+            )
+            for stream in json.loads(result.stdout).get("streams", []):
+                if stream.get("codec_type") == "video" and info["fps"] is None:
+                    rate = stream.get("avg_frame_rate") or stream.get("r_frame_rate")
+                    if rate and rate != "0/0":
+                        info["fps"] = Fraction(rate)
+                elif stream.get("codec_type") == "audio" and info["audio_codec"] is None:
+                    info["audio_codec"] = stream.get("codec_name")
+        except Exception as e:
+            print(f"ffprobe failed for {input_path}: {e}")
+            info["audio_codec"] = "unknown"
+    else:
+        info["audio_codec"] = "unknown"
+
+    if info["fps"] is None:
+        cap = cv2.VideoCapture(input_path)
+        info["fps"] = fps_to_fraction(cap.get(cv2.CAP_PROP_FPS))
+        cap.release()
+
+    return info
+
+
+def _audio_arguments(audio_source: Optional[str], audio_codec: Optional[str], audio_start: float = 0.0) -> List[str]:
+    """
+    ffmpeg arguments adding the first audio track of `audio_source` as input 1
+    (video is input 0), from `audio_start` seconds on (sub-clips)
+    """
+    if not (audio_source and audio_codec):
+        return []
+    arguments = ["-ss", f"{audio_start:.6f}"] if audio_start > 0 else []
+    arguments += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?"]
+    if audio_codec in MP4_AUDIO_COPY_CODECS:
+        arguments += ["-c:a", "copy"]
+    else:
+        # e.g. PCM from .mov/.avi cannot live in MP4 - transcode audio only
+        arguments += ["-c:a", "aac", "-b:a", "160k"]
+    return arguments + ["-shortest"]
+
+
+class FFmpegVideoWriter:
+    """
+    cv2.VideoWriter-compatible writer that pipes raw frames to ffmpeg.
+    Supports isOpened(), write(frame) and release().
+    """
+
+    def __init__(self, output_path: str, fps: Fraction, size: Tuple[int, int],
+                 audio_source: Optional[str] = None, audio_codec: Optional[str] = None, audio_start: float = 0.0,
+                 preset: str = X264_PRESET, crf: int = X264_CRF, threads: int = ENCODER_THREADS):
+        self.output_path = output_path
+        self.size = size
+        self.error = None
+        self._stderr = tempfile.TemporaryFile()
+
+        width, height = size
+        fps = Fraction(fps)
+        command = [
+            FFMPEG_BIN, "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}",
+            "-framerate", f"{fps.numerator}/{fps.denominator}",
+            "-i", "pipe:0",
+        ]
+
+        command += _audio_arguments(audio_source, audio_codec, audio_start)
+
+        # yuv420p needs even dimensions
+        if width % 2 or height % 2:
+            command += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+
+        command += [
+            "-c:v", "libx264",
+            "-preset", preset,
+            "-crf", str(crf),
+            "-threads", str(threads),
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            output_path,
+        ]
+
+        try:
+            self._proc = subprocess.Popen(
+                command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=self._stderr,
+            )
+        except OSError as e:
+            self._proc = None
+            self.error = str(e)
+
+    def isOpened(self):
+        return self._proc is not None and self._proc.poll() is None and self.error is None
+
+    def write(self, frame):
+        if self.error is not None or self._proc is None:
+            return
+        if frame.shape[1] != self.size[0] or frame.shape[0] != self.size[1]:
+            frame = cv2.resize(frame, self.size)
+        try:
+            self._proc.stdin.write(memoryview(np.ascontiguousarray(frame)))
+        except (BrokenPipeError, ValueError) as e:
+            self.error = f"ffmpeg pipe closed: {e}"
+
+    def release(self):
+        if self._proc is None:
+            return
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._proc.wait()
+        if returncode != 0:
+            self._stderr.seek(0)
+            stderr = self._stderr.read().decode("utf-8", errors="replace").strip()
+            self.error = f"ffmpeg exited with code {returncode}: {stderr[-500:]}"
+        self._stderr.close()
+        self._proc = None
+
+    def abort(self):
+        """Stop encoding without finalizing the output (cancelled jobs)"""
+        if self._proc is None:
+            return
+        self._proc.kill()
+        try:
+            self._proc.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        self._proc.wait()
+        self._stderr.close()
+        self._proc = None
+
+
+def open_opencv_writer(output_path: str, fps: Fraction, size: Tuple[int, int]):
+    """
+    Legacy OpenCV writer: mp4v codec, falling back to XVID/AVI
+    Returns (writer, actual_output_path)
+    """
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    out = cv2.VideoWriter(output_path, fourcc, float(fps), size)
+
+    if not out.isOpened():
+        # Try alternative codec
+        output_path = output_path.replace('.mp4', '.avi')
+        fourcc = cv2.VideoWriter_fourcc(*'XVID')
+        out = cv2.VideoWriter(output_path, fourcc, float(fps), size)
+
+    return out, output_path
+
+
+def open_video_writer(output_path: str, fps: Fraction, size: Tuple[int, int],
+                      audio_source: Optional[str] = None, audio_codec: Optional[str] = None,
+                      audio_start: float = 0.0, backend: str = ENCODER_BACKEND):
+    """
+    Open the best available video writer.
+    Returns (writer, actual_output_path, backend_name)
+    """
+    if backend in ("auto", "ffmpeg") and ffmpeg_available():
+        writer = FFmpegVideoWriter(output_path, fps, size, audio_source=audio_source,
+                                   audio_codec=audio_codec, audio_start=audio_start)
+        if writer.isOpened():
+            return writer, output_path, "ffmpeg"
+        print(f"ffmpeg encoder failed to start ({writer.error}), falling back to OpenCV")
+    elif backend == "ffmpeg":
+        print("WARNING: ffmpeg requested but not found, falling back to OpenCV")
+
+    writer, output_path = open_opencv_writer(output_path, fps, size)
+    return writer, output_path, "opencv"
+
+
+def concat_segments(segment_paths: Sequence[str], output_path: str, fps: Fraction, size: Tuple[int, int],
+                    audio_source: Optional[str] = None, audio_codec: Optional[str] = None,
+                    stream_copy: bool = True, audio_start: float = 0.0):
+    """
+    Join separately encoded segments into one output.
+    With ffmpeg the segments are stream-copied (no re-encode) through the concat
+    demuxer and the source audio is added; otherwise the frames are decoded and
+    written again with the best available writer.
+    Returns (actual_output_path, method)
+    """
+    if stream_copy and ffmpeg_available():
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+            for path in segment_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                listing.write(f"file '{escaped}'\n")
+        try:
+            command = [FFMPEG_BIN, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", listing.name]
+            command += _audio_arguments(audio_source, audio_codec, audio_start)
+            command += ["-c:v", "copy", "-movflags", "+faststart", output_path]
+            result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        finally:
+            os.unlink(listing.name)
+        if result.returncode != 0:
+            stderr = result.stderr.decode("utf-8", errors="replace").strip()
+            raise RuntimeError(f"ffmpeg concat exited with code {result.returncode}: {stderr[-500:]}")
+        return output_path, "concat"
+
+    writer, output_path, backend = open_video_writer(output_path, fps, size, audio_source=audio_source,
+                                                     audio_codec=audio_codec, audio_start=audio_start)
+    for path in segment_paths:
+        cap = cv2.VideoCapture(path)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(frame)
+        cap.release()
+    writer.release()
+    if getattr(writer, "error", None):
+        raise RuntimeError(writer.error)
+    return output_path, f"reencode-{backend}"
@@ -0,0 +1,143 @@
+"""
+Reusable frame and scratch buffers for the per-frame loops.
+
+Every iteration of a video job used to allocate a new frame in cap.read()
+and new grey, RGB, edge and mask images in each detector, so a 1080p job
+churned through tens of MB of short-lived arrays per frame. A FramePool
+keeps idle arrays keyed by (shape, dtype):
+
+    frame = read_frame(cap, (height, width, 3))     # decoded into a pooled array
+    ...
+    out.write(frame)
+    frame_pool.release(frame)                       # back to the pool once encoded
+
+    with frame_pool.borrow(frame.shape[:2]) as gray:
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+
+At most SCANNON_FRAME_POOL_IDLE arrays per shape and SCANNON_FRAME_POOL_MB
+in total are kept; when that is exceeded the shapes that were not used for
+the longest time are dropped first (vehicle crops, odd upload sizes).
+SCANNON_FRAME_POOL=0 allocates every buffer, as before, but still counts
+them, which is what the benchmark compares against.
+
+A released array must not be used by the caller any more: only give back
+arrays that nothing else (sidecars, caches, other threads) still refers to.
+"""
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+
+FRAME_POOL = os.getenv("SCANNON_FRAME_POOL", "1") == "1"
+MAX_IDLE_PER_SHAPE = int(os.getenv("SCANNON_FRAME_POOL_IDLE", "8"))
+MAX_IDLE_MB = float(os.getenv("SCANNON_FRAME_POOL_MB", "256"))
+
+FRAME_BUFFERS = metrics.Counter("scannon_frame_pool_buffers_total",
+                                "Frame/scratch buffers handed out by the frame pool, by result (allocated, reused)")
+metrics.REGISTRY.append(FRAME_BUFFERS)
+
+Key = Tuple[Tuple[int, ...], str]
+
+
+class FramePool:
+    def __init__(self, enabled: bool = FRAME_POOL, max_idle_per_shape: int = MAX_IDLE_PER_SHAPE,
+                 max_idle_mb: float = MAX_IDLE_MB):
+        self.enabled = enabled
+        self.max_idle_per_shape = max(0, max_idle_per_shape)
+        self.max_idle_bytes = int(max_idle_mb * 1024 * 1024)
+        self._idle: "OrderedDict[Key, List[np.ndarray]]" = OrderedDict()  # least recently used first
+        self._idle_bytes = 0
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {"allocated": 0, "reused": 0, "released": 0, "dropped": 0}
+
+    def acquire(self, shape, dtype=np.uint8) -> np.ndarray:
+        """An array of `shape` with undefined contents"""
+        key = (tuple(shape), np.dtype(dtype).str)
+        array = None
+        if self.enabled:
+            with self._lock:
+                idle = self._idle.get(key)
+                if idle:
+                    array = idle.pop()
+                    self._idle_bytes -= array.nbytes
+                    self._idle.move_to_end(key)
+                    self._counts["reused"] += 1
+        if array is None:
+            array = np.empty(key[0], dtype=dtype)
+            with self._lock:
+                self._counts["allocated"] += 1
+            FRAME_BUFFERS.inc(result="allocated")
+        else:
+            FRAME_BUFFERS.inc(result="reused")
+        return array
+
+    def release(self, array: Optional[np.ndarray]):
+        """Give an array back; views and non-contiguous arrays are left to the garbage collector"""
+        if array is None or not self.enabled or not array.flags.owndata or not array.flags.c_contiguous:
+            return
+        key = (array.shape, array.dtype.str)
+        with self._lock:
+            self._counts["released"] += 1
+            idle = self._idle.setdefault(key, [])
+            self._idle.move_to_end(key)
+            if len(idle) >= self.max_idle_per_shape or array.nbytes > self.max_idle_bytes:
+                self._counts["dropped"] += 1
+                return
+            # Make room by dropping the least recently used shapes first
+            while self._idle_bytes + array.nbytes > self.max_idle_bytes:
+                oldest_key, oldest = next(iter(self._idle.items()))
+                if not oldest:
+                    del self._idle[oldest_key]
+                    continue
+                self._idle_bytes -= oldest.pop().nbytes
+                self._counts["dropped"] += 1
+            self._idle.setdefault(key, []).append(array)
+            self._idle_bytes += array.nbytes
+
+    @contextmanager
+    def borrow(self, shape, dtype=np.uint8):
+        """Scratch array for the duration of a block"""
+        array = self.acquire(shape, dtype)
+        try:
+            yield array
+        finally:
+            self.release(array)
+
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+            self._idle_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                **self._counts,
+                "idle": sum(len(idle) for idle in self._idle.values()),
+                "idle_shapes": sum(1 for idle in self._idle.values() if idle),
+                "idle_mb": round(self._idle_bytes / (1024 * 1024), 1),
+            }
+
+
+frame_pool = FramePool()
+
+
+def read_frame(cap, shape, pool: FramePool = frame_pool) -> Optional[np.ndarray]:
+    """
+    cap.read() into a pooled array of `shape` (height, width, 3); None at the
+    end of the stream. The caller releases the frame once it is encoded
+    """
+    frame = pool.acquire(shape)
+    ret, decoded = cap.read(frame)
+    if not ret:
+        pool.release(frame)
+        return None
+    if decoded is not frame:
+        # The stream's frames are not `shape` (e.g. rotation metadata): OpenCV allocated its own
+        pool.release(frame)
+    return decoded
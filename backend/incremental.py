@@ -0,0 +1,158 @@
+"""
+Dirty-rectangle incremental detection for static cameras and screen recordings.
+
+When most of the picture does not change between frames, running every
+detector over the whole frame is wasted work. An IncrementalDetector keeps,
+for every block of SCANNON_INCREMENTAL_BLOCK pixels, the picture as it was
+when that block was last analysed. For each new frame it finds the blocks
+that differ (more than SCANNON_INCREMENTAL_MIN_CHANGE of their pixels moved
+by more than SCANNON_INCREMENTAL_THRESHOLD grey levels), grows them by a
+margin and groups them into dirty rectangles.
+
+Local detectors (faces, plates, OCR) are re-run only on the dirty
+rectangles - each one first grown to cover any cached region it touches, so
+an object that moves is always seen whole - and the cached regions outside
+them are kept. Whole-frame detectors (document shapes, YOLO) are re-run
+only when something changed at all. When more than
+SCANNON_INCREMENTAL_MAX_DIRTY of the frame changed (a cut, a camera pan),
+the frame is analysed in full.
+
+Because the reference is only updated where a block was analysed, slow
+drift (lighting) adds up until it crosses the threshold instead of being
+missed frame after frame.
+"""
+import os
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from tiling import dedupe_boxes, offset_box
+
+INCREMENTAL_DEFAULT = os.getenv("SCANNON_INCREMENTAL", "0") == "1"  # default for video jobs
+BLOCK = int(os.getenv("SCANNON_INCREMENTAL_BLOCK", "32"))
+THRESHOLD = int(os.getenv("SCANNON_INCREMENTAL_THRESHOLD", "24"))
+MIN_CHANGE = float(os.getenv("SCANNON_INCREMENTAL_MIN_CHANGE", "0.01"))  # share of a block's pixels
+MARGIN_BLOCKS = int(os.getenv("SCANNON_INCREMENTAL_MARGIN", "1"))
+MAX_DIRTY = float(os.getenv("SCANNON_INCREMENTAL_MAX_DIRTY", "0.5"))
+
+Rect = Tuple[int, int, int, int]
+
+
+def _intersects(a: Rect, b: Rect) -> bool:
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+def _union(a: Rect, b: Rect) -> Rect:
+    x, y = min(a[0], b[0]), min(a[1], b[1])
+    return (x, y, max(a[0] + a[2], b[0] + b[2]) - x, max(a[1] + a[3], b[1] + b[3]) - y)
+
+
+class IncrementalDetector:
+    def __init__(self, block: int = BLOCK, threshold: int = THRESHOLD, min_change: float = MIN_CHANGE,
+                 margin: int = MARGIN_BLOCKS, max_dirty: float = MAX_DIRTY):
+        self.block = max(8, block)
+        self.threshold = threshold
+        self.min_change = min_change
+        self.margin = margin
+        self.max_dirty = max_dirty
+        self.reference: Optional[np.ndarray] = None
+        # Reused every frame; the grey buffer and the reference swap on full frames
+        self._gray: Optional[np.ndarray] = None
+        self._changed: Optional[np.ndarray] = None
+        self.dirty: List[Rect] = []
+        self.full = True
+        self.dirty_share = 1.0
+        self._regions = {}
+        self._frames = 0
+        self._full_frames = 0
+        self._static_frames = 0
+        self._analysed_share = 0.0
+
+    def start_frame(self, frame):
+        """Compare the frame with the reference and work out the dirty rectangles"""
+        height, width = frame.shape[:2]
+        if self._gray is None or self._gray.shape != (height, width):
+            self._gray = np.empty((height, width), np.uint8)
+            self._changed = np.empty((height, width), np.uint8)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        self._frames += 1
+
+        if self.reference is None or self.reference.shape != gray.shape:
+            self._set_full(gray)
+            return
+
+        rows, cols = -(-height // self.block), -(-width // self.block)
+        changed = cv2.absdiff(gray, self.reference, dst=self._changed)
+        cv2.threshold(changed, self.threshold, 255, cv2.THRESH_BINARY, dst=changed)
+        # Mean of the 0/255 mask per block = share of changed pixels
+        padded = cv2.copyMakeBorder(changed, 0, rows * self.block - height, 0, cols * self.block - width,
+                                    cv2.BORDER_CONSTANT, value=0)
+        share = cv2.resize(padded, (cols, rows), interpolation=cv2.INTER_AREA).astype(np.float32) / 255
+        mask = (share > self.min_change).astype(np.uint8)
+        if self.margin and mask.any():
+            mask = cv2.dilate(mask, np.ones((3, 3), np.uint8), iterations=self.margin)
+
+        self.dirty_share = float(mask.mean())
+        if self.dirty_share > self.max_dirty:
+            self._set_full(gray)
+            return
+
+        self.full = False
+        self.dirty = []
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        for bx, by, bw, bh, _ in stats[1:count]:
+            x, y = int(bx) * self.block, int(by) * self.block
+            rect = (x, y, min(int(bw) * self.block, width - x), min(int(bh) * self.block, height - y))
+            self.dirty.append(rect)
+            self.reference[y:y + rect[3], x:x + rect[2]] = gray[y:y + rect[3], x:x + rect[2]]
+        if not self.dirty:
+            self._static_frames += 1
+        self._analysed_share += self.dirty_share
+
+    def _set_full(self, gray):
+        # The grey buffer becomes the reference; the old reference is next frame's grey buffer
+        self.reference, self._gray = gray, self.reference
+        self.full = True
+        self.dirty = [(0, 0, gray.shape[1], gray.shape[0])]
+        self.dirty_share = 1.0
+        self._full_frames += 1
+        self._analysed_share += 1.0
+
+    def detect(self, stage: str, fn: Callable, frame, local: bool = True):
+        """
+        Regions of one detector stage for the current frame. `fn(image)` runs
+        the detector; local stages must return (x, y, w, h) boxes
+        """
+        cached = self._regions.get(stage)
+        if cached is None or self.full:
+            result = fn(frame)
+        elif not self.dirty:
+            result = cached
+        elif not local:
+            result = fn(frame)
+        else:
+            rects = []
+            for rect in self.dirty:
+                # Grow over cached regions it touches, until nothing else touches it
+                grown = True
+                while grown:
+                    grown = False
+                    for box in cached:
+                        if _intersects(rect, box) and _union(rect, box) != rect:
+                            rect, grown = _union(rect, box), True
+                rects.append(rect)
+            result = [box for box in cached if not any(_intersects(box, rect) for rect in rects)]
+            for x, y, w, h in rects:
+                result.extend(offset_box(box, x, y) for box in fn(frame[y:y + h, x:x + w]))
+            result = dedupe_boxes(result)
+        self._regions[stage] = result
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "frames": self._frames,
+            "full_frames": self._full_frames,
+            "static_frames": self._static_frames,
+            "analysed_share": round(self._analysed_share / self._frames, 3) if self._frames else 0,
+        }
@@ -0,0 +1,231 @@
+"""
+Job state shared by the worker processes of one server.
+
+prefork.py runs several workers on one listening socket, so the requests
+about one job (upload, progress polls, cancel, download) can each reach a
+different process. What a worker knows about its running jobs that another
+worker may be asked about is kept in a SQLite database next to the job
+checkpoints (jobs/state.db):
+
+  - job status as /api/progress and /api/status return it, with the job's
+    per-stage timings; status changes are written at once, progress updates
+    at most every SCANNON_STATE_SYNC_SECONDS
+  - cancel requests: DELETE /api/jobs on another worker flags the job and
+    the worker running it cancels it at its next sync
+  - the files running jobs protect from the storage janitor
+
+Every worker renews a heartbeat at each sync. Protections and cancel
+targets of a worker not seen for SCANNON_STATE_OWNER_TIMEOUT seconds are
+ignored, so the files of a crashed worker are not protected forever.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from checkpoints import owner_id
+from logs import logger
+
+SYNC_SECONDS = float(os.getenv("SCANNON_STATE_SYNC_SECONDS", "0.5"))
+OWNER_TIMEOUT = float(os.getenv("SCANNON_STATE_OWNER_TIMEOUT", "60"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS status (
+    file_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    status TEXT,
+    data TEXT NOT NULL,
+    timings TEXT,
+    cancel INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS protected (
+    owner TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (owner, path)
+);
+CREATE TABLE IF NOT EXISTS owners (
+    owner TEXT PRIMARY KEY,
+    pid INTEGER,
+    seen REAL NOT NULL
+);
+"""
+
+LIVE_OWNERS = "SELECT owner FROM owners WHERE seen >= ?"
+
+
+class JobStateStore:
+    def __init__(self, path: str, owner_timeout: float = OWNER_TIMEOUT):
+        self.path = path
+        self.owner_timeout = owner_timeout
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call: safe from any thread and across fork
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def _live_since(self) -> float:
+        return time.time() - self.owner_timeout
+
+    # Workers ---------------------------------------------------------------
+
+    def heartbeat(self):
+        """Mark this process alive; forget what processes gone for long left behind"""
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO owners (owner, pid, seen) VALUES (?, ?, ?)",
+                       (owner_id(), os.getpid(), now))
+            db.execute("DELETE FROM protected WHERE owner NOT IN (SELECT owner FROM owners WHERE seen >= ?)",
+                       (now - self.owner_timeout,))
+            db.execute("DELETE FROM owners WHERE seen < ?", (now - 10 * self.owner_timeout,))
+
+    # Status ----------------------------------------------------------------
+
+    def publish(self, entries: Iterable[Tuple[str, dict, Optional[dict], float]]):
+        """
+        Write (file_id, status, timings, taken_at) entries of jobs run by this
+        process. An entry older than the stored one is dropped, so a delayed
+        progress update cannot overwrite a later status change
+        """
+        rows = [(file_id, owner_id(), status.get("status"), json.dumps(status, default=str),
+                 json.dumps(timings) if timings is not None else None, taken_at)
+                for file_id, status, timings, taken_at in entries]
+        if not rows:
+            return
+        with self._transaction() as db:
+            db.executemany(
+                "INSERT INTO status (file_id, owner, status, data, timings, updated) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (file_id) DO UPDATE SET owner = excluded.owner, status = excluded.status,"
+                " data = excluded.data, timings = COALESCE(excluded.timings, status.timings),"
+                " updated = excluded.updated WHERE excluded.updated >= status.updated",
+                rows
+            )
+
+    @staticmethod
+    def _status(row) -> dict:
+        status = json.loads(row["data"])
+        if row["timings"] is not None:
+            status["timings"] = json.loads(row["timings"])
+        return status
+
+    def get(self, file_id: str) -> Optional[dict]:
+        """Last published status of a job (with "timings" when it has any), by any process"""
+        with self._connect() as db:
+            row = db.execute("SELECT data, timings FROM status WHERE file_id = ?", (file_id,)).fetchone()
+        return self._status(row) if row is not None else None
+
+    def find(self, name: str) -> Optional[dict]:
+        """Status of the first job whose file_id contains `name` or is contained in it"""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT data, timings FROM status WHERE instr(?, file_id) > 0 OR instr(file_id, ?) > 0"
+                " ORDER BY rowid LIMIT 1",
+                (name, name)
+            ).fetchone()
+        return self._status(row) if row is not None else None
+
+    def prune(self) -> int:
+        """Forget every job that is not processing any more (cleanup)"""
+        with self._transaction() as db:
+            return db.execute("DELETE FROM status WHERE status IS NOT 'processing'").rowcount
+
+    # Cancellation ----------------------------------------------------------
+
+    def request_cancel(self, file_id: str) -> bool:
+        """Ask the other live process running `file_id` to cancel it. False if none is"""
+        with self._transaction() as db:
+            return db.execute(
+                f"UPDATE status SET cancel = 1 WHERE file_id = ? AND status = 'processing'"
+                f" AND owner != ? AND owner IN ({LIVE_OWNERS})",
+                (file_id, owner_id(), self._live_since())
+            ).rowcount > 0
+
+    def cancel_requests(self) -> List[str]:
+        """Jobs of this process that another process was asked to cancel (each returned once)"""
+        with self._transaction() as db:
+            rows = db.execute("UPDATE status SET cancel = 0 WHERE owner = ? AND cancel = 1 RETURNING file_id",
+                              (owner_id(),)).fetchall()
+        return [row["file_id"] for row in rows]
+
+    # Protected files -------------------------------------------------------
+
+    def set_protected(self, paths: Iterable[str]):
+        """Replace the set of files this process protects from the janitor"""
+        owner = owner_id()
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO owners (owner, pid, seen) VALUES (?, ?, ?)",
+                       (owner, os.getpid(), time.time()))
+            db.execute("DELETE FROM protected WHERE owner = ?", (owner,))
+            db.executemany("INSERT OR IGNORE INTO protected (owner, path) VALUES (?, ?)",
+                           [(owner, path) for path in paths])
+
+    def is_protected(self, path: str) -> bool:
+        """Whether a live process protects `path` (absolute)"""
+        with self._connect() as db:
+            return db.execute(
+                f"SELECT 1 FROM protected WHERE path = ? AND owner IN ({LIVE_OWNERS}) LIMIT 1",
+                (path, self._live_since())
+            ).fetchone() is not None
+
+
+class SharedStatus(dict):
+    """
+    processing_status of this process: a dict of file_id -> status dict whose
+    entries are published to a JobStateStore. Replace an entry to change it
+    (`status[file_id] = {**status[file_id], ...}`); changes made inside an
+    entry are not seen. A new "status" value is published immediately, other
+    changes when the sync loop publishes `pending()`
+    """
+
+    def __init__(self, store: JobStateStore, timings: Dict[str, object]):
+        super().__init__()
+        self.store = store
+        self.timings = timings  # file_id -> StageTimings, published with the status
+        self._dirty = set()
+        self._lock = threading.Lock()  # background tasks of sync endpoints set statuses from threads
+
+    def __setitem__(self, file_id: str, status: dict):
+        previous = self.get(file_id)
+        super().__setitem__(file_id, status)
+        if previous is None or previous.get("status") != status.get("status"):
+            try:
+                self.store.publish([self._entry(file_id)])
+                return
+            except sqlite3.Error as e:
+                logger.warning(f"Could not publish the status of {file_id}, retrying at the next sync: {e}")
+        with self._lock:
+            self._dirty.add(file_id)
+
+    def _entry(self, file_id: str):
+        timings = self.timings.get(file_id)
+        return file_id, dict(self[file_id]), timings.summary() if timings is not None else None, time.time()
+
+    def pending(self) -> list:
+        """Snapshot of the entries changed since they were last published"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        return [self._entry(file_id) for file_id in dirty if file_id in self]
@@ -0,0 +1,84 @@
+"""
+Leveled, structured logging for SCANNON.AI.
+
+Per-frame detail (every detection, every rejected contour) is logged at
+DEBUG on the `scannon.frame` logger, which is silent by default so the hot
+path pays no console I/O or string formatting. Optionally one frame in N
+emits a single INFO summary line, and every job ends with one summary line.
+
+Environment variables:
+    SCANNON_LOG_LEVEL         level of the `scannon` logger (default INFO)
+    SCANNON_FRAME_LOG_LEVEL   level of per-frame detail (default WARNING = off)
+    SCANNON_LOG_SAMPLE_EVERY  log a summary for one frame in N (default 0 = off)
+    SCANNON_LOG_FORMAT        "text" (key=value) or "json"
+"""
+import json
+import logging
+import os
+import sys
+
+LOG_LEVEL = os.getenv("SCANNON_LOG_LEVEL", "INFO").upper()
+FRAME_LOG_LEVEL = os.getenv("SCANNON_FRAME_LOG_LEVEL", "WARNING").upper()
+LOG_SAMPLE_EVERY = int(os.getenv("SCANNON_LOG_SAMPLE_EVERY", "0"))
+LOG_FORMAT = os.getenv("SCANNON_LOG_FORMAT", "text").lower()
+
+
+class StructuredFormatter(logging.Formatter):
+    """Render `event` plus structured `fields` as key=value text or one JSON object per line"""
+
+    def __init__(self, fmt="text"):
+        super().__init__()
+        self.fmt = fmt
+
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        if self.fmt == "json":
+            payload = {
+                "ts": round(record.created, 3),
+                "level": record.levelname.lower(),
+                "logger": record.name,
+                "event": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                payload["exc"] = self.formatException(record.exc_info)
+            return json.dumps(payload, default=str)
+
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name} {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def _configure():
+    base = logging.getLogger("scannon")
+    if not base.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(StructuredFormatter(LOG_FORMAT))
+        base.addHandler(handler)
+        base.propagate = False
+    base.setLevel(LOG_LEVEL)
+    logging.getLogger("scannon.frame").setLevel(FRAME_LOG_LEVEL)
+    return base
+
+
+logger = _configure()
+frame_logger = logging.getLogger("scannon.frame")
+
+
+def log_event(target: logging.Logger, level: int, event: str, **fields):
+    """Emit a structured event; callers on hot paths should check isEnabledFor first"""
+    if target.isEnabledFor(level):
+        target.log(level, event, extra={"fields": fields})
+
+
+class FrameLogSampler:
+    """Decides which frames of a job get an INFO summary line (one in `every`, 0 = never)"""
+
+    def __init__(self, every: int = LOG_SAMPLE_EVERY):
+        self.every = max(0, every)
+
+    def should_log(self, frame_index: int) -> bool:
+        return self.every > 0 and frame_index % self.every == 0
@@ -1,6 +1,6 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import BackgroundTasks, FastAPI, File, Request, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import uvicorn
 import os
 import cv2
@@ -11,12 +11,44 @@ from datetime import datetime
 import asyncio
 import re
 from typing import Optional, List, Tuple
-import traceback
 import base64
+import functools
 import json
+import logging
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fractions import Fraction
 
 import importlib
 
+from broker import ACTIVE_JOB_STATUSES, POLL_SECONDS as BROKER_POLL_SECONDS, open_broker
+from chunked_upload import (MAX_SESSIONS_PER_CLIENT as UPLOAD_MAX_SESSIONS, UploadError, UploadSession,
+                            expire_sessions, open_sessions, session_in_use)
+from checkpoints import (LEASE_SECONDS as CHECKPOINT_LEASE_SECONDS, RESUME_MAX_ATTEMPTS, SEGMENT_SECONDS,
+                         JobCheckpoint, interrupted_jobs)
+from encoder import concat_segments, open_video_writer, probe_video
+import metrics
+from metrics import StageTimings, stage_timer
+from logs import FrameLogSampler, frame_logger, log_event, logger
+from zipstream import ZipStream
+from artifacts import ArtifactIndex, artifact_response
+from budget import FrameBudget, video_budget
+from framepool import frame_pool, read_frame
+from incremental import INCREMENTAL_DEFAULT, IncrementalDetector
+from pools import DetectorPool
+from scheduler import Job, JobCancelled, Scheduler
+from sidecar import LABELS, Sidecar, SidecarWriter
+import tiling
+from storage import JANITOR_INTERVAL_SECONDS, RETENTION_HOURS, STORAGE_QUOTA_MB, StorageManager
+from jobstate import SYNC_SECONDS as STATE_SYNC_SECONDS, JobStateStore, SharedStatus
+from memprofile import MEMORY_PROFILING, memory_profiler
+
+if MEMORY_PROFILING not in ("", "0"):
+    memory_profiler.enable(MEMORY_PROFILING)  # before the models load, so their allocations are traced too
+
 # AI/ML imports
 mp = None
 MEDIAPIPE_AVAILABLE = False
@@ -50,7 +82,37 @@ except ImportError:
     EASYOCR_AVAILABLE = False
     print("WARNING: EasyOCR not available. Text detection will be limited.")
 
-app = FastAPI(title="SCANNON.AI API", version="3.0.0")
+# Load testing (benchmarks/loadtest.py): no models are loaded and every detector
+# finds nothing, after SCANNON_STUB_DETECTOR_MS per frame of simulated inference,
+# so the HTTP/websocket/scheduling overhead can be measured on its own
+STUB_DETECTORS = os.getenv("SCANNON_STUB_DETECTORS", "0") == "1"
+STUB_DETECTOR_MS = float(os.getenv("SCANNON_STUB_DETECTOR_MS", "0"))
+if STUB_DETECTORS:
+    MEDIAPIPE_AVAILABLE = YOLO_AVAILABLE = EASYOCR_AVAILABLE = False
+    print("WARNING: SCANNON_STUB_DETECTORS=1 - detectors are stubbed out, nothing will be blurred.")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background tasks with the server and stop them on shutdown"""
+    # Every worker resumes checkpointed jobs whose owner stopped or crashed, and
+    # shares the progress of its jobs with the others
+    background = [asyncio.create_task(run_resume_scanner()), asyncio.create_task(run_state_sync())]
+    # With prefork.py only the first worker does housekeeping
+    if os.getenv("SCANNON_WORKER_INDEX", "0") == "0":
+        background.append(asyncio.create_task(storage_manager.run_janitor(JANITOR_INTERVAL_SECONDS)))
+        if broker is not None:
+            background.append(asyncio.create_task(run_broker_assembler()))
+    yield
+    for task in background:
+        task.cancel()
+    job_state.publish(processing_status.pending())
+    # Clean stop: uvicorn re-raises SIGTERM as soon as the server is down, before running jobs
+    # could be cancelled, so hand their leases back here and they are resumed without counting as a crash
+    for checkpoint in list(running_checkpoints):
+        checkpoint.release_lease()
+
+
+app = FastAPI(title="SCANNON.AI API", version="3.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -59,60 +121,154 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cross-origin fetch() only sees safelisted response headers unless they are exposed
+    expose_headers=["X-Scannon-Detections", "X-Scannon-File-Id", "X-Scannon-Processed-File",
+                    "Server-Timing", "Content-Disposition"],
 )
 
 # Directories
 UPLOAD_DIR = Path("uploads")
 PROCESSED_DIR = Path("processed")
+SIDECAR_DIR = Path("sidecars")  # per-job detection regions for re-rendering
+JOBS_DIR = Path("jobs")  # checkpoints and finished segments of running video jobs
+UPLOAD_SESSIONS_DIR = Path("upload_sessions")  # chunked uploads in progress
 UPLOAD_DIR.mkdir(exist_ok=True)
 PROCESSED_DIR.mkdir(exist_ok=True)
+SIDECAR_DIR.mkdir(exist_ok=True)
+JOBS_DIR.mkdir(exist_ok=True)
+UPLOAD_SESSIONS_DIR.mkdir(exist_ok=True)
+
+def job_directory_in_use(path: str) -> bool:
+    """jobs/<file_id> of a job running here, in another process (live lease) or on the worker fleet"""
+    file_id = os.path.basename(path)
+    if scheduler.get_job(file_id) is not None or JobCheckpoint(Path(path)).leased():
+        return True
+    if broker is not None:
+        job = broker.job_record(file_id)
+        return job is not None and job["status"] in ACTIVE_JOB_STATUSES
+    return False
+
+
+# Job status, cancel requests and protected files shared by the prefork.py workers
+job_state = JobStateStore(str(JOBS_DIR / "state.db"))
+
+# Disk quota / retention for everything written above; files of running jobs are protected
+storage_manager = StorageManager(
+    [UPLOAD_DIR, PROCESSED_DIR, SIDECAR_DIR],
+    quota_bytes=STORAGE_QUOTA_MB * 1024 * 1024,
+    max_age_seconds=RETENTION_HOURS * 3600,
+    unit_directories={JOBS_DIR: job_directory_in_use, UPLOAD_SESSIONS_DIR: session_in_use},
+    housekeeping=[functools.partial(expire_sessions, UPLOAD_SESSIONS_DIR)],
+    shared=job_state
+)
+
+
+def protect_job_files(task: asyncio.Task, *paths):
+    """Keep the janitor away from a background job's files until the task finishes"""
+    paths = list(paths)
+    for path in list(paths):
+        # The OpenCV fallback writes .avi next to the requested .mp4
+        if str(path).endswith('.mp4'):
+            paths.append(str(path)[:-4] + '.avi')
+    storage_manager.protect(*paths)
+    task.add_done_callback(lambda _: storage_manager.release(*paths))
+
+# Downloadable files are resolved through an index instead of probing the disk per request
+processed_index = ArtifactIndex(PROCESSED_DIR, fallback_extensions=['.mp4', '.avi', '.jpg', '.png', '.jpeg'])
+upload_index = ArtifactIndex(UPLOAD_DIR)
+
+# Batch processing settings
+BATCH_WORKERS = int(os.getenv("SCANNON_BATCH_WORKERS", str(os.cpu_count() or 4)))
+BATCH_MAX_FILES = int(os.getenv("SCANNON_BATCH_MAX_FILES", "1000"))
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff'}
+
+# /api/admin/* requires this in X-Admin-Token when set
+ADMIN_TOKEN = os.getenv("SCANNON_ADMIN_TOKEN", "")
 
-# Processing status tracking
-processing_status = {}
+# Video preview (?preview=true): small, subsampled render before the full one
+PREVIEW_HEIGHT = int(os.getenv("SCANNON_PREVIEW_HEIGHT", "360"))
+PREVIEW_FPS = float(os.getenv("SCANNON_PREVIEW_FPS", "5"))
+PREVIEW_MAX_FRAMES = int(os.getenv("SCANNON_PREVIEW_MAX_FRAMES", "150"))
+
+# Worker pool for batch image processing (OpenCV releases the GIL)
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="scannon-batch")
+
+# Priority/fair-share scheduler for all detection work, and the threads it runs on
+scheduler = Scheduler()
+compute_executor = ThreadPoolExecutor(max_workers=scheduler.slots, thread_name_prefix="scannon-compute")
+
+# Worker pool for tiled detection on high-resolution frames (see tiling.py)
+tile_executor = ThreadPoolExecutor(max_workers=tiling.TILE_WORKERS, thread_name_prefix="scannon-tile")
+
+# Distributed video jobs: segments are processed by segment_worker.py (None = process here)
+broker = open_broker()
+
+# Per-job stage latency summaries (file_id -> StageTimings)
+job_timings = {}
+
+# Processing status of the jobs run here, published to job_state for the other workers
+processing_status = SharedStatus(job_state, job_timings)
+
+# Checkpoints of the video jobs this process is running (and holds the lease of)
+running_checkpoints = set()
 
 # Initialize AI models
 print("Loading AI models...")
 
+# The model objects below are not reentrant: every caller checks an instance out
+# of a bounded per-model pool. One instance of each is created here (so preforked
+# workers share it), more are created lazily under concurrent load.
+POOL_SIZE_MEDIAPIPE = int(os.getenv("SCANNON_POOL_MEDIAPIPE", str(min(4, os.cpu_count() or 1))))
+POOL_SIZE_YOLO = int(os.getenv("SCANNON_POOL_YOLO", "1"))
+POOL_SIZE_OCR = int(os.getenv("SCANNON_POOL_OCR", "1"))
+
+
+def create_face_detector():
+    return mp.solutions.face_detection.FaceDetection(
+        model_selection=1,  # 1 for full-range detection (0-5m), 0 for short-range (2m)
+        min_detection_confidence=0.5
+    )
+
+
+def create_yolo_model():
+    # Using YOLOv8n (nano) for speed, can upgrade to yolov8s/m/l for better accuracy
+    return YOLO('yolov8n.pt')
+
+
+def create_ocr_reader():
+    # English only for speed, add more languages as needed
+    reader_class = getattr(easyocr, "Reader", None)
+    if reader_class is None:
+        raise ImportError("EasyOCR Reader class is unavailable")
+    return reader_class(['en'], gpu=False)
+
+
+face_pool = DetectorPool("mediapipe", create_face_detector, POOL_SIZE_MEDIAPIPE)
+yolo_pool = DetectorPool("yolo", create_yolo_model, POOL_SIZE_YOLO)
+ocr_pool = DetectorPool("easyocr", create_ocr_reader, POOL_SIZE_OCR)
+
 # MediaPipe Face Detection
-mp_face_detection = None
-mp_face_mesh = None
 if MEDIAPIPE_AVAILABLE and mp is not None:
     try:
-        mp_face_detection = mp.solutions.face_detection.FaceDetection(
-            model_selection=1,  # 1 for full-range detection (0-5m), 0 for short-range (2m)
-            min_detection_confidence=0.5
-        )
-        mp_face_mesh = mp.solutions.face_mesh.FaceMesh(
-            static_image_mode=False,
-            max_num_faces=10,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        face_pool.preload()
         print("✓ MediaPipe Face Detection loaded")
     except Exception as e:
         print(f"✗ MediaPipe initialization failed: {e}")
         MEDIAPIPE_AVAILABLE = False
 
 # YOLOv8 for object detection (ID cards, screens, license plates, documents, phones)
-yolo_model = None
 if YOLO_AVAILABLE and YOLO is not None:
     try:
-        # Using YOLOv8n (nano) for speed, can upgrade to yolov8s/m/l for better accuracy
-        yolo_model = YOLO('yolov8n.pt')
+        yolo_pool.preload()
         print("✓ YOLOv8 Object Detection loaded")
     except Exception as e:
         print(f"✗ YOLOv8 initialization failed: {e}")
         YOLO_AVAILABLE = False
 
 # EasyOCR for text detection
-ocr_reader = None
 if EASYOCR_AVAILABLE:
     try:
-        # English only for speed, add more languages as needed
-        reader_class = getattr(easyocr, "Reader", None)
-        if reader_class is None:
-            raise ImportError("EasyOCR Reader class is unavailable")
-        ocr_reader = reader_class(['en'], gpu=False)
+        ocr_pool.preload()
         print("✓ EasyOCR Text Detection loaded")
     except Exception as e:
         print(f"✗ EasyOCR initialization failed: {e}")
@@ -124,6 +280,11 @@ EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b
 SSN_PATTERN = re.compile(r'\b\d{3}-\d{2}-\d{4}\b')
 CREDIT_CARD_PATTERN = re.compile(r'\b\d{4}[-\s]?\d{4}[-\s]?\d{4}[-\s]?\d{4}\b')
 
+# License plate search: "vehicle" scans only YOLO vehicle boxes (full frame when
+# YOLO is unavailable), "full" always scans the whole frame
+PLATE_MODE = os.getenv("SCANNON_PLATE_MODE", "vehicle")
+PLATE_VEHICLE_MARGIN = float(os.getenv("SCANNON_PLATE_VEHICLE_MARGIN", "0.15"))
+
 # YOLOv8 COCO class IDs for privacy-relevant objects
 PRIVACY_CLASSES = {
     'cell phone': 67,
@@ -135,47 +296,55 @@ PRIVACY_CLASSES = {
     'book': 73,
 }
 
+def _faces_in_frame(face_detection, frame, debug: bool):
+    """Run one MediaPipe detector instance on a BGR frame, return padded (x, y, w, h) boxes"""
+    faces = []
+    # Convert BGR to RGB
+    with frame_pool.borrow(frame.shape) as rgb_frame:
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb_frame)
+        results = face_detection.process(rgb_frame)
+    
+    if results.detections:
+        h, w, _ = frame.shape
+        for detection in results.detections:
+            bbox = detection.location_data.relative_bounding_box
+            x = int(bbox.xmin * w)
+            y = int(bbox.ymin * h)
+            width = int(bbox.width * w)
+            height = int(bbox.height * h)
+            
+            # Add padding for better coverage
+            padding = int(min(width, height) * 0.2)
+            x = max(0, x - padding)
+            y = max(0, y - padding)
+            width = min(w - x, width + 2 * padding)
+            height = min(h - y, height + 2 * padding)
+            
+            faces.append((x, y, width, height))
+            if debug:
+                log_event(frame_logger, logging.DEBUG, "face_detected", box=(x, y, width, height))
+    return faces
+
+
 def detect_faces_mediapipe(frame):
     """
     Detect faces using MediaPipe (much more accurate than Haar Cascades)
     Returns list of (x, y, w, h) tuples
     """
-    faces = []
+    debug = frame_logger.isEnabledFor(logging.DEBUG)
     
-    if not MEDIAPIPE_AVAILABLE or mp_face_detection is None:
-        print("WARNING: MediaPipe not available for face detection")
-        return faces
+    if not MEDIAPIPE_AVAILABLE:
+        if debug:
+            log_event(frame_logger, logging.DEBUG, "faces_skipped", reason="mediapipe_unavailable")
+        return []
     
     try:
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = mp_face_detection.process(rgb_frame)
-        
-        if results.detections:
-            h, w, _ = frame.shape
-            for detection in results.detections:
-                bbox = detection.location_data.relative_bounding_box
-                x = int(bbox.xmin * w)
-                y = int(bbox.ymin * h)
-                width = int(bbox.width * w)
-                height = int(bbox.height * h)
-                
-                # Add padding for better coverage
-                padding = int(min(width, height) * 0.2)
-                x = max(0, x - padding)
-                y = max(0, y - padding)
-                width = min(w - x, width + 2 * padding)
-                height = min(h - y, height + 2 * padding)
-                
-                faces.append((x, y, width, height))
-                print(f"✓ Face detected at ({x}, {y}, {width}, {height})")
-        else:
-            print("No faces detected by MediaPipe")
+        with face_pool.checkout() as face_detection:
+            return _faces_in_frame(face_detection, frame, debug)
     except Exception as e:
-        print(f"MediaPipe face detection error: {e}")
-        traceback.print_exc()
-    
-    return faces
+        logger.exception(f"MediaPipe face detection error: {e}")
+        metrics.record_error("faces")
+        return []
 
 
 def merge_overlapping_rectangles(rectangles, overlap_threshold=0.3):
@@ -227,12 +396,16 @@ def merge_overlapping_rectangles(rectangles, overlap_threshold=0.3):
     return merged
 
 
-def apply_blur(frame, x, y, w, h, blur_type="gaussian", intensity=99):
+BLUR_TYPES = ("gaussian", "pixelate", "median", "solid")
+
+
+def apply_blur(frame, x, y, w, h, blur_type="gaussian", intensity=99, padding=0.1):
     """
-    Apply blur to a region of the frame with different blur types
+    Apply blur to a region of the frame with different blur types, in place
+    `padding` grows the region by that fraction of its shorter side
     """
     # Add padding to blur area for better coverage
-    padding = int(min(w, h) * 0.1)
+    padding = int(min(w, h) * padding)
     x = max(0, x - padding)
     y = max(0, y - padding)
     w = min(frame.shape[1] - x, w + 2 * padding)
@@ -243,25 +416,25 @@ def apply_blur(frame, x, y, w, h, blur_type="gaussian", intensity=99):
     if region.size == 0:
         return frame
     
+    # `region` is a view of the frame: results are written straight into it (dst=)
     if blur_type == "gaussian":
         # Strong Gaussian blur
         kernel_size = intensity if intensity % 2 == 1 else intensity + 1
-        blurred = cv2.GaussianBlur(region, (kernel_size, kernel_size), 30)
+        cv2.GaussianBlur(region, (kernel_size, kernel_size), 30, dst=region)
     elif blur_type == "pixelate":
         # Pixelation effect
         temp = cv2.resize(region, (10, 10), interpolation=cv2.INTER_LINEAR)
-        blurred = cv2.resize(temp, (w, h), interpolation=cv2.INTER_NEAREST)
+        cv2.resize(temp, (w, h), dst=region, interpolation=cv2.INTER_NEAREST)
     elif blur_type == "median":
         # Median blur
         kernel_size = intensity if intensity % 2 == 1 else intensity + 1
-        blurred = cv2.medianBlur(region, min(kernel_size, 99))
+        cv2.medianBlur(region, min(kernel_size, 99), dst=region)
     elif blur_type == "solid":
         # Solid color block
-        blurred = np.full_like(region, [50, 50, 50])
+        region[:] = (50, 50, 50)
     else:
-        blurred = cv2.GaussianBlur(region, (99, 99), 30)
+        cv2.GaussianBlur(region, (99, 99), 30, dst=region)
     
-    frame[y:y+h, x:x+w] = blurred
     return frame
 
 
@@ -272,13 +445,15 @@ def detect_text_with_ocr(frame):
     Returns list of (x, y, w, h) tuples for regions containing sensitive text
     """
     text_regions = []
+    debug = frame_logger.isEnabledFor(logging.DEBUG)
     
-    if not EASYOCR_AVAILABLE or ocr_reader is None:
+    if not EASYOCR_AVAILABLE:
         return text_regions
     
     try:
         # Run OCR on frame
-        results = ocr_reader.readtext(frame)
+        with ocr_pool.checkout() as ocr_reader:
+            results = ocr_reader.readtext(frame)
         
         # Check if this looks like an official document
         all_text = " ".join([text for (_, text, _) in results]).lower()
@@ -294,50 +469,47 @@ def detect_text_with_ocr(frame):
         
         is_official_document = any(keyword in all_text for keyword in official_keywords)
         
-        if is_official_document:
-            print(f"⚠️ OFFICIAL DOCUMENT DETECTED - Blurring ALL text")
+        if is_official_document and debug:
+            log_event(frame_logger, logging.DEBUG, "official_document", texts=len(results))
         
         for (bbox, text, confidence) in results:
             if confidence < 0.3:  # Skip low confidence detections
                 continue
             
             # Check if text contains sensitive information
-            is_sensitive = False
+            # (the matched text itself is never logged - it is the sensitive data)
+            reason = None
             
             # If this is an official document, blur EVERYTHING
             if is_official_document:
-                is_sensitive = True
-                print(f"Blurring text: '{text}' (official document)")
+                reason = "official_document"
             else:
                 # Check for phone numbers
                 if PHONE_PATTERN.search(text):
-                    is_sensitive = True
-                    print(f"Blurring phone number: '{text}'")
+                    reason = "phone"
                 
                 # Check for emails
                 if EMAIL_PATTERN.search(text):
-                    is_sensitive = True
-                    print(f"Blurring email: '{text}'")
+                    reason = "email"
                 
                 # Check for SSN
                 if SSN_PATTERN.search(text):
-                    is_sensitive = True
-                    print(f"Blurring SSN: '{text}'")
+                    reason = "ssn"
                 
                 # Check for credit cards
                 if CREDIT_CARD_PATTERN.search(text):
-                    is_sensitive = True
-                    print(f"Blurring credit card: '{text}'")
+                    reason = "credit_card"
                 
                 # Check for keywords that might indicate sensitive info
                 sensitive_keywords = ['password', 'ssn', 'social security', 'credit card', 
                                     'account', 'pin', 'confidential', 'private', 'name',
                                     'address', 'date of birth', 'dob', 'age', 'father', 'mother']
                 if any(keyword in text.lower() for keyword in sensitive_keywords):
-                    is_sensitive = True
-                    print(f"Blurring sensitive keyword: '{text}'")
+                    reason = "keyword"
             
-            if is_sensitive:
+            if reason is not None:
+                if debug:
+                    log_event(frame_logger, logging.DEBUG, "sensitive_text", reason=reason, confidence=round(confidence, 2))
                 # Get bounding box coordinates
                 top_left = tuple(map(int, bbox[0]))
                 bottom_right = tuple(map(int, bbox[2]))
@@ -355,53 +527,87 @@ def detect_text_with_ocr(frame):
                 text_regions.append((x, y, w, h))
     
     except Exception as e:
-        print(f"OCR text detection error: {e}")
-        traceback.print_exc()
+        logger.exception(f"OCR text detection error: {e}")
+        metrics.record_error("ocr")
     
     return text_regions
 
 
-def detect_license_plates(frame):
+def _find_plate_candidates(frame, offset_x=0, offset_y=0, debug=False):
     """
-    Detect license plates using edge detection and contour analysis
+    Edge + contour plate search over one image (full frame or a vehicle crop)
+    Returned boxes are shifted by (offset_x, offset_y) into full-frame coordinates
     """
     plates = []
     
-    try:
+    with frame_pool.borrow(frame.shape[:2]) as gray, frame_pool.borrow(frame.shape[:2]) as blurred:
         # Convert to grayscale
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
         
         # Apply bilateral filter to reduce noise while keeping edges sharp
-        blurred = cv2.bilateralFilter(gray, 11, 17, 17)
+        cv2.bilateralFilter(gray, 11, 17, 17, dst=blurred)
         
-        # Edge detection
-        edges = cv2.Canny(blurred, 30, 200)
+        # Edge detection (into the grayscale buffer, which is no longer needed)
+        edges = cv2.Canny(blurred, 30, 200, edges=gray)
         
-        # Find contours
-        contours, _ = cv2.findContours(edges.copy(), cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Sort contours by area (largest first)
-        contours = sorted(contours, key=cv2.contourArea, reverse=True)[:30]
+        # Find contours (OpenCV >= 3.2 leaves the source image untouched)
+        contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    
+    # Sort contours by area (largest first)
+    contours = sorted(contours, key=cv2.contourArea, reverse=True)[:30]
+    
+    for contour in contours:
+        # Approximate the contour
+        peri = cv2.arcLength(contour, True)
+        approx = cv2.approxPolyDP(contour, 0.018 * peri, True)
         
-        for contour in contours:
-            # Approximate the contour
-            peri = cv2.arcLength(contour, True)
-            approx = cv2.approxPolyDP(contour, 0.018 * peri, True)
+        # License plates typically have 4 corners (rectangular)
+        if len(approx) == 4:
+            x, y, w, h = cv2.boundingRect(approx)
+            aspect_ratio = w / float(h) if h > 0 else 0
             
-            # License plates typically have 4 corners (rectangular)
-            if len(approx) == 4:
-                x, y, w, h = cv2.boundingRect(approx)
-                aspect_ratio = w / float(h) if h > 0 else 0
-                
-                # License plates typically have aspect ratio between 2 and 6
-                # Also check minimum size to avoid small rectangles
-                if 1.5 < aspect_ratio < 6 and w > 60 and h > 20:
-                    plates.append((x, y, w, h))
-                    print(f"✓ License plate candidate detected at ({x}, {y}, {w}, {h}) - aspect ratio: {aspect_ratio:.2f}")
+            # License plates typically have aspect ratio between 2 and 6
+            # Also check minimum size to avoid small rectangles
+            if 1.5 < aspect_ratio < 6 and w > 60 and h > 20:
+                plates.append((x + offset_x, y + offset_y, w, h))
+                if debug:
+                    log_event(frame_logger, logging.DEBUG, "plate_candidate",
+                              box=(x + offset_x, y + offset_y, w, h), aspect_ratio=round(aspect_ratio, 2))
+    
+    return plates
+
+
+def detect_license_plates(frame, vehicle_boxes=None):
+    """
+    Detect license plates using edge detection and contour analysis
+    With `vehicle_boxes` ((x, y, w, h) from YOLO) only the enlarged vehicle
+    areas are searched; None means scan the whole frame
+    """
+    plates = []
+    debug = frame_logger.isEnabledFor(logging.DEBUG)
+    
+    try:
+        if vehicle_boxes is None:
+            return _find_plate_candidates(frame, debug=debug)
+        
+        frame_h, frame_w = frame.shape[:2]
+        for (vx, vy, vw, vh) in vehicle_boxes:
+            # Enlarge the vehicle box - plates sit on bumpers at the box edge
+            margin_x = int(vw * PLATE_VEHICLE_MARGIN)
+            margin_y = int(vh * PLATE_VEHICLE_MARGIN)
+            x1, y1 = max(0, vx - margin_x), max(0, vy - margin_y)
+            x2, y2 = min(frame_w, vx + vw + margin_x), min(frame_h, vy + vh + margin_y)
+            if x2 - x1 < 60 or y2 - y1 < 20:
+                continue
+            plates.extend(_find_plate_candidates(frame[y1:y2, x1:x2], x1, y1, debug=debug))
+        
+        # Overlapping vehicle boxes can find the same plate twice
+        if len(vehicle_boxes) > 1:
+            plates = merge_overlapping_rectangles(plates)
     
     except Exception as e:
-        print(f"License plate detection error: {e}")
-        traceback.print_exc()
+        logger.exception(f"License plate detection error: {e}")
+        metrics.record_error("plates")
     
     return plates
 
@@ -412,50 +618,55 @@ def detect_document_shapes(frame):
     Ignores dark objects like cars, furniture, etc.
     """
     documents = []
+    debug = frame_logger.isEnabledFor(logging.DEBUG)
     
     try:
         h, w = frame.shape[:2]
         frame_area = h * w
         
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Focus on LIGHT regions (paper is usually white/cream/light gray)
-        # Threshold to find bright regions
-        _, light_mask = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
-        
-        # Find contours in light regions only
-        contours, _ = cv2.findContours(light_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        contours = sorted(contours, key=cv2.contourArea, reverse=True)[:30]
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
+        with frame_pool.borrow((h, w)) as gray, frame_pool.borrow((h, w)) as light_mask:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
             
-            # Skip very small regions (less than 3% of frame)
-            if area < frame_area * 0.03:
-                continue
+            # Focus on LIGHT regions (paper is usually white/cream/light gray)
+            # Threshold to find bright regions
+            cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY, dst=light_mask)
             
-            peri = cv2.arcLength(contour, True)
-            approx = cv2.approxPolyDP(contour, 0.03 * peri, True)
+            # Find contours in light regions only
+            contours, _ = cv2.findContours(light_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            contours = sorted(contours, key=cv2.contourArea, reverse=True)[:30]
             
-            # Accept 4-sided polygons (documents)
-            if len(approx) == 4:
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = w / float(h) if h > 0 else 0
+            for contour in contours:
+                area = cv2.contourArea(contour)
                 
-                # Check if the region is actually light-colored (paper-like)
-                roi = gray[y:y+h, x:x+w]
-                mean_brightness = cv2.mean(roi)[0]
+                # Skip very small regions (less than 3% of frame)
+                if area < frame_area * 0.03:
+                    continue
                 
-                # Paper documents: light colored (brightness > 120) and reasonable aspect ratio
-                if mean_brightness > 120 and 0.5 < aspect_ratio < 2.5 and area > 10000:
-                    documents.append((x, y, w, h))
-                    print(f"✓ PAPER DOCUMENT DETECTED: ({x}, {y}, {w}, {h}) - ratio: {aspect_ratio:.2f}, brightness: {mean_brightness:.0f}")
-                else:
-                    print(f"✗ Rejected (too dark or wrong shape): brightness={mean_brightness:.0f}, ratio={aspect_ratio:.2f}")
+                peri = cv2.arcLength(contour, True)
+                approx = cv2.approxPolyDP(contour, 0.03 * peri, True)
+                
+                # Accept 4-sided polygons (documents)
+                if len(approx) == 4:
+                    x, y, w, h = cv2.boundingRect(contour)
+                    aspect_ratio = w / float(h) if h > 0 else 0
+                    
+                    # Check if the region is actually light-colored (paper-like)
+                    roi = gray[y:y+h, x:x+w]
+                    mean_brightness = cv2.mean(roi)[0]
+                    
+                    # Paper documents: light colored (brightness > 120) and reasonable aspect ratio
+                    if mean_brightness > 120 and 0.5 < aspect_ratio < 2.5 and area > 10000:
+                        documents.append((x, y, w, h))
+                        if debug:
+                            log_event(frame_logger, logging.DEBUG, "document_detected", box=(x, y, w, h),
+                                      aspect_ratio=round(aspect_ratio, 2), brightness=round(mean_brightness))
+                    elif debug:
+                        log_event(frame_logger, logging.DEBUG, "document_rejected",
+                                  aspect_ratio=round(aspect_ratio, 2), brightness=round(mean_brightness))
     
     except Exception as e:
-        print(f"Document shape detection error: {e}")
-        traceback.print_exc()
+        logger.exception(f"Document shape detection error: {e}")
+        metrics.record_error("documents")
     
     return documents
 
@@ -476,17 +687,20 @@ def detect_privacy_objects_yolo(frame):
         'cars': []          # Cars (for license plate context)
     }
     
-    if not YOLO_AVAILABLE or yolo_model is None:
-        print("WARNING: YOLOv8 not available for object detection")
+    debug = frame_logger.isEnabledFor(logging.DEBUG)
+    
+    if not YOLO_AVAILABLE:
+        if debug:
+            log_event(frame_logger, logging.DEBUG, "yolo_skipped", reason="yolo_unavailable")
         return detections
     
     try:
         # Run YOLOv8 detection
-        results = yolo_model(frame, conf=0.3, verbose=False)
+        with yolo_pool.checkout() as yolo_model:
+            results = yolo_model(frame, conf=0.3, verbose=False)
         
         for result in results:
             boxes = result.boxes
-            print(f"YOLOv8 detected {len(boxes)} objects in frame")
             for box in boxes:
                 cls = int(box.cls[0])
                 conf = float(box.conf[0])
@@ -495,38 +709,102 @@ def detect_privacy_objects_yolo(frame):
                 # Convert to (x, y, w, h) format
                 x, y, w, h = x1, y1, x2 - x1, y2 - y1
                 
-                print(f"Object class {cls} detected with confidence {conf:.2f}")
+                if debug:
+                    log_event(frame_logger, logging.DEBUG, "object_detected",
+                              cls=cls, confidence=round(conf, 2), box=(x, y, w, h))
                 
                 # Categorize detections
                 if cls in [67]:  # Cell phone
                     detections['screens'].append(('cell_phone', x, y, w, h, conf))
-                    print(f"✓ Cell phone detected at ({x}, {y}, {w}, {h})")
                 elif cls in [63]:  # Laptop
                     detections['screens'].append(('laptop', x, y, w, h, conf))
-                    print(f"✓ Laptop detected at ({x}, {y}, {w}, {h})")
                 elif cls in [62]:  # TV/Monitor
                     detections['screens'].append(('tv', x, y, w, h, conf))
-                    print(f"✓ TV/Monitor detected at ({x}, {y}, {w}, {h})")
                 elif cls in [73]:  # Book
                     detections['documents'].append(('book', x, y, w, h, conf))
-                    print(f"✓ Book detected at ({x}, {y}, {w}, {h})")
                 elif cls in [66, 64, 65]:  # Keyboard, mouse, remote
                     detections['devices'].append(('device', x, y, w, h, conf))
-                    print(f"✓ Device detected at ({x}, {y}, {w}, {h})")
                 elif cls in [2, 5, 7]:  # Car, bus, truck
                     detections['cars'].append(('vehicle', x, y, w, h, conf))
-                    print(f"✓ Vehicle detected at ({x}, {y}, {w}, {h})")
     
     except Exception as e:
-        print(f"YOLOv8 detection error: {e}")
-        traceback.print_exc()
+        logger.exception(f"YOLOv8 detection error: {e}")
+        metrics.record_error("yolo")
     
     return detections
 
 
-def process_frame(frame, blur_faces=True, blur_text=False, blur_plates=True, blur_type="gaussian"):
+def detect_faces_tiled(frame):
+    """
+    MediaPipe on overlapping tiles plus the full frame, so small faces in
+    high-resolution images are found without upscaling
+    Returns list of (x, y, w, h) tuples
+    """
+    faces = []
+    for dx, dy, tile_faces in tiling.run_tiled(frame, detect_faces_mediapipe, tile_executor):
+        faces.extend(tiling.offset_box(face, dx, dy) for face in tile_faces)
+    return tiling.dedupe_boxes(faces)
+
+
+def detect_privacy_objects_tiled(frame):
+    """
+    YOLOv8 on overlapping tiles plus the full frame
+    Returns the same categorized dict as detect_privacy_objects_yolo
+    """
+    detections = {'screens': [], 'documents': [], 'devices': [], 'cars': []}
+    for dx, dy, tile_detections in tiling.run_tiled(frame, detect_privacy_objects_yolo, tile_executor):
+        for category, items in tile_detections.items():
+            detections[category].extend((label, x + dx, y + dy, w, h, conf) for (label, x, y, w, h, conf) in items)
+    return {
+        category: tiling.dedupe_boxes(items, box=lambda item: item[1:5])
+        for category, items in detections.items()
+    }
+
+
+if STUB_DETECTORS:
+    # The model-backed detectors already return nothing (their *_AVAILABLE flags are off)
+    def detect_document_shapes(frame):
+        if STUB_DETECTOR_MS:
+            time.sleep(STUB_DETECTOR_MS / 1000)
+        return []
+    
+    def detect_license_plates(frame, vehicle_boxes=None):
+        return []
+
+
+def render_regions(frame, regions, blur_type="gaussian", padding=0.1, timings: Optional[StageTimings] = None):
+    """
+    Merge overlapping regions (to avoid double-blurring) and blur them
+    Returns (frame, merged_regions)
+    """
+    with stage_timer("merge", timings):
+        regions = merge_overlapping_rectangles(regions)
+    
+    with stage_timer("blur", timings):
+        for (x, y, w, h) in regions:
+            frame = apply_blur(frame, x, y, w, h, blur_type=blur_type, padding=padding)
+    
+    return frame, regions
+
+
+def process_frame(frame, blur_faces=True, blur_text=False, blur_plates=True, blur_type="gaussian",
+                  timings: Optional[StageTimings] = None, source="video",
+                  log_context: Optional[dict] = None, regions_out: Optional[list] = None,
+                  tiled: Optional[bool] = None,
+                  budget: Optional[FrameBudget] = None, incremental: Optional[IncrementalDetector] = None):
     """
     Process a single frame to detect and blur sensitive information using AI models
+    Every stage is timed into the /metrics histograms and the optional per-job `timings`
+    Nothing is logged per frame unless `log_context` is given (sampled frames) or
+    the scannon.frame logger is at DEBUG
+    If `regions_out` is given, the labelled regions (x, y, w, h, category) found
+    before merging are appended to it (used for detection sidecars)
+    `tiled` forces tiled face/object detection on or off; by default large
+    frames are tiled according to SCANNON_TILE_MODE
+    With a `budget` (video jobs with SCANNON_VIDEO_TARGET_FPS) lower-priority
+    detectors may be skipped on this frame and their last regions reused
+    With an `incremental` detector (one per video) only regions that changed
+    since the previous frames are re-detected
     """
     regions_to_blur = []
     detection_stats = {
@@ -538,82 +816,257 @@ def process_frame(frame, blur_faces=True, blur_text=False, blur_plates=True, blu
         'total': 0
     }
     
-    # 1. Detect faces using MediaPipe (most accurate)
-    if blur_faces:
-        print(f"🔍 Face detection enabled - running MediaPipe...")
-        faces = detect_faces_mediapipe(frame)
-        regions_to_blur.extend(faces)
-        detection_stats['faces'] = len(faces)
-        print(f"Found {len(faces)} faces")
-    
-    # 2. Detect DOCUMENT SHAPES (certificates, IDs, papers) - ALWAYS ENABLED
-    print(f"🔍 Document shape detection ALWAYS enabled (aggressive mode)...")
-    document_shapes = detect_document_shapes(frame)
-    regions_to_blur.extend(document_shapes)
-    detection_stats['documents'] += len(document_shapes)
-    print(f"Found {len(document_shapes)} document shapes")
-    
-    # 3. Detect LICENSE PLATES (always enabled when blur_plates is True)
-    if blur_plates:
-        print(f"🔍 License plate detection enabled - running edge detection...")
-        license_plates = detect_license_plates(frame)
-        regions_to_blur.extend(license_plates)
-        detection_stats['plates'] = len(license_plates)
-        print(f"Found {len(license_plates)} license plates")
-    
-    # 4. Detect privacy-sensitive objects using YOLOv8
-    if blur_plates:  # Reusing blur_plates flag for all object detection
-        print(f"🔍 Object detection enabled - running YOLOv8...")
-        yolo_detections = detect_privacy_objects_yolo(frame)
-        
-        # Blur all screens (phones, laptops, TVs)
-        for detection in yolo_detections['screens']:
-            _, x, y, w, h, _ = detection
-            regions_to_blur.append((x, y, w, h))
-            detection_stats['screens'] += 1
-        print(f"Found {detection_stats['screens']} screens")
-        
-        # Blur documents and books detected by YOLO
-        for detection in yolo_detections['documents']:
-            _, x, y, w, h, _ = detection
-            regions_to_blur.append((x, y, w, h))
-            detection_stats['documents'] += 1
-        print(f"Found {detection_stats['documents']} total documents (YOLO + shapes)")
-    
-    # 5. Detect sensitive text using OCR (AGGRESSIVE for official documents)
-    if blur_text:
-        print(f"🔍 Text detection enabled - running EasyOCR (AGGRESSIVE MODE)...")
-        text_regions = detect_text_with_ocr(frame)
-        regions_to_blur.extend(text_regions)
-        detection_stats['text'] = len(text_regions)
-        print(f"Found {len(text_regions)} sensitive text regions")
-    
-    # Merge overlapping regions to avoid double-blurring
-    regions_to_blur = merge_overlapping_rectangles(regions_to_blur)
-    detection_stats['total'] = len(regions_to_blur)
-    
-    print(f"📊 Total regions to blur: {detection_stats['total']}")
-    print(f"📊 Detection stats: {detection_stats}")
-    
-    # Apply blur to all detected regions
-    for (x, y, w, h) in regions_to_blur:
-        print(f"Blurring region at ({x}, {y}, {w}, {h})")
-        frame = apply_blur(frame, x, y, w, h, blur_type=blur_type)
+    if tiled is None:
+        tiled = tiling.should_tile(frame, source)
+    
+    def detect(stage, fn, local=True):
+        """
+        Run one detector stage `fn(image)`, unless the frame budget reuses its last
+        regions; in incremental mode only the changed parts of the frame are scanned
+        """
+        if budget is not None and not budget.should_run(stage):
+            return budget.last(stage)
+        started = time.perf_counter()
+        with stage_timer(stage, timings):
+            result = incremental.detect(stage, fn, frame, local=local) if incremental is not None else fn(frame)
+        if budget is not None:
+            budget.record(stage, time.perf_counter() - started, result)
+        return result
+    
+    if budget is not None:
+        budget.start_frame()
+    if incremental is not None:
+        with stage_timer("changes", timings):
+            incremental.start_frame(frame)
+    
+    with stage_timer("process_frame", timings):
+        # 1. Detect faces using MediaPipe (most accurate)
+        if blur_faces:
+            faces = detect("faces", lambda image: detect_faces_tiled(image) if tiled and MEDIAPIPE_AVAILABLE
+                           else detect_faces_mediapipe(image))
+            regions_to_blur.extend(faces)
+            detection_stats['faces'] = len(faces)
+            if regions_out is not None:
+                regions_out.extend((*r, 'faces') for r in faces)
+        
+        # 2. Detect DOCUMENT SHAPES (certificates, IDs, papers) - ALWAYS ENABLED
+        # Size thresholds are relative to the frame, so never run on a crop
+        document_shapes = detect("documents", detect_document_shapes, local=False)
+        regions_to_blur.extend(document_shapes)
+        detection_stats['documents'] += len(document_shapes)
+        if regions_out is not None:
+            regions_out.extend((*r, 'documents') for r in document_shapes)
+        
+        # 3. Detect privacy-sensitive objects using YOLOv8
+        if blur_plates:  # Reusing blur_plates flag for all object detection
+            yolo_detections = detect("yolo", lambda image: detect_privacy_objects_tiled(image) if tiled and YOLO_AVAILABLE
+                                     else detect_privacy_objects_yolo(image), local=False)
+            
+            # Blur all screens (phones, laptops, TVs)
+            for detection in yolo_detections['screens']:
+                _, x, y, w, h, _ = detection
+                regions_to_blur.append((x, y, w, h))
+                detection_stats['screens'] += 1
+                if regions_out is not None:
+                    regions_out.append((x, y, w, h, 'screens'))
+            
+            # Blur documents and books detected by YOLO
+            for detection in yolo_detections['documents']:
+                _, x, y, w, h, _ = detection
+                regions_to_blur.append((x, y, w, h))
+                detection_stats['documents'] += 1
+                if regions_out is not None:
+                    regions_out.append((x, y, w, h, 'documents'))
+        
+        # 4. Detect LICENSE PLATES - only inside vehicles YOLO found, unless YOLO is unavailable
+        if blur_plates:
+            vehicle_boxes = None
+            if PLATE_MODE == "vehicle" and YOLO_AVAILABLE:
+                vehicle_boxes = [(x, y, w, h) for (_, x, y, w, h, _) in yolo_detections['cars']]
+            license_plates = detect("plates", lambda image: detect_license_plates(image, vehicle_boxes=vehicle_boxes),
+                                    local=vehicle_boxes is None)
+            regions_to_blur.extend(license_plates)
+            detection_stats['plates'] = len(license_plates)
+            if regions_out is not None:
+                regions_out.extend((*r, 'plates') for r in license_plates)
+        
+        # 5. Detect sensitive text using OCR (AGGRESSIVE for official documents)
+        if blur_text:
+            text_regions = detect("ocr", detect_text_with_ocr)
+            regions_to_blur.extend(text_regions)
+            detection_stats['text'] = len(text_regions)
+            if regions_out is not None:
+                regions_out.extend((*r, 'text') for r in text_regions)
+        
+        # Merge overlapping regions and blur them
+        frame, regions_to_blur = render_regions(frame, regions_to_blur, blur_type=blur_type, timings=timings)
+        detection_stats['total'] = len(regions_to_blur)
+    
+    if log_context is not None:
+        log_event(logger, logging.INFO, "frame", source=source, **log_context, **detection_stats)
+    elif frame_logger.isEnabledFor(logging.DEBUG):
+        log_event(frame_logger, logging.DEBUG, "frame", source=source, regions=regions_to_blur, **detection_stats)
+    
+    metrics.FRAMES_PROCESSED.inc(source=source)
+    metrics.record_detections(detection_stats)
     
     return frame, detection_stats
 
 
+def client_id(connection) -> str:
+    """Fair-share key of a request or websocket: X-Client-Id, first X-Forwarded-For hop, or peer address"""
+    headers = connection.headers
+    if headers.get("x-client-id"):
+        return headers["x-client-id"][:64]
+    if headers.get("x-forwarded-for"):
+        return headers["x-forwarded-for"].split(",")[0].strip()
+    return connection.client.host if connection.client else "anonymous"
+
+
+async def run_scheduled(priority: str, client: str, fn, *args, job: Optional[Job] = None,
+                        executor: Optional[ThreadPoolExecutor] = None, **kwargs):
+    """Run blocking pipeline work in a compute slot of the given priority, off the event loop"""
+    async with scheduler.slot(priority, client, job):
+        return await asyncio.get_running_loop().run_in_executor(
+            executor or compute_executor, functools.partial(fn, *args, **kwargs)
+        )
+
+
+# Realtime sessions trade OCR and object detection for latency
+REALTIME_OPTIONS = {"blur_faces": True, "blur_text": False, "blur_plates": False, "blur_type": "gaussian"}
+
+
+def abort_video_job(cap, out, output_path: str):
+    """Free a cancelled job's decoder and encoder and drop its partial output"""
+    if cap is not None:
+        cap.release()
+    if out is not None:
+        getattr(out, "abort", out.release)()
+    for path in (output_path, output_path.rsplit('.', 1)[0] + '.avi'):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def seek_capture(cap, frame_index: int) -> str:
+    """Position a capture on `frame_index`: seek, or decode forward if the container cannot seek exactly"""
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_index:
+        return "seek"
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    for _ in range(frame_index):
+        if not cap.grab():
+            break
+    return "decode"
+
+
+async def finish_memory_tracking(memory, job_id: str, kind: str) -> dict:
+    """Finish a job's memory profile and log it (once); returns it for the job result"""
+    if memory.result is not None:
+        return memory.result
+    result = await asyncio.to_thread(memory_profiler.finish, memory)
+    if processing_status.get(job_id, {}).get("status") not in (None, "processing"):
+        processing_status[job_id] = {**processing_status[job_id], "memory": result}
+    log_event(logger, logging.INFO, "job_memory", file_id=job_id, type=kind,
+              **{key: value for key, value in result.items() if key != "top_growth"})
+    return result
+
+
+def clip_range(start: Optional[float], end: Optional[float], fps: Fraction, total_frames: int) -> Tuple[int, Optional[int]]:
+    """Frame range [start_frame, end_frame) of a sub-clip given in seconds; end_frame None = to the end"""
+    start_frame = round(max(0.0, start or 0.0) * fps)
+    end_frame = round(end * fps) if end is not None else None
+    if total_frames > 1 and start_frame >= total_frames:
+        raise ValueError(f"start ({start}s) is past the end of the video")
+    if end_frame is not None and end_frame <= start_frame:
+        raise ValueError("end must be after start")
+    return start_frame, end_frame
+
+
+async def render_preview(cap, preview_path: str, fps: Fraction, size: Tuple[int, int], start_frame: int,
+                         end_frame: Optional[int], job: Job, client: str, options: dict) -> str:
+    """
+    Quick look at a video job before the full render: every Nth frame of the
+    range (at most SCANNON_PREVIEW_MAX_FRAMES, about SCANNON_PREVIEW_FPS),
+    downscaled to SCANNON_PREVIEW_HEIGHT, no audio. Leaves `cap` wherever it
+    stopped. Returns the actual preview path
+    """
+    total = (end_frame if end_frame is not None else int(cap.get(cv2.CAP_PROP_FRAME_COUNT))) - start_frame
+    stride = max(1, round(float(fps) / PREVIEW_FPS), -(-total // PREVIEW_MAX_FRAMES))
+    width, height = size
+    scale = min(1.0, PREVIEW_HEIGHT / height)
+    preview_size = (max(2, round(width * scale / 2) * 2), max(2, round(height * scale / 2) * 2))
+    await asyncio.to_thread(seek_capture, cap, start_frame)
+    out, preview_path, _ = open_video_writer(preview_path, fps / stride, preview_size)
+    
+    def step(frame_index):
+        ret, frame = cap.read()
+        if not ret:
+            return False
+        small = cv2.resize(frame, preview_size, interpolation=cv2.INTER_AREA)
+        processed, _ = process_frame(small, **options)
+        out.write(processed)
+        for _ in range(stride - 1):
+            if not cap.grab():  # no color conversion for frames that are skipped
+                break
+        return True
+    
+    try:
+        frame_index = start_frame
+        while end_frame is None or frame_index < end_frame:
+            if not await run_scheduled("video", client, step, frame_index, job=job):
+                break
+            frame_index += stride
+        await asyncio.to_thread(out.release)
+    except BaseException:
+        getattr(out, "abort", out.release)()
+        raise
+    if getattr(out, "error", None):
+        raise RuntimeError(out.error)
+    return preview_path
+
+
+def merge_segment_sidecars(segments: List[dict]) -> SidecarWriter:
+    merged = SidecarWriter()
+    for segment in segments:
+        merged.extend(Sidecar(segment["sidecar"]))
+    return merged
+
+
 async def process_video_async(input_path: str, output_path: str, file_id: str, 
-                               blur_faces=True, blur_text=False, blur_plates=True, blur_type="gaussian"):
+                               blur_faces=True, blur_text=False, blur_plates=True, blur_type="gaussian",
+                               client: str = "anonymous", resume: bool = False, resumable: bool = True,
+                               incremental: bool = INCREMENTAL_DEFAULT, start: Optional[float] = None,
+                               end: Optional[float] = None, preview: bool = False):
     """
     Process video with AI-based detection and blurring asynchronously
+    Each frame runs in a "video" compute slot off the event loop; the job can be
+    cancelled (DELETE /api/jobs/{file_id}) and stops at the next frame boundary.
+    The video is encoded in segments that are checkpointed under jobs/<file_id>/,
+    so after a restart the job continues from its last segment (resume=True)
+    and the segments are stitched into the output at the end.
+    `incremental` re-detects only what changed between frames (static cameras,
+    screen recordings; see incremental.py)
+    `start`/`end` (seconds) process only that part of the video; with `preview`
+    a small low-res render is made first (status "preview_file")
     """
+    timings = StageTimings()
+    job_timings[file_id] = timings
+    sampler = FrameLogSampler()
+    started = time.perf_counter()
+    job = scheduler.register(Job(file_id, "video", client))
+    metrics.ACTIVE_JOBS.inc(type="video")
+    checkpoint = JobCheckpoint(JOBS_DIR / file_id)
+    state = checkpoint.load() if resume else None
+    cap = out = memory = lease_keeper = None
+    
     try:
         processing_status[file_id] = {
             "status": "processing",
-            "progress": 0,
-            "message": "Starting AI-powered video processing...",
-            "detections": {
+            "progress": processing_status.get(file_id, {}).get("progress", 0) if state else 0,
+            "message": "Resuming AI-powered video processing..." if state else "Starting AI-powered video processing...",
+            "detections": dict(state["stats"]) if state else {
                 "faces": 0,
                 "text": 0,
                 "screens": 0,
@@ -621,6 +1074,7 @@ async def process_video_async(input_path: str, output_path: str, file_id: str,
                 "total": 0
             }
         }
+        memory = await asyncio.to_thread(memory_profiler.track, file_id, "video")
         
         # Open video
         cap = cv2.VideoCapture(input_path)
@@ -631,10 +1085,13 @@ async def process_video_async(input_path: str, output_path: str, file_id: str,
                 "progress": 0,
                 "message": "Could not open video file"
             }
+            metrics.JOBS.inc(type="video", outcome="error")
+            checkpoint.remove()
             return
         
-        # Get video properties
-        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30
+        # Get video properties (exact rational frame rate, e.g. 30000/1001)
+        video_info = probe_video(input_path)
+        fps = video_info["fps"]
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -642,103 +1099,481 @@ async def process_video_async(input_path: str, output_path: str, file_id: str,
         if total_frames == 0:
             total_frames = 1  # Prevent division by zero
         
-        processing_status[file_id]["message"] = f"Processing {total_frames} frames at {fps} FPS"
+        if state is None:
+            checkpoint.remove()  # leftovers of an earlier job with the same id
+            checkpoint.claim()
+            start_frame, end_frame = clip_range(start, end, fps, total_frames)
+            state = {
+                "input_path": str(input_path),
+                "output_path": str(output_path),
+                "client": client,
+                "options": {"blur_faces": blur_faces, "blur_text": blur_text,
+                            "blur_plates": blur_plates, "blur_type": blur_type, "incremental": incremental,
+                            "start": start, "end": end, "preview": preview},
+                "total_frames": total_frames,
+                "start_frame": start_frame,
+                "end_frame": end_frame,
+                "next_frame": start_frame,
+                "stats": {'faces': 0, 'text': 0, 'screens': 0, 'documents': 0, 'plates': 0, 'total': 0},
+                "segments": [],
+                "attempts": 0,
+                "resumable": resumable,
+            }
+        state["status"] = "processing"
+        checkpoint.save(state)
+        running_checkpoints.add(checkpoint)
+        lease_keeper = asyncio.create_task(keep_checkpoint_lease(checkpoint, file_id, asyncio.current_task()))
         
-        # Video writer - use mp4v codec for better compatibility
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        start_frame, end_frame = state.get("start_frame", 0), state.get("end_frame")
+        clip_frames = max(1, min(end_frame or total_frames, total_frames) - start_frame)
+        extra_status = {"preview_file": state["preview_file"]} if state.get("preview_file") else {}
         
-        if not out.isOpened():
-            # Try alternative codec
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            out = cv2.VideoWriter(output_path.replace('.mp4', '.avi'), fourcc, fps, (width, height))
+        if preview and not state["segments"] and not extra_status:
+            processing_status[file_id] = {**processing_status[file_id], "message": "Rendering preview..."}
+            preview_path = str(Path(output_path).with_name(f"preview_{Path(output_path).stem}.mp4"))
+            try:
+                with stage_timer("preview", timings):
+                    preview_path = await render_preview(
+                        cap, preview_path, fps, (width, height), start_frame, end_frame, job, client,
+                        {"blur_faces": blur_faces, "blur_text": blur_text,
+                         "blur_plates": blur_plates, "blur_type": blur_type}
+                    )
+                state["preview_file"] = Path(preview_path).name
+                extra_status = {"preview_file": state["preview_file"]}
+                processing_status[file_id] = {**processing_status[file_id], **extra_status,
+                                              "message": "Preview ready, rendering full quality..."}
+                await asyncio.to_thread(checkpoint.save, state)
+            except JobCancelled:
+                Path(preview_path).unlink(missing_ok=True)
+                raise
+            except Exception as e:
+                logger.warning(f"Preview of {file_id} failed, continuing with the full render: {e}")
         
-        frame_count = 0
-        cumulative_stats = {
-            'faces': 0,
-            'text': 0,
-            'screens': 0,
-            'documents': 0,
-            'plates': 0,
-            'total': 0
-        }
+        frame_count = state["next_frame"]
+        cumulative_stats = state["stats"]
+        segment_frames = max(1, round(float(fps) * SEGMENT_SECONDS))
+        if frame_count or extra_status:
+            method = await asyncio.to_thread(seek_capture, cap, frame_count)
+            if resume:
+                log_event(logger, logging.INFO, "job_resumed", file_id=file_id, type="video", frame=frame_count,
+                          segments=len(state["segments"]), attempt=state["attempts"], method=method)
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        processing_status[file_id] = {**processing_status[file_id],
+                                      "message": f"Processing {clip_frames} frames at {float(fps):.3f} FPS"}
+        log_event(logger, logging.INFO, "job_started", file_id=file_id, type="video", frames=clip_frames,
+                  fps=f"{float(fps):.3f}", size=f"{width}x{height}", start_frame=frame_count)
+        
+        sidecar = SidecarWriter()
+        frame_regions = []
+        budget = video_budget()
+        changes = IncrementalDetector() if incremental else None
+        
+        def step(frame_index):
+            """Decode, process and encode one frame (worker thread); None at end of stream"""
+            frame_started = time.perf_counter()
+            with stage_timer("decode", timings):
+                frame = read_frame(cap, (height, width, 3))
+            if frame is None:
+                return None
             
-            # Process frame with AI detection
-            processed_frame, frame_stats = process_frame(
-                frame, 
-                blur_faces=blur_faces, 
-                blur_text=blur_text, 
-                blur_plates=blur_plates,
-                blur_type=blur_type
-            )
+            try:
+                # Process frame with AI detection (blurred in place)
+                processed_frame, frame_stats = process_frame(
+                    frame, 
+                    blur_faces=blur_faces, 
+                    blur_text=blur_text, 
+                    blur_plates=blur_plates,
+                    blur_type=blur_type,
+                    timings=timings,
+                    log_context={"file_id": file_id, "frame": frame_index} if sampler.should_log(frame_index) else None,
+                    regions_out=frame_regions,
+                    budget=budget,
+                    incremental=changes
+                )
+                sidecar.add(frame_index, frame_regions)
+                frame_regions.clear()
+                
+                # Write frame (the encoder copies it into its pipe, so the buffer can be reused)
+                with stage_timer("encode", timings):
+                    out.write(processed_frame)
+            finally:
+                frame_pool.release(frame)
+            if budget is not None:
+                budget.end_frame(time.perf_counter() - frame_started)
+            return frame_stats
+        
+        finished = False
+        while not finished:
+            # Segments are video only - the source audio is added when stitching
+            index = len(state["segments"])
+            out, segment_file, encoder_backend = open_video_writer(str(checkpoint.segment_path(index)), fps, (width, height))
+            sidecar = SidecarWriter()
+            written = 0
             
-            # Update cumulative statistics
-            for key in cumulative_stats:
-                cumulative_stats[key] += frame_stats.get(key, 0)
+            while written < segment_frames:
+                if end_frame is not None and frame_count >= end_frame:
+                    finished = True
+                    break
+                frame_stats = await run_scheduled("video", client, step, frame_count, job=job)
+                if frame_stats is None:
+                    finished = True
+                    break
+                
+                # Update cumulative statistics
+                for key in cumulative_stats:
+                    cumulative_stats[key] += frame_stats.get(key, 0)
+                frame_count += 1
+                written += 1
+                if memory is not None:
+                    memory.sample()
+                
+                # Update progress
+                progress = min(99, int(((frame_count - start_frame) / clip_frames) * 100))
+                processing_status[file_id] = {
+                    "status": "processing",
+                    "progress": progress,
+                    "message": f"Processing frame {frame_count - start_frame}/{clip_frames}",
+                    "detections": cumulative_stats.copy(),
+                    **extra_status
+                }
             
-            # Write frame
-            out.write(processed_frame)
-            frame_count += 1
+            with stage_timer("encode_finalize", timings):
+                await asyncio.to_thread(out.release)
+            if getattr(out, "error", None):
+                raise RuntimeError(out.error)
+            out = None
             
-            # Update progress
-            progress = int((frame_count / total_frames) * 100)
-            processing_status[file_id] = {
-                "status": "processing",
-                "progress": progress,
-                "message": f"Processing frame {frame_count}/{total_frames}",
-                "detections": cumulative_stats.copy()
-            }
+            if written == 0:
+                Path(segment_file).unlink(missing_ok=True)
+                continue
             
-            # Allow other tasks to run
-            if frame_count % 10 == 0:
-                await asyncio.sleep(0.001)
+            # Checkpoint: the segment is complete on disk before the job state points past it
+            segment_sidecar = checkpoint.sidecar_path(index)
+            await asyncio.to_thread(sidecar.save, str(segment_sidecar), {"segment": index})
+            state["segments"].append({"path": segment_file, "sidecar": str(segment_sidecar),
+                                      "encoder": encoder_backend, "frames": written})
+            state["next_frame"] = frame_count
+            await asyncio.to_thread(checkpoint.save, state)
         
-        # Release resources
         cap.release()
-        out.release()
+        
+        if not state["segments"]:
+            raise RuntimeError("No frames could be decoded")
+        
+        # Stitch the segments (stream copy when all of them came from ffmpeg) and add the audio back
+        processing_status[file_id] = {**processing_status[file_id],
+                                      "message": f"Joining {len(state['segments'])} segments..."}
+        with stage_timer("stitch", timings):
+            output_path, stitch_method = await asyncio.to_thread(
+                concat_segments,
+                [segment["path"] for segment in state["segments"]],
+                output_path, fps, (width, height),
+                audio_source=input_path,
+                audio_codec=video_info["audio_codec"],
+                stream_copy=all(segment["encoder"] == "ffmpeg" for segment in state["segments"]),
+                audio_start=float(start_frame / fps)
+            )
+        frames_processed = frame_count - start_frame
+        
+        if memory is not None:
+            extra_status["memory"] = await finish_memory_tracking(memory, file_id, "video")
         
         # Verify output file exists
         if Path(output_path).exists():
+            merged = await asyncio.to_thread(merge_segment_sidecars, state["segments"])
+            save_sidecar(merged, file_id, {
+                "type": "video",
+                "source": str(input_path),
+                "processed_file": Path(output_path).name,
+                "width": width,
+                "height": height,
+                "fps": str(fps),
+                "frames": frames_processed,
+                "start_frame": start_frame,
+                "options": {"blur_faces": blur_faces, "blur_text": blur_text,
+                            "blur_plates": blur_plates, "blur_type": blur_type}
+            })
+            if budget is not None:
+                extra_status["budget"] = budget.summary()
+            if changes is not None:
+                extra_status["incremental"] = changes.stats()
             processing_status[file_id] = {
                 "status": "completed",
                 "progress": 100,
                 "message": "AI processing complete!",
                 "detections": cumulative_stats,
-                "frames_processed": frame_count
+                "frames_processed": frames_processed,
+                **extra_status,
+                "processed_file": Path(output_path).name,
+                "encoder": state["segments"][0]["encoder"],
+                "segments": len(state["segments"]),
+                "resumed": resume
             }
+            metrics.JOBS.inc(type="video", outcome="completed")
         else:
             processing_status[file_id] = {
                 "status": "error",
                 "progress": 0,
                 "message": "Output file was not created"
             }
+            metrics.JOBS.inc(type="video", outcome="error")
+        checkpoint.remove()
         
-        print(f"Video processing complete: {output_path}")
-        print(f"Detection summary: {cumulative_stats}")
-        
+        elapsed = time.perf_counter() - started
+        log_event(logger, logging.INFO, "job_summary", file_id=file_id, type="video",
+                  status=processing_status[file_id]["status"], frames=frames_processed,
+                  seconds=round(elapsed, 2), fps=round(frames_processed / elapsed, 2) if elapsed > 0 else 0,
+                  segments=len(state["segments"]), stitch=stitch_method,
+                  output=Path(output_path).name, **cumulative_stats)
+    
+    except JobCancelled:
+        abort_video_job(cap, out, output_path)
+        checkpoint.remove()
+        processing_status[file_id] = {
+            "status": "cancelled",
+            "progress": processing_status.get(file_id, {}).get("progress", 0),
+            "message": "Cancelled"
+        }
+        metrics.JOBS.inc(type="video", outcome="cancelled")
+        log_event(logger, logging.INFO, "job_cancelled", file_id=file_id, type="video",
+                  seconds=round(time.perf_counter() - started, 2))
+    except asyncio.CancelledError:
+        # Server shutting down (or the lease was lost): stop the encoder but keep the checkpoint to resume from
+        if cap is not None:
+            cap.release()
+        if out is not None:
+            getattr(out, "abort", out.release)()
+        checkpoint.release_lease()
+        raise
     except Exception as e:
-        print(f"Error processing video: {str(e)}")
-        traceback.print_exc()
+        logger.exception(f"Error processing video: {str(e)}")
+        if out is not None:
+            getattr(out, "abort", out.release)()
+        checkpoint.remove()
         processing_status[file_id] = {
             "status": "error",
             "progress": 0,
             "message": f"Error: {str(e)}"
         }
+        metrics.JOBS.inc(type="video", outcome="error")
+        metrics.record_error("video_job")
+    finally:
+        if lease_keeper is not None:
+            lease_keeper.cancel()
+        running_checkpoints.discard(checkpoint)
+        scheduler.unregister(job)
+        metrics.ACTIVE_JOBS.inc(-1, type="video")
+        if memory is not None:
+            await finish_memory_tracking(memory, file_id, "video")
+
+
+async def keep_checkpoint_lease(checkpoint: JobCheckpoint, file_id: str, task: asyncio.Task):
+    """Renew a running job's lease; stop the job if another process has taken it over"""
+    while True:
+        await asyncio.sleep(CHECKPOINT_LEASE_SECONDS / 3)
+        if not await asyncio.to_thread(checkpoint.renew_lease):
+            if checkpoint.exists():
+                log_event(logger, logging.WARNING, "job_lease_lost", file_id=file_id, type="video")
+                task.cancel()
+            return
+
+
+def resume_interrupted_jobs() -> int:
+    """
+    Restart checkpointed video jobs whose owner released its lease (clean stop)
+    or let it expire (crash). Only crashes count towards SCANNON_RESUME_MAX_ATTEMPTS
+    """
+    resumed = 0
+    for checkpoint in interrupted_jobs(JOBS_DIR):
+        file_id = checkpoint.file_id
+        if scheduler.get_job(file_id) is not None:
+            continue
+        previous = checkpoint.claim()
+        if previous is None:
+            continue  # another process got there first
+        state = checkpoint.load()
+        if not state or not Path(state["input_path"]).exists():
+            logger.warning(f"Dropping checkpoint of {file_id}: source video is gone")
+            checkpoint.remove()
+            continue
+        if not previous.get("released"):
+            # A job that keeps taking the process down must not be resumed forever
+            state["attempts"] += 1
+            if state["attempts"] > RESUME_MAX_ATTEMPTS:
+                logger.error(f"Dropping checkpoint of {file_id}: gave up after {RESUME_MAX_ATTEMPTS} crash resumes")
+                checkpoint.remove()
+                processing_status[file_id] = {
+                    "status": "error",
+                    "progress": 0,
+                    "message": f"Error: Gave up after {RESUME_MAX_ATTEMPTS} resume attempts"
+                }
+                metrics.JOBS.inc(type="video", outcome="error")
+                continue
+            checkpoint.save(state)
+        processing_status[file_id] = {
+            "status": "processing",
+            "progress": int(state["next_frame"] / max(1, state["total_frames"]) * 100),
+            "message": f"Resuming from frame {state['next_frame']}",
+            "detections": dict(state["stats"])
+        }
+        task = asyncio.create_task(process_video_async(
+            state["input_path"],
+            state["output_path"],
+            file_id,
+            client=state["client"],
+            resume=True,
+            **state["options"]
+        ))
+        protect_job_files(task, state["input_path"], state["output_path"], sidecar_path(file_id), JOBS_DIR / file_id)
+        resumed += 1
+    if resumed:
+        print(f"♻️ Resuming {resumed} interrupted video job(s)")
+    return resumed
+
+
+async def run_resume_scanner(interval: float = CHECKPOINT_LEASE_SECONDS / 2):
+    """Background task of every worker: pick up jobs of stopped or crashed processes"""
+    while True:
+        try:
+            resume_interrupted_jobs()
+        except Exception as e:
+            logger.exception(f"Resume scan error: {e}")
+            metrics.record_error("resume")
+        await asyncio.sleep(interval)
+
+
+async def run_state_sync(interval: float = STATE_SYNC_SECONDS):
+    """
+    Background task of every worker: renew its heartbeat, publish the progress
+    of its jobs and cancel the ones DELETE /api/jobs flagged on another worker
+    """
+    while True:
+        try:
+            await asyncio.to_thread(job_state.heartbeat)
+            await asyncio.to_thread(job_state.publish, processing_status.pending())
+            for file_id in await asyncio.to_thread(job_state.cancel_requests):
+                if scheduler.cancel(file_id) and file_id in processing_status:
+                    processing_status[file_id] = {**processing_status[file_id], "message": "Cancelling..."}
+        except Exception as e:
+            logger.exception(f"Job state sync error: {e}")
+            metrics.record_error("state_sync")
+        await asyncio.sleep(interval)
+
+
+def submit_distributed_job(input_path: str, output_path: str, file_id: str, options: dict,
+                           start: Optional[float] = None, end: Optional[float] = None) -> int:
+    """Split a video job (or its start/end sub-clip) into segment tasks for segment_worker.py processes"""
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise HTTPException(status_code=400, detail="Could not open video file")
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    video_info = probe_video(input_path)
+    fps = video_info["fps"]
+    try:
+        start_frame, end_frame = clip_range(start, end, fps, total_frames)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Absolute paths: workers on other nodes mount the shared storage at the same place
+    tasks = broker.submit_job(
+        file_id,
+        str(Path(input_path).absolute()),
+        str(Path(output_path).absolute()),
+        str((JOBS_DIR / file_id).absolute()),
+        options,
+        str(fps), width, height, total_frames,
+        video_info["audio_codec"],
+        segment_frames=max(1, round(float(fps) * SEGMENT_SECONDS)),
+        start_frame=start_frame,
+        end_frame=end_frame
+    )
+    log_event(logger, logging.INFO, "job_queued", file_id=file_id, type="video", frames=total_frames,
+              fps=f"{float(fps):.3f}", size=f"{width}x{height}", segments=tasks, start_frame=start_frame,
+              end_frame=end_frame)
+    return tasks
+
+
+async def assemble_distributed_job(file_id: str):
+    """Stitch the finished segments of a broker job into its output"""
+    started = time.perf_counter()
+    job = await asyncio.to_thread(broker.job_record, file_id)
+    segments = [segment for segment in await asyncio.to_thread(broker.segments, file_id) if segment["frames"]]
+    try:
+        if not segments:
+            raise RuntimeError("No frames could be decoded")
+        output_path, stitch_method = await asyncio.to_thread(
+            concat_segments,
+            [segment["path"] for segment in segments],
+            job["output_path"], Fraction(job["fps"]), (job["width"], job["height"]),
+            audio_source=job["input_path"],
+            audio_codec=job["audio_codec"],
+            stream_copy=all(segment["encoder"] == "ffmpeg" for segment in segments),
+            audio_start=float(segments[0]["start_frame"] / Fraction(job["fps"]))
+        )
+        merged = await asyncio.to_thread(merge_segment_sidecars, segments)
+        save_sidecar(merged, file_id, {
+            "type": "video",
+            "source": job["input_path"],
+            "processed_file": Path(output_path).name,
+            "width": job["width"],
+            "height": job["height"],
+            "fps": job["fps"],
+            "frames": sum(segment["frames"] for segment in segments),
+            "start_frame": segments[0]["start_frame"],
+            "options": job["options"]
+        })
+        await asyncio.to_thread(broker.finish_job, file_id, "completed", "AI processing complete!",
+                                Path(output_path).name)
+        metrics.JOBS.inc(type="video", outcome="completed")
+        log_event(logger, logging.INFO, "job_summary", file_id=file_id, type="video", status="completed",
+                  frames=sum(segment["frames"] for segment in segments), segments=len(segments),
+                  stitch=stitch_method, stitch_seconds=round(time.perf_counter() - started, 2),
+                  output=Path(output_path).name)
+    except Exception as e:
+        logger.exception(f"Error assembling distributed job {file_id}: {e}")
+        await asyncio.to_thread(broker.finish_job, file_id, "error", f"Error: {str(e)}")
+        metrics.JOBS.inc(type="video", outcome="error")
+        metrics.record_error("video_job")
+    finally:
+        await asyncio.to_thread(shutil.rmtree, job["segment_dir"], True)
+
+
+async def run_broker_assembler(interval: float = BROKER_POLL_SECONDS):
+    """
+    Background task of the API: stitch broker jobs whose segments are all done,
+    and keep the janitor away from the files of queued and running broker jobs
+    """
+    protected = set()
+    while True:
+        try:
+            active = await asyncio.to_thread(broker.active_jobs)
+            paths = {path for job in active for path in (job["input_path"], job["output_path"])}
+            storage_manager.protect(*(paths - protected))
+            storage_manager.release(*(protected - paths))
+            protected = paths
+            for file_id in await asyncio.to_thread(broker.ready_jobs):
+                # Several API processes may poll the same broker; only one wins the claim
+                if await asyncio.to_thread(broker.start_assembly, file_id):
+                    await assemble_distributed_job(file_id)
+        except Exception as e:
+            logger.exception(f"Broker assembler error: {e}")
+            metrics.record_error("broker")
+        await asyncio.sleep(interval)
 
 
-def process_image(input_path: str, output_path: str, blur_faces=True, blur_text=False, blur_plates=True, blur_type="gaussian"):
+def process_image(input_path: str, output_path: str, blur_faces=True, blur_text=False, blur_plates=True, blur_type="gaussian",
+                  timings: Optional[StageTimings] = None, regions_out: Optional[list] = None):
     """
     Process an image with AI-based detection and blurring
     """
     try:
-        frame = cv2.imread(input_path)
+        with stage_timer("decode", timings):
+            frame = cv2.imread(input_path)
         
         if frame is None:
+            metrics.JOBS.inc(type="image", outcome="error")
             return False, "Could not read image file", {}
         
         processed_frame, stats = process_frame(
@@ -746,19 +1581,278 @@ def process_image(input_path: str, output_path: str, blur_faces=True, blur_text=
             blur_faces=blur_faces, 
             blur_text=blur_text, 
             blur_plates=blur_plates,
-            blur_type=blur_type
+            blur_type=blur_type,
+            timings=timings,
+            source="image",
+            regions_out=regions_out
         )
         
         # Save processed image
-        cv2.imwrite(output_path, processed_frame)
+        with stage_timer("encode", timings):
+            cv2.imwrite(output_path, processed_frame)
         
+        metrics.JOBS.inc(type="image", outcome="completed")
         message = f"Detected and blurred: {stats['faces']} faces, {stats['screens']} screens, {stats['text']} text regions"
         return True, message, stats
         
     except Exception as e:
+        metrics.JOBS.inc(type="image", outcome="error")
+        metrics.record_error("image_job")
         return False, str(e), {}
 
 
+def sidecar_path(file_id: str) -> Path:
+    return SIDECAR_DIR / f"{file_id}.npz"
+
+
+def save_sidecar(writer: SidecarWriter, file_id: str, meta: dict):
+    """Persist a job's detection regions; failures only cost the re-render feature"""
+    try:
+        with stage_timer("sidecar"):
+            writer.save(str(sidecar_path(file_id)), meta)
+    except Exception as e:
+        logger.exception(f"Could not save detection sidecar for {file_id}: {e}")
+        metrics.record_error("sidecar")
+
+
+async def rerender_video_async(input_path: str, output_path: str, job_id: str, sidecar: Sidecar,
+                               blur_type="gaussian", padding=0.1, categories=None, client: str = "anonymous"):
+    """
+    Re-render a processed video from its detection sidecar: decode, blur the
+    saved regions with new settings, encode. No detector runs.
+    """
+    timings = StageTimings()
+    job_timings[job_id] = timings
+    started = time.perf_counter()
+    job = scheduler.register(Job(job_id, "rerender", client))
+    metrics.ACTIVE_JOBS.inc(type="rerender")
+    cap = out = memory = None
+    
+    try:
+        processing_status[job_id] = {
+            "status": "processing",
+            "progress": 0,
+            "message": "Re-rendering from saved detections..."
+        }
+        memory = await asyncio.to_thread(memory_profiler.track, job_id, "rerender")
+        
+        cap = cv2.VideoCapture(input_path)
+        if not cap.isOpened():
+            processing_status[job_id] = {
+                "status": "error",
+                "progress": 0,
+                "message": "Could not open original video file"
+            }
+            metrics.JOBS.inc(type="rerender", outcome="error")
+            return
+        
+        video_info = probe_video(input_path)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or sidecar.meta.get("frames") or 1
+        # Sub-clip jobs only cover frames [start_frame, start_frame + frames) of the source
+        start_frame = sidecar.meta.get("start_frame")
+        end_frame = None
+        if start_frame is not None:
+            total_frames = sidecar.meta["frames"] or 1
+            end_frame = start_frame + sidecar.meta["frames"]
+            if start_frame:
+                await asyncio.to_thread(seek_capture, cap, start_frame)
+        
+        out, output_path, encoder_backend = open_video_writer(
+            output_path, video_info["fps"], (width, height),
+            audio_source=input_path,
+            audio_codec=video_info["audio_codec"],
+            audio_start=float((start_frame or 0) / video_info["fps"])
+        )
+        
+        frame_index = start_frame or 0
+        frame_count = 0
+        regions_rendered = 0
+        
+        def step(frame_index):
+            """Decode, blur and encode one frame (worker thread); None at end of stream"""
+            with stage_timer("decode", timings):
+                frame = read_frame(cap, (height, width, 3))
+            if frame is None:
+                return None
+            
+            try:
+                rendered = 0
+                regions = sidecar.regions_for(frame_index, categories)
+                if regions:
+                    frame, merged = render_regions(frame, regions, blur_type=blur_type, padding=padding, timings=timings)
+                    rendered = len(merged)
+                
+                with stage_timer("encode", timings):
+                    out.write(frame)
+            finally:
+                frame_pool.release(frame)
+            return rendered
+        
+        while end_frame is None or frame_index < end_frame:
+            rendered = await run_scheduled("video", client, step, frame_index, job=job)
+            if rendered is None:
+                break
+            regions_rendered += rendered
+            frame_index += 1
+            frame_count += 1
+            if memory is not None:
+                memory.sample()
+            
+            processing_status[job_id] = {
+                "status": "processing",
+                "progress": int((frame_count / total_frames) * 100),
+                "message": f"Re-rendering frame {frame_count}/{total_frames}"
+            }
+        
+        cap.release()
+        with stage_timer("encode_finalize", timings):
+            await asyncio.to_thread(out.release)
+        encoder_error = getattr(out, "error", None)
+        memory_status = {"memory": await finish_memory_tracking(memory, job_id, "rerender")} if memory is not None else {}
+        
+        if Path(output_path).exists() and encoder_error is None:
+            processing_status[job_id] = {
+                "status": "completed",
+                "progress": 100,
+                "message": "Re-render complete!",
+                "frames_processed": frame_count,
+                "regions_rendered": regions_rendered,
+                "processed_file": Path(output_path).name,
+                "encoder": encoder_backend,
+                **memory_status
+            }
+            metrics.JOBS.inc(type="rerender", outcome="completed")
+        else:
+            processing_status[job_id] = {
+                "status": "error",
+                "progress": 0,
+                "message": encoder_error or "Output file was not created"
+            }
+            metrics.JOBS.inc(type="rerender", outcome="error")
+        
+        elapsed = time.perf_counter() - started
+        log_event(logger, logging.INFO, "job_summary", file_id=job_id, type="rerender",
+                  status=processing_status[job_id]["status"], frames=frame_count, regions=regions_rendered,
+                  seconds=round(elapsed, 2), fps=round(frame_count / elapsed, 2) if elapsed > 0 else 0)
+    
+    except JobCancelled:
+        abort_video_job(cap, out, output_path)
+        processing_status[job_id] = {
+            "status": "cancelled",
+            "progress": processing_status.get(job_id, {}).get("progress", 0),
+            "message": "Cancelled"
+        }
+        metrics.JOBS.inc(type="rerender", outcome="cancelled")
+        log_event(logger, logging.INFO, "job_cancelled", file_id=job_id, type="rerender",
+                  seconds=round(time.perf_counter() - started, 2))
+    except Exception as e:
+        logger.exception(f"Error re-rendering video: {str(e)}")
+        processing_status[job_id] = {
+            "status": "error",
+            "progress": 0,
+            "message": f"Error: {str(e)}"
+        }
+        metrics.JOBS.inc(type="rerender", outcome="error")
+        metrics.record_error("rerender_job")
+    finally:
+        scheduler.unregister(job)
+        metrics.ACTIVE_JOBS.inc(-1, type="rerender")
+        if memory is not None:
+            await finish_memory_tracking(memory, job_id, "rerender")
+
+
+def rerender_image(input_path: str, output_path: str, regions, blur_type="gaussian", padding=0.1):
+    """
+    Re-render an image job from its saved regions (worker thread)
+    Returns (written, regions rendered), or None if the original cannot be read
+    """
+    frame = cv2.imread(input_path)
+    if frame is None:
+        return None
+    frame, merged = render_regions(frame, regions, blur_type=blur_type, padding=padding)
+    return cv2.imwrite(output_path, frame), len(merged)
+
+
+def encode_image(frame: np.ndarray, extension: str):
+    """Encode a frame in memory; returns the encoded buffer (uint8 array) or None"""
+    ok, buffer = cv2.imencode(extension, frame)
+    return buffer.reshape(-1) if ok else None
+
+
+def process_image_buffer(data, extension: str, blur_faces=True, blur_text=False, blur_plates=True,
+                         blur_type="gaussian", source="batch", timings: Optional[StageTimings] = None,
+                         regions_out: Optional[list] = None):
+    """
+    Decode, process and re-encode one in-memory image without touching disk.
+    `data` is any bytes-like object (wrapped, not copied). The decoded frame is
+    blurred in place. Returns (encoded uint8 array or None, stats, error message or None)
+    """
+    with stage_timer("decode", timings):
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return None, {}, "Could not decode image"
+    
+    processed_frame, stats = process_frame(
+        frame,
+        blur_faces=blur_faces,
+        blur_text=blur_text,
+        blur_plates=blur_plates,
+        blur_type=blur_type,
+        timings=timings,
+        source=source,
+        regions_out=regions_out
+    )
+    
+    with stage_timer("encode", timings):
+        buffer = encode_image(processed_frame, extension)
+    if buffer is None:
+        return None, stats, f"Could not encode {extension} image"
+    return buffer, stats, None
+
+
+def process_image_bytes(data: bytes, extension: str, blur_faces=True, blur_text=False, blur_plates=True,
+                        blur_type="gaussian", source="batch"):
+    """
+    Decode, process and re-encode one in-memory image
+    Returns (encoded_bytes or None, stats, error message or None)
+    """
+    buffer, stats, error = process_image_buffer(data, extension, blur_faces=blur_faces, blur_text=blur_text,
+                                                blur_plates=blur_plates, blur_type=blur_type, source=source)
+    return (buffer.tobytes() if buffer is not None else None), stats, error
+
+
+def _batch_entry_name(name: str) -> str:
+    """Safe archive path for a batch item (keeps sub-folders, drops '..' and absolute parts)"""
+    parts = [re.sub(r'[^\w\-_\.]', '_', part) for part in Path(name).parts if part not in ('', '.', '..', '/', '\\')]
+    return "/".join(parts) or "image"
+
+
+def _run_batch_item(name: str, read_bytes, options: dict) -> dict:
+    """Worker-thread body: process one batch image and return its manifest record"""
+    started = time.perf_counter()
+    extension = Path(name).suffix.lower()
+    record = {"file": name, "output": None, "status": "error", "detections": {}}
+    
+    try:
+        encoded, stats, error = process_image_bytes(read_bytes(), extension, **options)
+        record["detections"] = stats
+        if encoded is not None:
+            record["output"] = f"processed/{_batch_entry_name(name)}"
+            record["status"] = "completed"
+            record["data"] = encoded
+        else:
+            record["error"] = error
+    except Exception as e:
+        logger.exception(f"Batch item {name} failed: {e}")
+        metrics.record_error("batch_item")
+        record["error"] = str(e)
+    
+    record["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return record
+
+
 @app.get("/")
 async def root():
     return {
@@ -784,14 +1878,23 @@ async def root():
 
 @app.post("/api/upload")
 async def upload_video(
+    request: Request,
     file: UploadFile = File(...),
     blur_type: str = "gaussian",
     blur_faces: bool = True,
     blur_plates: bool = True,
-    blur_text: bool = True  # NOW ENABLED BY DEFAULT for document detection
+    blur_text: bool = True,  # NOW ENABLED BY DEFAULT for document detection
+    incremental: bool = INCREMENTAL_DEFAULT,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    preview: bool = False
 ):
     """
     Upload and process video/image with face and sensitive information blurring
+    `incremental` (videos) only re-detects the parts of each frame that changed -
+    much faster for static cameras and screen recordings
+    `start`/`end` (videos, seconds) process only that part of the video;
+    `preview` renders a small low-res version first (status "preview_file")
     """
     try:
         # Validate file type
@@ -808,71 +1911,493 @@ async def upload_video(
         original_filename = f"{timestamp}_{safe_filename}"
         upload_path = UPLOAD_DIR / original_filename
         
-        with open(upload_path, "wb") as buffer:
+        with stage_timer("upload_save"), open(upload_path, "wb") as buffer:
             content = await file.read()
             buffer.write(content)
         
-        # Determine output filename and extension
-        if is_video:
-            processed_filename = f"processed_{original_filename}"
-            if not processed_filename.lower().endswith('.mp4'):
-                processed_filename = processed_filename.rsplit('.', 1)[0] + '.mp4'
-        else:
-            processed_filename = f"processed_{original_filename}"
+        return await start_upload_job(request, upload_path, timestamp, is_video, blur_type=blur_type,
+                                      blur_faces=blur_faces, blur_plates=blur_plates, blur_text=blur_text,
+                                      incremental=incremental, start=start, end=end, preview=preview)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Upload failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def start_upload_job(request: Request, upload_path: Path, timestamp: str, is_video: bool,
+                           blur_type: str = "gaussian", blur_faces: bool = True, blur_plates: bool = True,
+                           blur_text: bool = True, incremental: bool = INCREMENTAL_DEFAULT,
+                           start: Optional[float] = None, end: Optional[float] = None,
+                           preview: bool = False) -> JSONResponse:
+    """
+    Start processing a file saved in UPLOAD_DIR: videos in the background
+    (or on the worker fleet), images right away
+    """
+    original_filename = upload_path.name
+    if (start is not None and start < 0) or (end is not None and end <= (start or 0)):
+        raise HTTPException(status_code=400, detail="start must be >= 0 and end must be after start")
+    # Determine output filename and extension
+    if is_video:
+        processed_filename = f"processed_{original_filename}"
+        if not processed_filename.lower().endswith('.mp4'):
+            processed_filename = processed_filename.rsplit('.', 1)[0] + '.mp4'
+    else:
+        processed_filename = f"processed_{original_filename}"
+    
+    processed_path = PROCESSED_DIR / processed_filename
+    file_id = f"{timestamp}_{hash(original_filename)}"
+    
+    if is_video and broker is not None:
+        # Queue segment tasks for the worker fleet; an API process stitches the result
+        segments = await asyncio.to_thread(submit_distributed_job, str(upload_path), str(processed_path), file_id, {
+            "blur_faces": blur_faces, "blur_text": blur_text,
+            "blur_plates": blur_plates, "blur_type": blur_type, "incremental": incremental
+        }, start, end)
+        return JSONResponse(content={
+            "message": f"Video uploaded successfully, queued as {segments} segments",
+            "original_file": original_filename,
+            "processed_file": processed_filename,
+            "file_id": file_id,
+            "status": "processing",
+            "type": "video",
+            "distributed": True
+        })
+    elif is_video:
+        # Start video processing asynchronously
+        task = asyncio.create_task(process_video_async(
+            str(upload_path), 
+            str(processed_path), 
+            file_id,
+            blur_faces=blur_faces,
+            blur_text=blur_text,
+            blur_plates=blur_plates,
+            blur_type=blur_type,
+            client=client_id(request),
+            incremental=incremental,
+            start=start,
+            end=end,
+            preview=preview
+        ))
+        protect_job_files(task, upload_path, processed_path, sidecar_path(file_id), JOBS_DIR / file_id)
         
-        processed_path = PROCESSED_DIR / processed_filename
-        file_id = f"{timestamp}_{hash(original_filename)}"
+        return JSONResponse(content={
+            "message": "Video uploaded successfully, processing started",
+            "original_file": original_filename,
+            "processed_file": processed_filename,
+            "file_id": file_id,
+            "status": "processing",
+            "type": "video"
+        })
+    else:
+        # Process image synchronously
+        timings = StageTimings()
+        job_timings[file_id] = timings
+        started = time.perf_counter()
+        image_regions = []
+        success, message, stats = await run_scheduled(
+            "image",
+            client_id(request),
+            process_image,
+            str(upload_path), 
+            str(processed_path),
+            blur_faces=blur_faces,
+            blur_text=blur_text,
+            blur_plates=blur_plates,
+            blur_type=blur_type,
+            timings=timings,
+            regions_out=image_regions
+        )
+        if success:
+            sidecar = SidecarWriter()
+            sidecar.add(0, image_regions)
+            save_sidecar(sidecar, file_id, {
+                "type": "image",
+                "source": str(upload_path),
+                "processed_file": processed_filename,
+                "frames": 1,
+                "options": {"blur_faces": blur_faces, "blur_text": blur_text,
+                            "blur_plates": blur_plates, "blur_type": blur_type}
+            })
+        log_event(logger, logging.INFO, "job_summary", file_id=file_id, type="image",
+                  status="completed" if success else "error",
+                  seconds=round(time.perf_counter() - started, 3), **stats)
         
-        if is_video:
-            # Start video processing asynchronously
-            asyncio.create_task(process_video_async(
-                str(upload_path), 
-                str(processed_path), 
-                file_id,
-                blur_faces=blur_faces,
-                blur_text=blur_text,
-                blur_plates=blur_plates,
-                blur_type=blur_type
-            ))
-            
+        if success:
+            processing_status[file_id] = {
+                "status": "completed",
+                "progress": 100,
+                "message": message,
+                "detections": stats,
+                "processed_file": processed_filename
+            }
             return JSONResponse(content={
-                "message": "Video uploaded successfully, processing started",
+                "message": message,
                 "original_file": original_filename,
                 "processed_file": processed_filename,
                 "file_id": file_id,
-                "status": "processing",
-                "type": "video"
+                "status": "completed",
+                "type": "image",
+                "ready": True,
+                "detections": stats,
+                "timings": timings.summary()
             })
         else:
-            # Process image synchronously
-            success, message, stats = process_image(
-                str(upload_path), 
-                str(processed_path),
-                blur_faces=blur_faces,
-                blur_text=blur_text,
-                blur_plates=blur_plates,
-                blur_type=blur_type
-            )
-            
-            if success:
-                return JSONResponse(content={
-                    "message": message,
-                    "original_file": original_filename,
-                    "processed_file": processed_filename,
-                    "file_id": file_id,
-                    "status": "completed",
-                    "type": "image",
-                    "ready": True,
-                    "detections": stats
-                })
-            else:
-                raise HTTPException(status_code=500, detail=message)
+            raise HTTPException(status_code=500, detail=message)
+
+
+@app.post("/api/uploads")
+async def create_chunked_upload(
+    request: Request,
+    filename: str,
+    size: int,
+    content_type: str,
+    chunk_size: Optional[int] = None,
+    blur_type: str = "gaussian",
+    blur_faces: bool = True,
+    blur_plates: bool = True,
+    blur_text: bool = True,
+    incremental: bool = INCREMENTAL_DEFAULT,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    preview: bool = False
+):
+    """
+    Start a resumable chunked upload. PUT the chunks (any order, in parallel)
+    to /api/uploads/{upload_id}/chunks/{index} with an X-Chunk-SHA256 header,
+    then POST /api/uploads/{upload_id}/complete to start processing
+    """
+    if not content_type.startswith(('video/', 'image/')):
+        raise HTTPException(status_code=400, detail="File must be a video or image")
+    if not 0 < size <= STORAGE_QUOTA_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"size must be between 1 byte and {STORAGE_QUOTA_MB} MB")
+    client = client_id(request)
+    if await asyncio.to_thread(open_sessions, UPLOAD_SESSIONS_DIR, client) >= UPLOAD_MAX_SESSIONS:
+        raise HTTPException(status_code=429, detail=f"At most {UPLOAD_MAX_SESSIONS} uploads in progress per client")
+    # The session's file is preallocated to its full size: it has to fit under the quota now
+    if not await asyncio.to_thread(storage_manager.reserve, size):
+        raise HTTPException(status_code=507, detail="Not enough storage for this upload right now, try again later")
+    try:
+        session = await asyncio.to_thread(UploadSession.create, UPLOAD_SESSIONS_DIR, filename, content_type, size,
+                                          chunk_size, {"blur_type": blur_type, "blur_faces": blur_faces,
+                                                       "blur_plates": blur_plates, "blur_text": blur_text,
+                                                       "incremental": incremental, "start": start, "end": end,
+                                                       "preview": preview}, client)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return session.status()
+
+
+@app.get("/api/uploads/{upload_id}")
+async def chunked_upload_status(upload_id: str):
+    """Received and missing chunks - what to resend after a disconnect"""
+    try:
+        return UploadSession.open(UPLOAD_SESSIONS_DIR, upload_id).status()
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.put("/api/uploads/{upload_id}/chunks/{index}")
+async def upload_chunk(request: Request, upload_id: str, index: int):
+    try:
+        session = UploadSession.open(UPLOAD_SESSIONS_DIR, upload_id)
+        return await session.write_chunk(index, request.stream(), request.headers.get("x-chunk-sha256"))
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_chunked_upload(request: Request, upload_id: str):
+    """Assemble the upload and start processing it like a regular /api/upload"""
+    try:
+        session = UploadSession.open(UPLOAD_SESSIONS_DIR, upload_id)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_filename = re.sub(r'[^\w\-_\.]', '_', session.status()["filename"] or "upload")
+        upload_path = UPLOAD_DIR / f"{timestamp}_{safe_filename}"
+        state = await asyncio.to_thread(session.complete, upload_path)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     
+    try:
+        return await start_upload_job(request, upload_path, timestamp, state["content_type"].startswith('video/'),
+                                      **state["options"])
     except HTTPException:
         raise
     except Exception as e:
-        traceback.print_exc()
+        logger.exception(f"Upload failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/api/uploads/{upload_id}")
+async def abort_chunked_upload(upload_id: str):
+    try:
+        session = UploadSession.open(UPLOAD_SESSIONS_DIR, upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    await asyncio.to_thread(session.remove)
+    return {"upload_id": upload_id, "status": "aborted"}
+
+
+IMAGE_MEDIA_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.bmp': 'image/bmp',
+    '.webp': 'image/webp',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff'
+}
+
+
+def persist_image_job(file_id: str, original_filename: str, data: bytes, encoded: np.ndarray,
+                      regions: list, options: dict, stats: dict):
+    """
+    Save an in-memory image job after its response has been sent, so it can be
+    downloaded, previewed and re-rendered like a regular upload
+    """
+    try:
+        upload_path = UPLOAD_DIR / original_filename
+        processed_filename = f"processed_{original_filename}"
+        with open(upload_path, "wb") as f:
+            f.write(data)
+        with open(PROCESSED_DIR / processed_filename, "wb") as f:
+            f.write(encoded)
+        
+        sidecar = SidecarWriter()
+        sidecar.add(0, regions)
+        save_sidecar(sidecar, file_id, {
+            "type": "image",
+            "source": str(upload_path),
+            "processed_file": processed_filename,
+            "frames": 1,
+            "options": options
+        })
+        processing_status[file_id] = {
+            "status": "completed",
+            "progress": 100,
+            "message": "Image processed",
+            "detections": stats,
+            "processed_file": processed_filename
+        }
+    except Exception as e:
+        logger.exception(f"Could not persist image {file_id}: {e}")
+        metrics.record_error("persist")
+
+
+@app.post("/api/redact/image")
+async def redact_image(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    blur_type: str = "gaussian",
+    blur_faces: bool = True,
+    blur_plates: bool = True,
+    blur_text: bool = True,
+    persist: bool = False
+):
+    """
+    Low-latency single image redaction: the image is decoded straight from the
+    request body, blurred in memory and returned in this response - no disk
+    round-trip and no second download request. Detection stats are sent in the
+    X-Scannon-Detections header and stage latencies in Server-Timing.
+    With persist=true the original and the result are saved after the response
+    (X-Scannon-File-Id) so download and re-render work as for /api/upload.
+    """
+    filename = file.filename or "upload"
+    extension = Path(filename).suffix.lower()
+    if extension not in IMAGE_MEDIA_TYPES:
+        if not (file.content_type or "").startswith("image/"):
+            raise HTTPException(status_code=400, detail="File must be an image")
+        extension = ".jpg"
+    
+    options = {"blur_faces": blur_faces, "blur_text": blur_text, "blur_plates": blur_plates, "blur_type": blur_type}
+    data = await file.read()
+    timings = StageTimings()
+    regions = [] if persist else None
+    started = time.perf_counter()
+    
+    try:
+        encoded, stats, error = await run_scheduled(
+            "image", client_id(request), process_image_buffer, data, extension,
+            source="image", timings=timings, regions_out=regions, **options
+        )
+    except Exception as e:
+        logger.exception(f"Image redaction failed: {e}")
+        metrics.JOBS.inc(type="image", outcome="error")
+        metrics.record_error("image_job")
         raise HTTPException(status_code=500, detail=str(e))
+    if encoded is None:
+        metrics.JOBS.inc(type="image", outcome="error")
+        raise HTTPException(status_code=400, detail=error)
+    metrics.JOBS.inc(type="image", outcome="completed")
+    
+    seconds = time.perf_counter() - started
+    headers = {
+        "X-Scannon-Detections": json.dumps(stats, separators=(",", ":")),
+        "Server-Timing": ", ".join(
+            [f"{stage};dur={summary['total_ms']}" for stage, summary in timings.summary().items()]
+            + [f"total;dur={round(seconds * 1000, 2)}"]
+        )
+    }
+    if persist:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        safe_stem = re.sub(r'[^\w\-_\.]', '_', Path(filename).stem)
+        original_filename = f"{timestamp}_{safe_stem}{extension}"
+        file_id = f"{timestamp}_{hash(original_filename)}"
+        job_timings[file_id] = timings
+        processing_status[file_id] = {"status": "processing", "progress": 100, "message": "Saving results"}
+        headers["X-Scannon-File-Id"] = file_id
+        headers["X-Scannon-Processed-File"] = f"processed_{original_filename}"
+        background_tasks.add_task(persist_image_job, file_id, original_filename, data, encoded, regions, options, stats)
+    
+    log_event(logger, logging.INFO, "job_summary", type="image", status="completed", inline=True,
+              persist=persist, seconds=round(seconds, 3), **stats)
+    return Response(content=memoryview(encoded), media_type=IMAGE_MEDIA_TYPES[extension], headers=headers,
+                    background=background_tasks)
+
+
+@app.post("/api/batch")
+async def batch_upload(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    blur_type: str = "gaussian",
+    blur_faces: bool = True,
+    blur_plates: bool = True,
+    blur_text: bool = True
+):
+    """
+    Redact many images in one request.
+    Accepts several image files and/or ZIP archives of images. Images are spread
+    across a worker pool and the response is a streamed ZIP containing each
+    redacted image as soon as it finishes, followed by manifest.json with the
+    per-image detection stats.
+    """
+    options = {
+        "blur_faces": blur_faces,
+        "blur_text": blur_text,
+        "blur_plates": blur_plates,
+        "blur_type": blur_type
+    }
+    
+    # Build the work list lazily: (name, callable returning the image bytes)
+    items = []
+    skipped = []
+    archives = []
+    archive_lock = threading.Lock()
+    
+    def read_member(archive, member):
+        def read():
+            with archive_lock:
+                return archive.read(member)
+        return read
+    
+    def read_upload(upload):
+        def read():
+            upload.file.seek(0)
+            return upload.file.read()
+        return read
+    
+    for upload in files:
+        filename = upload.filename or "upload"
+        suffix = Path(filename).suffix.lower()
+        if suffix == '.zip' or upload.content_type in ("application/zip", "application/x-zip-compressed"):
+            try:
+                archive = zipfile.ZipFile(upload.file)
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"{filename} is not a valid ZIP archive")
+            archives.append(archive)
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                if Path(member.filename).suffix.lower() in IMAGE_EXTENSIONS:
+                    items.append((member.filename, read_member(archive, member)))
+                else:
+                    skipped.append(member.filename)
+        elif suffix in IMAGE_EXTENSIONS or (upload.content_type or "").startswith("image/"):
+            if suffix not in IMAGE_EXTENSIONS:
+                filename = f"{filename}.jpg"
+            items.append((filename, read_upload(upload)))
+        else:
+            skipped.append(filename)
+    
+    if not items:
+        raise HTTPException(status_code=400, detail="No images found in the upload")
+    if len(items) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Batch limited to {BATCH_MAX_FILES} images")
+    
+    batch_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    client = client_id(request)
+    
+    async def stream_archive():
+        archive_out = ZipStream()
+        manifest = {"batch_id": batch_id, "options": options, "images": [], "skipped": skipped}
+        totals = {}
+        used_names = set()
+        started = time.perf_counter()
+        metrics.ACTIVE_JOBS.inc(type="batch")
+        
+        # Keep a bounded number of images in flight so finished results never pile up
+        pending = set()
+        queue = iter(items)
+        max_in_flight = BATCH_WORKERS * 2
+        
+        try:
+            while True:
+                for name, read in queue:
+                    pending.add(asyncio.ensure_future(run_scheduled(
+                        "image", client, _run_batch_item, name, read, options, executor=batch_executor
+                    )))
+                    if len(pending) >= max_in_flight:
+                        break
+                if not pending:
+                    break
+                
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    record = future.result()
+                    data = record.pop("data", None)
+                    if data is not None:
+                        # De-duplicate names coming from different archives
+                        output = record["output"]
+                        stem, ext = os.path.splitext(output)
+                        index = 1
+                        while output in used_names:
+                            output = f"{stem}_{index}{ext}"
+                            index += 1
+                        used_names.add(output)
+                        record["output"] = output
+                        yield archive_out.add(output, data)
+                    for key, value in record["detections"].items():
+                        totals[key] = totals.get(key, 0) + value
+                    manifest["images"].append(record)
+            
+            elapsed = time.perf_counter() - started
+            completed = sum(1 for r in manifest["images"] if r["status"] == "completed")
+            manifest["totals"] = totals
+            manifest["completed"] = completed
+            manifest["failed"] = len(manifest["images"]) - completed
+            manifest["seconds"] = round(elapsed, 2)
+            yield archive_out.add("manifest.json", json.dumps(manifest, indent=2).encode("utf-8"),
+                                  compression=zipfile.ZIP_DEFLATED)
+            yield archive_out.close()
+            
+            metrics.JOBS.inc(type="batch", outcome="completed")
+            log_event(logger, logging.INFO, "job_summary", file_id=batch_id, type="batch",
+                      images=len(items), completed=completed, skipped=len(skipped), seconds=round(elapsed, 2),
+                      images_per_second=round(len(items) / elapsed, 2) if elapsed > 0 else 0, **totals)
+        finally:
+            for future in pending:
+                future.cancel()
+            for archive in archives:
+                archive.close()
+            metrics.ACTIVE_JOBS.inc(-1, type="batch")
+    
+    return StreamingResponse(
+        stream_archive(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="scannon_batch_{batch_id}.zip"'}
+    )
 
 
 @app.get("/api/status/{filename}")
@@ -880,12 +2405,24 @@ async def get_status(filename: str):
     """
     Check processing status of a file
     """
-    # Check by filename in processing_status
-    for file_id, status in processing_status.items():
-        if filename in file_id or file_id in filename:
+    # Check by filename in the job status shared by every worker
+    status = await asyncio.to_thread(job_state.find, filename)
+    if status is not None:
+        status.pop("timings", None)
+        return {
+            "file": filename,
+            "ready": status.get("status") == "completed",
+            **status
+        }
+    
+    if broker is not None:
+        status = await asyncio.to_thread(broker.job_for_file, filename)
+        if status is None:
+            status = await asyncio.to_thread(broker.job, filename)
+        if status is not None:
             return {
                 "file": filename,
-                "ready": status.get("status") == "completed",
+                "ready": status["status"] == "completed",
                 **status
             }
     
@@ -914,9 +2451,25 @@ async def get_status(filename: str):
 async def get_progress(file_id: str):
     """
     Get detailed processing progress
+    Includes per-stage latency for this job and for the whole server session
     """
-    if file_id in processing_status:
-        return processing_status[file_id]
+    status = processing_status.get(file_id)
+    if status is not None and status.get("status") == "processing":
+        # Running here: fresher than the last published progress
+        progress = dict(status)
+        if file_id in job_timings:
+            progress["timings"] = job_timings[file_id].summary()
+    else:
+        progress = await asyncio.to_thread(job_state.get, file_id)
+    if progress is not None:
+        progress["session_timings"] = metrics.session_summary()
+        return progress
+    
+    if broker is not None:
+        progress = await asyncio.to_thread(broker.job, file_id)
+        if progress is not None:
+            progress["session_timings"] = metrics.session_summary()
+            return progress
     
     return {
         "status": "unknown",
@@ -924,94 +2477,164 @@ async def get_progress(file_id: str):
     }
 
 
-@app.get("/api/download/{filename}")
-async def download_file(filename: str):
+@app.post("/api/rerender/{file_id}")
+async def rerender_job(
+    request: Request,
+    file_id: str,
+    blur_type: str = "gaussian",
+    padding: float = 0.1,
+    categories: Optional[str] = None
+):
     """
-    Download processed file
+    Re-render a finished job with a different blur style, padding or region
+    filter (comma separated categories, e.g. "faces,plates") using its saved
+    detection sidecar - no detection is run again.
     """
-    file_path = PROCESSED_DIR / filename
+    path = sidecar_path(file_id)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="No saved detections for this file ID")
     
-    if not file_path.exists():
-        # Try without .mp4 extension or with different extension
-        for ext in ['.mp4', '.avi', '.jpg', '.png', '.jpeg']:
-            alt_path = PROCESSED_DIR / (filename.rsplit('.', 1)[0] + ext)
-            if alt_path.exists():
-                file_path = alt_path
-                break
+    selected = None
+    if categories:
+        selected = [c.strip() for c in categories.split(",") if c.strip()]
+        unknown = [c for c in selected if c not in LABELS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown categories {unknown}, expected any of {list(LABELS)}")
+    if not 0 <= padding <= 1:
+        raise HTTPException(status_code=400, detail="padding must be between 0 and 1")
+    if blur_type not in BLUR_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown blur_type {blur_type!r}, expected one of {list(BLUR_TYPES)}")
     
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
+    sidecar = Sidecar(str(path))
+    source = Path(sidecar.meta["source"])
+    if not source.exists():
+        raise HTTPException(status_code=410, detail="Original upload is no longer available")
+    
+    tag = datetime.now().strftime("%H%M%S%f")
+    job_id = f"{file_id}_r{tag}"
+    processed_stem = Path(sidecar.meta["processed_file"]).stem
     
-    # Determine media type
-    suffix = file_path.suffix.lower()
-    media_types = {
-        '.mp4': 'video/mp4',
-        '.avi': 'video/x-msvideo',
-        '.mov': 'video/quicktime',
-        '.webm': 'video/webm',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp'
+    if sidecar.meta["type"] == "video":
+        processed_filename = f"{processed_stem}_{blur_type}_{tag}.mp4"
+        task = asyncio.create_task(rerender_video_async(
+            str(source),
+            str(PROCESSED_DIR / processed_filename),
+            job_id,
+            sidecar,
+            blur_type=blur_type,
+            padding=padding,
+            categories=selected,
+            client=client_id(request)
+        ))
+        protect_job_files(task, source, PROCESSED_DIR / processed_filename)
+        return JSONResponse(content={
+            "message": "Re-render started from saved detections",
+            "processed_file": processed_filename,
+            "file_id": job_id,
+            "status": "processing",
+            "type": "video"
+        })
+    
+    processed_filename = f"{processed_stem}_{blur_type}_{tag}{source.suffix}"
+    result = await run_scheduled("image", client_id(request), rerender_image, str(source),
+                                 str(PROCESSED_DIR / processed_filename), sidecar.regions_for(0, selected),
+                                 blur_type=blur_type, padding=padding)
+    if result is None:
+        raise HTTPException(status_code=500, detail="Could not read original image")
+    written, rendered = result
+    if not written:
+        processing_status[job_id] = {
+            "status": "error",
+            "progress": 0,
+            "message": "Could not write the re-rendered image"
+        }
+        raise HTTPException(status_code=500, detail="Could not write the re-rendered image")
+    processing_status[job_id] = {
+        "status": "completed",
+        "progress": 100,
+        "message": f"Re-rendered {rendered} regions",
+        "processed_file": processed_filename
     }
-    media_type = media_types.get(suffix, 'application/octet-stream')
+    return JSONResponse(content={
+        "message": f"Re-rendered {rendered} regions",
+        "processed_file": processed_filename,
+        "file_id": job_id,
+        "status": "completed",
+        "type": "image",
+        "ready": True
+    })
+
+
+@app.delete("/api/jobs/{file_id}")
+async def cancel_job(file_id: str):
+    """
+    Cancel a running video or re-render job. It stops at the next frame
+    boundary, frees its decoder/encoder and deletes the partial output.
+    """
+    if not scheduler.cancel(file_id):
+        if broker is not None and await asyncio.to_thread(broker.cancel_job, file_id):
+            return {"file_id": file_id, "status": "cancelled"}
+        # Running on another worker: it cancels the job at its next state sync
+        if await asyncio.to_thread(job_state.request_cancel, file_id):
+            return {"file_id": file_id, "status": "cancelling"}
+        status = await asyncio.to_thread(job_state.get, file_id)
+        if status is None and broker is not None:
+            status = await asyncio.to_thread(broker.job, file_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        raise HTTPException(status_code=409, detail=f"Job is already {status.get('status')}")
     
-    return FileResponse(
-        path=str(file_path),
-        filename=file_path.name,
-        media_type=media_type
-    )
+    if file_id in processing_status:
+        processing_status[file_id] = {**processing_status[file_id], "message": "Cancelling..."}
+    return {"file_id": file_id, "status": "cancelling"}
+
+
+@app.api_route("/api/download/{filename}", methods=["GET", "HEAD"])
+async def download_file(request: Request, filename: str):
+    """
+    Download processed file (strong ETag, conditional GET and byte ranges)
+    """
+    found = processed_index.resolve(filename)
+    if found is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    file_path, stat_result = found
+    storage_manager.touch(file_path)
+    # A running job is still writing its output
+    mutable = await asyncio.to_thread(storage_manager.is_active, file_path)
+    return await artifact_response(request, processed_index, file_path, stat_result, mutable=mutable)
 
 
-@app.get("/api/preview/{filename}")
-async def preview_file(filename: str):
+@app.api_route("/api/preview/{filename}", methods=["GET", "HEAD"])
+async def preview_file(request: Request, filename: str):
     """
     Preview original uploaded file
     """
-    file_path = UPLOAD_DIR / filename
-    
-    if not file_path.exists():
+    found = upload_index.resolve(filename)
+    if found is None:
         raise HTTPException(status_code=404, detail="File not found")
-    
-    suffix = file_path.suffix.lower()
-    media_types = {
-        '.mp4': 'video/mp4',
-        '.avi': 'video/x-msvideo',
-        '.mov': 'video/quicktime',
-        '.webm': 'video/webm',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp'
-    }
-    media_type = media_types.get(suffix, 'application/octet-stream')
-    
-    return FileResponse(
-        path=str(file_path),
-        filename=filename,
-        media_type=media_type
-    )
+    return await artifact_response(request, upload_index, *found)
 
 
 @app.delete("/api/cleanup")
 async def cleanup_files():
     """
-    Clean up all files
+    Clean up all files (files of jobs that are still running are kept)
     """
     try:
-        deleted_count = 0
-        for file in UPLOAD_DIR.glob("*"):
-            file.unlink()
-            deleted_count += 1
-        for file in PROCESSED_DIR.glob("*"):
-            file.unlink()
-            deleted_count += 1
+        expired_uploads = await asyncio.to_thread(expire_sessions, UPLOAD_SESSIONS_DIR)
+        # Also the checkpoints of jobs that are not running (failed or interrupted for good)
+        result = await asyncio.to_thread(storage_manager.clear)
         
-        processing_status.clear()
+        for file_id in list(processing_status):
+            if processing_status[file_id].get("status") != "processing":
+                processing_status.pop(file_id, None)
+                job_timings.pop(file_id, None)
+        await asyncio.to_thread(job_state.prune)
         
-        return {"message": f"Cleanup successful, deleted {deleted_count} files"}
+        message = f"Cleanup successful, deleted {result['deleted']} files"
+        if result["skipped_active"]:
+            message += f" ({result['skipped_active']} in use by running jobs kept)"
+        return {"message": message, **result, "expired_uploads": expired_uploads}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1026,8 +2649,13 @@ async def delete_file(filename: str):
         processed_path = PROCESSED_DIR / filename
         processed_path2 = PROCESSED_DIR / f"processed_{filename}"
         
+        paths = [upload_path, processed_path, processed_path2]
+        for path in paths:
+            if path.exists() and await asyncio.to_thread(storage_manager.is_active, path):
+                raise HTTPException(status_code=409, detail=f"{path.name} is in use by a running job")
+        
         deleted = []
-        for path in [upload_path, processed_path, processed_path2]:
+        for path in paths:
             if path.exists():
                 path.unlink()
                 deleted.append(str(path.name))
@@ -1050,17 +2678,20 @@ async def health_check():
     ai_model_status = {
         "mediapipe": {
             "available": MEDIAPIPE_AVAILABLE,
-            "loaded": mp_face_detection is not None,
+            "loaded": face_pool.created > 0,
+            "pool": face_pool.stats(),
             "purpose": "Face detection"
         },
         "yolov8": {
             "available": YOLO_AVAILABLE,
-            "loaded": yolo_model is not None,
+            "loaded": yolo_pool.created > 0,
+            "pool": yolo_pool.stats(),
             "purpose": "Object detection (screens, documents, devices)"
         },
         "easyocr": {
             "available": EASYOCR_AVAILABLE,
-            "loaded": ocr_reader is not None,
+            "loaded": ocr_pool.created > 0,
+            "pool": ocr_pool.stats(),
             "purpose": "Text detection (emails, phone numbers, sensitive data)"
         }
     }
@@ -1072,16 +2703,58 @@ async def health_check():
         "ai_models": ai_model_status,
         "upload_dir": str(UPLOAD_DIR.absolute()),
         "processed_dir": str(PROCESSED_DIR.absolute()),
+        "storage": storage_manager.usage(),
+        "artifacts": {"processed": processed_index.stats(), "uploads": upload_index.stats()},
+        "scheduler": scheduler.stats(),
+        "frame_pool": frame_pool.stats(),
+        "broker": await asyncio.to_thread(broker.stats) if broker is not None else None,
+        "process": {
+            "pid": os.getpid(),
+            "worker": os.getenv("SCANNON_WORKER_INDEX"),
+            "memory": metrics.process_memory()
+        },
         "capabilities": {
             "face_detection": MEDIAPIPE_AVAILABLE,
             "screen_detection": YOLO_AVAILABLE,
             "text_detection": EASYOCR_AVAILABLE,
             "realtime_processing": True,
+            "stub_detectors": STUB_DETECTORS,
             "comprehensive_privacy": MEDIAPIPE_AVAILABLE and YOLO_AVAILABLE and EASYOCR_AVAILABLE
         }
     }
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, frame/detection/error counters
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/admin/memory")
+async def memory_report(request: Request, top: int = 10):
+    """
+    Memory profile of this worker process: RSS and peak RSS, and with
+    SCANNON_MEMORY_PROFILING=1 traced allocations per stage, live and recent
+    jobs/sessions and the top `top` allocation sites. Also the size of the
+    in-memory registries that grow with every job
+    """
+    if memory_profiler.enabled and not ADMIN_TOKEN:
+        # Allocation sites and a tracemalloc snapshot per call are not for anonymous clients
+        raise HTTPException(status_code=403, detail="Set SCANNON_ADMIN_TOKEN to read the memory profile")
+    if ADMIN_TOKEN and request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+    report = await asyncio.to_thread(memory_profiler.report, max(0, top))
+    report["registries"] = {
+        "processing_status": len(processing_status),
+        "job_timings": len(job_timings),
+        "artifact_names": processed_index.stats()["files"] + upload_index.stats()["files"],
+    }
+    report["pid"] = os.getpid()
+    return report
+
+
 @app.websocket("/ws/realtime")
 async def websocket_realtime(websocket: WebSocket):
     """
@@ -1089,52 +2762,68 @@ async def websocket_realtime(websocket: WebSocket):
     Receives frames from client, processes them, and sends back blurred frames
     """
     await websocket.accept()
-    print("🔴 Real-time session started")
+    client = client_id(websocket)
+    session_timings = StageTimings()
+    session_frames = 0
+    started = time.perf_counter()
+    log_event(logger, logging.INFO, "realtime_session_started", client=client)
+    metrics.ACTIVE_JOBS.inc(type="realtime")
+    memory = await asyncio.to_thread(memory_profiler.track, f"realtime:{client}", "realtime")
     
     try:
         while True:
             # Receive frame data from client
             data = await websocket.receive_text()
             message = json.loads(data)
-            
+
             if message.get("type") == "frame":
                 # Decode base64 image
-                img_data = base64.b64decode(message["data"].split(",")[1])
-                nparr = np.frombuffer(img_data, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                
+                with stage_timer("decode", session_timings):
+                    img_data = base64.b64decode(message["data"].split(",")[1])
+                    nparr = np.frombuffer(img_data, np.uint8)
+                    frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
                 if frame is not None:
-                    # Process frame with AI detection (fast mode - only faces and documents)
-                    processed_frame, stats = process_frame(
-                        frame,
-                        blur_faces=True,
-                        blur_text=False,  # Disable OCR for speed in real-time
-                        blur_plates=False,  # Disable for speed
-                        blur_type="gaussian"
+                    # Fast mode - only faces and documents
+                    processed_frame, stats = await run_scheduled(
+                        "realtime", client, process_frame, frame,
+                        timings=session_timings, source="realtime", **REALTIME_OPTIONS
                     )
-                    
+                    session_frames += 1
+                    if memory is not None:
+                        memory.sample()
+
                     # Encode processed frame to JPEG
-                    _, buffer = cv2.imencode('.jpg', processed_frame, (cv2.IMWRITE_JPEG_QUALITY, 85))
-                    processed_base64 = base64.b64encode(buffer).decode('utf-8')
-                    
+                    with stage_timer("encode", session_timings):
+                        _, buffer = cv2.imencode('.jpg', processed_frame, (cv2.IMWRITE_JPEG_QUALITY, 85))
+                        processed_base64 = base64.b64encode(buffer).decode('utf-8')
+
                     # Send processed frame back
                     await websocket.send_json({
                         "type": "processed_frame",
                         "data": f"data:image/jpeg;base64,{processed_base64}",
                         "stats": stats
                     })
-            
+
             elif message.get("type") == "close":
-                print("🛑 Client requested close")
+                log_event(logger, logging.INFO, "realtime_close_requested")
                 break
-                
+
     except WebSocketDisconnect:
-        print("🔌 Real-time session disconnected")
+        log_event(logger, logging.INFO, "realtime_disconnected")
     except Exception as e:
-        print(f"❌ Real-time processing error: {e}")
-        traceback.print_exc()
+        logger.exception(f"Real-time processing error: {e}")
+        metrics.record_error("realtime")
     finally:
-        print("✅ Real-time session ended")
+        metrics.ACTIVE_JOBS.inc(-1, type="realtime")
+        elapsed = time.perf_counter() - started
+        log_event(logger, logging.INFO, "realtime_session_summary", frames=session_frames,
+                  seconds=round(elapsed, 1), fps=round(session_frames / elapsed, 2) if elapsed > 0 else 0,
+                  stages=session_timings.summary())
+        if memory is not None:
+            result = await asyncio.to_thread(memory_profiler.finish, memory)
+            log_event(logger, logging.INFO, "realtime_session_memory", client=client,
+                      **{key: value for key, value in result.items() if key != "top_growth"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,297 @@
+"""
+Opt-in memory instrumentation (SCANNON_MEMORY_PROFILING).
+
+Meant to find out what takes a worker to its OOM kill: the whole-file upload
+read, decoded frames, detector tensors or a status dict that keeps growing.
+
+SCANNON_MEMORY_PROFILING=rss (cheap enough for a canary):
+  - every stage_timer() stage records its RSS delta, which also covers
+    allocators tracemalloc cannot see (OpenCV internals, torch, ONNX)
+  - each video job / re-render / realtime session gets a MemoryTracker with
+    its peak RSS, sampled at every frame
+
+SCANNON_MEMORY_PROFILING=1 additionally starts tracemalloc
+(SCANNON_TRACEMALLOC_FRAMES frames of traceback per block):
+  - stages also record their net traced allocation and the traced peak
+    above their start
+  - trackers take a snapshot at the start and end of the job; the top
+    growth by source line goes into the job result
+
+Stages nest (process_frame wraps faces, documents...) and run concurrently,
+so tracemalloc's peak is never reset. Instead a PeakSampler thread reads the
+traced size every SCANNON_MEMORY_PEAK_SAMPLE_MS and keeps the maximum for
+every open stage and tracker; a window that raises tracemalloc's own
+process-wide peak gets that exact value. Net allocations and RSS deltas
+still include whatever overlapping stages in other threads did.
+/api/admin/memory reports the live trackers, the last SCANNON_MEMORY_HISTORY
+finished ones and the top allocation sites. Disabled, the only cost is one
+None check per stage.
+"""
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import metrics
+
+MEMORY_PROFILING = os.getenv("SCANNON_MEMORY_PROFILING", "0").lower()  # 0, rss or 1 (tracemalloc)
+TRACEMALLOC_FRAMES = int(os.getenv("SCANNON_TRACEMALLOC_FRAMES", "1"))
+TOP_ALLOCATIONS = int(os.getenv("SCANNON_MEMORY_TOP", "10"))
+HISTORY = int(os.getenv("SCANNON_MEMORY_HISTORY", "50"))
+PEAK_SAMPLE_MS = float(os.getenv("SCANNON_MEMORY_PEAK_SAMPLE_MS", "2"))
+
+_PAGE_KB = os.sysconf("SC_PAGE_SIZE") / 1024 if hasattr(os, "sysconf") else 4.0
+# Allocations made by the profiler itself
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+def rss_kb() -> float:
+    """Current resident set size (cheap: one read of /proc/self/statm)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_KB
+    except (OSError, IndexError, ValueError):
+        return 0.0
+
+
+def peak_rss_mb() -> float:
+    """Highest RSS of the process so far (VmHWM)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except (ImportError, OSError):
+        return 0.0
+
+
+def _top(snapshot, previous=None, limit: int = TOP_ALLOCATIONS) -> list:
+    snapshot = snapshot.filter_traces(_SNAPSHOT_FILTERS)
+    if previous is not None:
+        stats = snapshot.compare_to(previous.filter_traces(_SNAPSHOT_FILTERS), "lineno")
+        stats = sorted(stats, key=lambda stat: stat.size_diff, reverse=True)
+        return [{"where": str(stat.traceback[0]), "size_kb": round(stat.size_diff / 1024, 1),
+                 "blocks": stat.count_diff} for stat in stats[:limit] if stat.size_diff > 0]
+    return [{"where": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "blocks": stat.count}
+            for stat in snapshot.statistics("lineno")[:limit]]
+
+
+class PeakSampler:
+    """
+    Highest traced size during any number of overlapping windows, without
+    tracemalloc.reset_peak(). A window is [start, process peak at open, max seen]
+    """
+
+    def __init__(self, interval_ms: float = PEAK_SAMPLE_MS):
+        self.interval = max(0.0005, interval_ms / 1000)
+        self._windows: Dict[int, list] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="scannon-memory-peaks", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self._windows:
+                continue
+            current = tracemalloc.get_traced_memory()[0]
+            with self._lock:
+                for window in self._windows.values():
+                    if current > window[2]:
+                        window[2] = current
+
+    def open(self) -> list:
+        current, peak = tracemalloc.get_traced_memory()
+        window = [current, peak, current]
+        with self._lock:
+            self._windows[id(window)] = window
+        return window
+
+    def peak(self, window: list) -> int:
+        """Highest traced size seen so far in the window (bytes)"""
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            seen = max(window[2], current)
+        # A new process-wide high was set while the window was open: that is the exact peak
+        return max(seen, peak) if peak > window[1] else seen
+
+    def close(self, window: list) -> int:
+        peak = self.peak(window)
+        with self._lock:
+            self._windows.pop(id(window), None)
+        return peak
+
+
+peak_sampler = PeakSampler()
+
+
+class StageProbe:
+    """metrics.stage_timer hook: memory deltas of one stage"""
+
+    def __init__(self, traced: bool):
+        self.traced = traced
+
+    def begin(self) -> Tuple[Optional[list], float]:
+        return (peak_sampler.open() if self.traced else None), rss_kb()
+
+    def end(self, started: Tuple[Optional[list], float]) -> Tuple[float, float, float]:
+        """(net allocated KB, traced peak above the start KB, RSS delta KB); traced values 0 in rss mode"""
+        window, rss_start = started
+        if window is None:
+            return 0.0, 0.0, rss_kb() - rss_start
+        peak = peak_sampler.close(window)
+        current = tracemalloc.get_traced_memory()[0]
+        return (current - window[0]) / 1024, max(0, peak - window[0]) / 1024, rss_kb() - rss_start
+
+
+class MemoryTracker:
+    """Memory of one job or realtime session, from start to finish"""
+
+    def __init__(self, name: str, kind: str, snapshots: bool = True):
+        self.name = name
+        self.kind = kind
+        self.started = time.time()
+        self.frames = 0
+        self.rss_start_kb = self.rss_peak_kb = rss_kb()
+        self._window = peak_sampler.open() if tracemalloc.is_tracing() else None
+        self.traced_start = self._window[0] if self._window else 0
+        self._snapshot = tracemalloc.take_snapshot() if snapshots and tracemalloc.is_tracing() else None
+        self.result = None
+
+    def sample(self):
+        """Once per frame: track the RSS peak (the traced peak is sampled by peak_sampler)"""
+        self.frames += 1
+        self.rss_peak_kb = max(self.rss_peak_kb, rss_kb())
+
+    @property
+    def traced_peak(self) -> int:
+        return peak_sampler.peak(self._window) if self._window else 0
+
+    def finish(self) -> dict:
+        """Summary for the job result (takes the end snapshot - call from a worker thread)"""
+        if self.result is not None:
+            return self.result
+        self.rss_peak_kb = max(self.rss_peak_kb, rss_kb())
+        traced_peak = peak_sampler.close(self._window) if self._window else 0
+        traced_end = tracemalloc.get_traced_memory()[0]
+        self.result = {
+            "rss_start_mb": round(self.rss_start_kb / 1024, 1),
+            "rss_end_mb": round(rss_kb() / 1024, 1),
+            "rss_peak_mb": round(self.rss_peak_kb / 1024, 1),
+            "rss_growth_mb": round((self.rss_peak_kb - self.rss_start_kb) / 1024, 1),
+            "process_peak_rss_mb": peak_rss_mb(),
+        }
+        if self._window and tracemalloc.is_tracing():
+            self.result["traced_growth_mb"] = round((traced_end - self.traced_start) / (1024 * 1024), 2)
+            self.result["traced_peak_growth_mb"] = round((traced_peak - self.traced_start) / (1024 * 1024), 2)
+        if self._snapshot is not None and tracemalloc.is_tracing():
+            self.result["top_growth"] = _top(tracemalloc.take_snapshot(), self._snapshot)
+            self._snapshot = None
+        return self.result
+
+    def live(self) -> dict:
+        live = {
+            "name": self.name,
+            "kind": self.kind,
+            "seconds": round(time.time() - self.started, 1),
+            "frames": self.frames,
+            "rss_peak_mb": round(self.rss_peak_kb / 1024, 1),
+            "rss_growth_mb": round((self.rss_peak_kb - self.rss_start_kb) / 1024, 1),
+        }
+        if self._window and tracemalloc.is_tracing():
+            live["traced_peak_growth_mb"] = round((self.traced_peak - self.traced_start) / (1024 * 1024), 2)
+        return live
+
+
+class MemoryProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.mode = "0"
+        self._active: Dict[int, MemoryTracker] = {}
+        self._finished = deque(maxlen=HISTORY)
+        self._lock = threading.Lock()
+
+    def enable(self, mode: str = "1", frames: int = TRACEMALLOC_FRAMES):
+        """mode "rss": RSS only; anything else also traces allocations with tracemalloc"""
+        if self.enabled:
+            return
+        traced = mode != "rss"
+        if traced and not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, frames))
+        if traced:
+            peak_sampler.start()
+        metrics.memory_probe = StageProbe(traced)
+        self.enabled, self.mode = True, "rss" if not traced else "tracemalloc"
+
+    def disable(self):
+        metrics.memory_probe = None
+        peak_sampler.stop()
+        tracemalloc.stop()
+        self.enabled, self.mode = False, "0"
+
+    def track(self, name: str, kind: str, snapshots: bool = True) -> Optional[MemoryTracker]:
+        """A tracker for a job/session, or None when profiling is off"""
+        if not self.enabled:
+            return None
+        tracker = MemoryTracker(name, kind, snapshots)
+        with self._lock:
+            self._active[id(tracker)] = tracker
+        return tracker
+
+    def finish(self, tracker: Optional[MemoryTracker]) -> Optional[dict]:
+        if tracker is None:
+            return None
+        result = tracker.finish()
+        with self._lock:
+            if self._active.pop(id(tracker), None) is not None:
+                self._finished.append({"name": tracker.name, "kind": tracker.kind,
+                                       "frames": tracker.frames, **result})
+        return result
+
+    def report(self, top: int = TOP_ALLOCATIONS) -> dict:
+        report = {
+            "enabled": self.enabled,
+            "mode": self.mode,
+            "process": {**metrics.process_memory(), "peak_rss_mb": peak_rss_mb()},
+        }
+        if not self.enabled:
+            return report
+        with self._lock:
+            active = [tracker.live() for tracker in self._active.values()]
+            finished = list(self._finished)
+        report.update({
+            "stages": metrics.SESSION_TIMINGS.memory_summary(),
+            "active": active,
+            "finished": finished,
+        })
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report["traced"] = {"current_mb": round(current / (1024 * 1024), 1),
+                                "peak_mb": round(peak / (1024 * 1024), 1),
+                                "overhead_mb": round(tracemalloc.get_tracemalloc_memory() / (1024 * 1024), 1)}
+            if top:
+                report["top_allocations"] = _top(tracemalloc.take_snapshot(), limit=top)
+        return report
+
+
+memory_profiler = MemoryProfiler()
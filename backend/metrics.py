@@ -0,0 +1,258 @@
+"""
+Lightweight latency / counter instrumentation for the SCANNON.AI pipeline.
+
+Every detector and pipeline stage is wrapped in `stage_timer(...)`, which
+feeds a process-wide latency histogram (exported on /metrics in Prometheus
+text format) and, optionally, a per-job `StageTimings` summary that ends up
+in the /api/progress payload.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+# Latency buckets in seconds (1ms .. 10s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STARTED_AT = time.time()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels)
+    if extra is not None:
+        items.append(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Point-in-time value with labels"""
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram with labels (cumulative buckets rendered on export)"""
+
+    def __init__(self, name: str, description: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[Tuple[str, str], ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[key] = series
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total!r}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class StageTimings:
+    """Per-job / per-session latency summary: count, total, max per stage"""
+
+    def __init__(self):
+        self._stages: Dict[str, list] = {}
+        self._memory: Dict[str, list] = {}  # with memory profiling: count, net KB, max peak KB, max RSS KB
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, memory: Optional[Tuple[float, float, float]] = None):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                self._stages[stage] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+            if memory is not None:
+                allocated, peak, rss = memory
+                entry = self._memory.get(stage)
+                if entry is None:
+                    self._memory[stage] = [1, allocated, peak, rss]
+                else:
+                    entry[0] += 1
+                    entry[1] += allocated
+                    entry[2] = max(entry[2], peak)
+                    entry[3] = max(entry[3], rss)
+
+    def memory_summary(self):
+        """Per stage: average net allocation, largest transient peak and RSS jump (KB)"""
+        with self._lock:
+            stages = {stage: list(entry) for stage, entry in self._memory.items()}
+        return {
+            stage: {
+                "count": count,
+                "avg_alloc_kb": round(allocated / count, 1),
+                "max_peak_kb": round(peak, 1),
+                "max_rss_kb": round(rss, 1),
+            }
+            for stage, (count, allocated, peak, rss) in stages.items()
+        }
+
+    def summary(self):
+        with self._lock:
+            stages = {stage: list(entry) for stage, entry in self._stages.items()}
+        return {
+            stage: {
+                "count": count,
+                "total_ms": round(total * 1000, 2),
+                "avg_ms": round(total * 1000 / count, 2) if count else 0.0,
+                "max_ms": round(worst * 1000, 2),
+            }
+            for stage, (count, total, worst) in stages.items()
+        }
+
+
+# Process-wide metrics
+STAGE_LATENCY = Histogram("scannon_stage_latency_seconds", "Latency of detector and pipeline stages")
+FRAMES_PROCESSED = Counter("scannon_frames_processed_total", "Frames run through process_frame")
+DETECTIONS = Counter("scannon_detections_total", "Regions detected, by kind")
+ERRORS = Counter("scannon_errors_total", "Errors raised inside pipeline stages")
+JOBS = Counter("scannon_jobs_total", "Processing jobs by type and outcome")
+ACTIVE_JOBS = Gauge("scannon_active_jobs", "Jobs currently being processed")
+
+REGISTRY = [STAGE_LATENCY, FRAMES_PROCESSED, DETECTIONS, ERRORS, JOBS, ACTIVE_JOBS]
+
+# Session-level (process lifetime) stage summary
+SESSION_TIMINGS = StageTimings()
+
+# Set by memprofile when SCANNON_MEMORY_PROFILING=1: per-stage memory deltas next to the latencies
+memory_probe = None
+
+
+@contextmanager
+def stage_timer(stage: str, timings: Optional[StageTimings] = None):
+    """Time a pipeline stage into the global histogram and an optional job summary"""
+    probe = memory_probe
+    memory_start = probe.begin() if probe is not None else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        memory = probe.end(memory_start) if probe is not None else None
+        STAGE_LATENCY.observe(elapsed, stage=stage)
+        SESSION_TIMINGS.add(stage, elapsed, memory)
+        if timings is not None:
+            timings.add(stage, elapsed, memory)
+
+
+def record_error(stage: str):
+    ERRORS.inc(stage=stage)
+
+
+def record_detections(stats: dict):
+    for kind, count in stats.items():
+        if kind != 'total' and count:
+            DETECTIONS.inc(count, kind=kind)
+
+
+def session_summary():
+    return {
+        "uptime_seconds": round(time.time() - STARTED_AT, 1),
+        "stages": SESSION_TIMINGS.summary(),
+    }
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    Resident memory of a process in MB (Linux /proc): rss, pss (RSS with shared
+    pages divided among the processes sharing them - the number to sum when
+    sizing a container) and shared. Empty when /proc is not available.
+    """
+    pid = pid or os.getpid()
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty"):
+                    fields[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        fields["Rss"] = int(line.split()[1]) / 1024
+        except OSError:
+            return {}
+    memory = {"rss_mb": round(fields.get("Rss", 0.0), 1)}
+    if "Pss" in fields:
+        memory["pss_mb"] = round(fields["Pss"], 1)
+        memory["shared_mb"] = round(fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0), 1)
+    return memory
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
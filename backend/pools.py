@@ -0,0 +1,110 @@
+"""
+Bounded pools of detector instances.
+
+MediaPipe graphs, the YOLO model and the EasyOCR reader are not reentrant, so
+a single shared instance has to be serialized across every request, websocket
+session and background job. A DetectorPool holds up to `size` instances of
+one model: callers check one out for the duration of a call, instances are
+created lazily the first time all existing ones are busy, and the time spent
+waiting for an instance is recorded per model.
+
+    with face_pool.checkout() as detector:
+        results = detector.process(rgb_frame)
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List
+
+import metrics
+from logs import logger
+
+POOL_WAIT = metrics.Histogram("scannon_detector_pool_wait_seconds", "Time spent waiting for a free detector instance")
+POOL_INSTANCES = metrics.Gauge("scannon_detector_pool_instances", "Detector instances created, by model")
+POOL_IN_USE = metrics.Gauge("scannon_detector_pool_in_use", "Detector instances checked out, by model")
+metrics.REGISTRY.extend([POOL_WAIT, POOL_INSTANCES, POOL_IN_USE])
+
+
+class DetectorPool:
+    def __init__(self, name: str, factory: Callable[[], object], size: int):
+        self.name = name
+        self.factory = factory
+        self.size = max(1, size)
+        self._idle: List[object] = []
+        self._created = 0
+        self._in_use = 0
+        self._condition = threading.Condition()
+        self._timings = metrics.StageTimings()
+
+    @property
+    def created(self) -> int:
+        return self._created
+
+    def preload(self, count: int = 1):
+        """Create instances up front (e.g. before forking workers so they share them)"""
+        instances = []
+        try:
+            for _ in range(min(count, self.size)):
+                instances.append(self.acquire())
+        finally:
+            for instance in instances:
+                self.release(instance)
+
+    def _create(self, number: int):
+        started = time.perf_counter()
+        instance = self.factory()
+        POOL_INSTANCES.inc(model=self.name)
+        logger.info(f"Created {self.name} instance {number}/{self.size} "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return instance
+
+    def acquire(self):
+        started = time.perf_counter()
+        number = 0  # set when this call has to build a new instance
+        with self._condition:
+            while not self._idle:
+                if self._created < self.size:
+                    # Reserve the slot, build the instance outside the lock
+                    self._created += 1
+                    number = self._created
+                    break
+                self._condition.wait()
+            instance = None if number else self._idle.pop()
+            self._in_use += 1
+
+        if number:
+            try:
+                instance = self._create(number)
+            except Exception:
+                with self._condition:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._condition.notify()
+                raise
+
+        waited = time.perf_counter() - started
+        POOL_WAIT.observe(waited, model=self.name)
+        POOL_IN_USE.inc(model=self.name)
+        self._timings.add("wait", waited)
+        return instance
+
+    def release(self, instance):
+        with self._condition:
+            self._idle.append(instance)
+            self._in_use -= 1
+            self._condition.notify()
+        POOL_IN_USE.inc(-1, model=self.name)
+
+    @contextmanager
+    def checkout(self):
+        instance = self.acquire()
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = {"size": self.size, "created": self._created, "in_use": self._in_use, "idle": len(self._idle)}
+        stats["wait"] = self._timings.summary().get("wait", {})
+        return stats
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Production launcher: load the models once, then fork the server workers.
+
+`python prefork.py --workers 4 --port 8000`
+
+The master imports `main` (MediaPipe, YOLO and EasyOCR are loaded at import
+time), freezes the garbage collector so the loaded objects are not written
+to by later collections, binds the listening socket and forks the workers.
+Every worker serves the already-loaded app on the shared socket, so model
+weights stay in copy-on-write pages shared by all workers instead of being
+loaded once per worker.
+
+The master then supervises:
+  - dead workers are restarted (with a back-off if they keep crashing)
+  - workers whose event loop stops ticking for SCANNON_WORKER_TIMEOUT
+    seconds are killed and restarted
+  - RSS/PSS of every process is logged every SCANNON_MEMORY_REPORT_INTERVAL
+    seconds; the PSS total is what the container actually needs
+
+Linux only (os.fork, /proc). Every request can reach any worker, so job
+status and timings, cancel requests and the files running jobs protect are
+shared through jobs/state.db (see jobstate.py). Background housekeeping
+(storage janitor, broker assembly) only runs in worker 0.
+"""
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+WORKERS = int(os.getenv("SCANNON_WORKERS", "2"))
+WORKER_TIMEOUT = float(os.getenv("SCANNON_WORKER_TIMEOUT", "30"))
+MEMORY_REPORT_INTERVAL = float(os.getenv("SCANNON_MEMORY_REPORT_INTERVAL", "60"))
+GRACEFUL_TIMEOUT = float(os.getenv("SCANNON_GRACEFUL_TIMEOUT", "30"))
+MIN_UPTIME = 10  # a worker dying sooner than this counts as a crash loop
+MAX_BACKOFF = 30
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server that reports a heartbeat from its event loop (every ~0.1s tick)"""
+
+    def __init__(self, config, index, heartbeats):
+        super().__init__(config)
+        self.index = index
+        self.heartbeats = heartbeats
+
+    async def on_tick(self, counter):
+        self.heartbeats[self.index] = time.time()
+        return await super().on_tick(counter)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Master:
+    def __init__(self, app_module, sock, workers, log_level):
+        self.main = app_module
+        self.sock = sock
+        self.workers = workers
+        self.log_level = log_level
+        self.heartbeats = multiprocessing.RawArray('d', workers)  # shared anonymous memory, survives fork
+        self.pids = {}  # slot -> pid
+        self.started_at = {}  # slot -> time
+        self.failures = [0] * workers
+        self.next_start = [0.0] * workers
+        self.stopping = False
+
+    # Workers ---------------------------------------------------------------
+
+    def spawn(self, slot: int):
+        self.heartbeats[slot] = time.time()
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(slot)  # never returns
+        self.pids[slot] = pid
+        self.started_at[slot] = time.time()
+        self.main.log_event(self.main.logger, logging.INFO, "worker_started", worker=slot, pid=pid)
+
+    def _run_worker(self, slot: int):
+        code = 0
+        try:
+            for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+                signal.signal(sig, signal.SIG_DFL)
+            os.environ["SCANNON_WORKER_INDEX"] = str(slot)
+            config = uvicorn.Config(self.main.app, log_level=self.log_level, lifespan="on",
+                                    timeout_graceful_shutdown=GRACEFUL_TIMEOUT)
+            WorkerServer(config, slot, self.heartbeats).run(sockets=[self.sock])
+        except BaseException:
+            logging.getLogger("scannon").exception(f"Worker {slot} crashed")
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = next((s for s, p in self.pids.items() if p == pid), None)
+            if slot is None:
+                continue
+            del self.pids[slot]
+            uptime = time.time() - self.started_at.pop(slot, time.time())
+            if self.stopping:
+                continue
+            self.failures[slot] = self.failures[slot] + 1 if uptime < MIN_UPTIME else 0
+            delay = min(MAX_BACKOFF, 2 ** self.failures[slot] - 1)
+            self.next_start[slot] = time.time() + delay
+            self.main.log_event(self.main.logger, logging.WARNING, "worker_exited", worker=slot, pid=pid,
+                                code=os.waitstatus_to_exitcode(status), uptime=round(uptime, 1),
+                                restart_in=delay)
+
+    def check_heartbeats(self):
+        now = time.time()
+        for slot, pid in list(self.pids.items()):
+            silent = now - self.heartbeats[slot]
+            if silent > WORKER_TIMEOUT:
+                self.main.log_event(self.main.logger, logging.ERROR, "worker_unresponsive", worker=slot, pid=pid,
+                                    silent_seconds=round(silent, 1))
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.heartbeats[slot] = now  # do not kill twice while it is being reaped
+
+    def report_memory(self):
+        master = self.main.metrics.process_memory()
+        total_pss = master.get("pss_mb", 0.0)
+        for slot, pid in sorted(self.pids.items()):
+            memory = self.main.metrics.process_memory(pid)
+            total_pss += memory.get("pss_mb", 0.0)
+            self.main.log_event(self.main.logger, logging.INFO, "worker_memory", worker=slot, pid=pid, **memory)
+        self.main.log_event(self.main.logger, logging.INFO, "worker_memory", worker="master", pid=os.getpid(),
+                            workers=len(self.pids), total_pss_mb=round(total_pss, 1), **master)
+
+    # Supervision -----------------------------------------------------------
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        last_report = time.time()
+        while not self.stopping:
+            self.reap()
+            now = time.time()
+            for slot in range(self.workers):
+                if slot not in self.pids and now >= self.next_start[slot]:
+                    self.spawn(slot)
+            self.check_heartbeats()
+            if MEMORY_REPORT_INTERVAL and now - last_report >= MEMORY_REPORT_INTERVAL:
+                self.report_memory()
+                last_report = now
+            time.sleep(0.5)
+
+        self.shutdown()
+
+    def shutdown(self):
+        print(f"Stopping {len(self.pids)} workers...")
+        for pid in self.pids.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + GRACEFUL_TIMEOUT + 5
+        while self.pids and time.time() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.pids.values():
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SCANNON.AI with preforked workers sharing loaded models")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("prefork.py needs os.fork (Linux/macOS); use `uvicorn main:app --workers N` instead")
+        return 2
+
+    started = time.perf_counter()
+    import main as app_module  # loads every model once, in the master
+    load_seconds = time.perf_counter() - started
+
+    # Move everything allocated so far out of the collector's reach: collections
+    # in the workers would otherwise touch (and un-share) these pages
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    master = Master(app_module, sock, max(1, args.workers), args.log_level)
+    print(f"🚀 SCANNON.AI master {os.getpid()}: models loaded in {load_seconds:.1f}s, "
+          f"{master.workers} workers on http://{args.host}:{args.port}")
+    master.report_memory()
+    master.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
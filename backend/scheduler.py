@@ -0,0 +1,174 @@
+"""
+Compute scheduler: priorities, per-client fairness and job cancellation.
+
+All detection work - realtime frames, single images, batch items and each
+frame of a video job - runs through a fixed number of compute slots
+(SCANNON_COMPUTE_SLOTS). When work is queued, the next slot goes to:
+
+  1. the highest priority class: realtime, then image, then video
+  2. within a class, the client that has received the fewest slots so far
+     (so one client's 4K upload cannot starve another client's short clip)
+  3. then first come, first served
+
+Video jobs take a slot per frame, so higher-priority work is never stuck
+behind a whole video. Long jobs register a `Job` whose cancel flag is
+checked at every frame boundary; `cancel()` also wakes a job that is
+waiting for a slot.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+import metrics
+
+PRIORITIES = {"realtime": 0, "image": 1, "video": 2}
+COMPUTE_SLOTS = int(os.getenv("SCANNON_COMPUTE_SLOTS", str(os.cpu_count() or 4)))
+
+SCHEDULER_WAIT = metrics.Histogram("scannon_scheduler_wait_seconds", "Time work waited for a compute slot")
+SCHEDULER_QUEUED = metrics.Gauge("scannon_scheduler_queued", "Work waiting for a compute slot")
+SCHEDULER_RUNNING = metrics.Gauge("scannon_scheduler_running", "Compute slots in use")
+metrics.REGISTRY.extend([SCHEDULER_WAIT, SCHEDULER_QUEUED, SCHEDULER_RUNNING])
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    """A cancellable unit of long-running work (video job, re-render)"""
+
+    def __init__(self, job_id: str, kind: str, client: str, priority: str = "video"):
+        self.job_id = job_id
+        self.kind = kind
+        self.client = client
+        self.priority = priority
+        self.created = time.time()
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def raise_if_cancelled(self):
+        if self._cancelled.is_set():
+            raise JobCancelled(self.job_id)
+
+
+class Scheduler:
+    def __init__(self, slots: int = COMPUTE_SLOTS):
+        self.slots = max(1, slots)
+        self.running = 0
+        self._queue = []  # heap of (priority, client usage, seq, waiter)
+        self._usage: Dict[Tuple[str, str], int] = {}  # slots granted per (priority, client)
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+
+    # Jobs ------------------------------------------------------------------
+
+    def register(self, job: Job) -> Job:
+        self._jobs[job.job_id] = job
+        return job
+
+    def unregister(self, job: Job):
+        if self._jobs.get(job.job_id) is job:
+            del self._jobs[job.job_id]
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Flag a job for cancellation; a job waiting for a slot is woken immediately"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        for entry in self._queue:
+            waiter = entry[3]
+            if waiter["job"] is job and not waiter["future"].done():
+                waiter["future"].set_exception(JobCancelled(job_id))
+        return True
+
+    # Slots -----------------------------------------------------------------
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "video", client: str = "anonymous", job: Optional[Job] = None):
+        """Hold one compute slot for the duration of the block"""
+        if job is not None:
+            job.raise_if_cancelled()
+        await self._acquire(priority, client, job)
+        try:
+            yield
+        finally:
+            self._release(priority)
+
+    async def _acquire(self, priority, client, job):
+        started = time.perf_counter()
+        key = (priority, client)
+        future = asyncio.get_running_loop().create_future()
+        waiter = {"future": future, "key": key, "job": job}
+        heapq.heappush(self._queue, (PRIORITIES[priority], self._usage.get(key, 0), next(self._sequence), waiter))
+        self._dispatch()
+        if not future.done():
+            SCHEDULER_QUEUED.inc(priority=priority)
+            try:
+                await future
+            except BaseException:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    # Granted right as we were cancelled - hand the slot on
+                    self._release(priority)
+                self._remove(waiter)
+                raise
+            finally:
+                SCHEDULER_QUEUED.inc(-1, priority=priority)
+        else:
+            future.result()  # raises JobCancelled if cancelled before the grant
+        SCHEDULER_WAIT.observe(time.perf_counter() - started, priority=priority)
+
+    def _grant(self, key):
+        self.running += 1
+        self._usage[key] = self._usage.get(key, 0) + 1
+        SCHEDULER_RUNNING.inc(priority=key[0])
+
+    def _release(self, priority):
+        self.running -= 1
+        SCHEDULER_RUNNING.inc(-1, priority=priority)
+        self._dispatch()
+
+    def _remove(self, waiter):
+        self._queue = [entry for entry in self._queue if entry[3] is not waiter]
+        heapq.heapify(self._queue)
+
+    def _dispatch(self):
+        while self._queue and self.running < self.slots:
+            _, _, _, waiter = heapq.heappop(self._queue)
+            if waiter["future"].done():
+                continue  # cancelled while queued
+            self._grant(waiter["key"])
+            waiter["future"].set_result(None)
+        if not self._queue and not self.running:
+            # Idle: forget usage so fairness only applies between concurrent clients
+            self._usage.clear()
+
+    def stats(self) -> dict:
+        queued = {}
+        for _, _, _, waiter in self._queue:
+            if not waiter["future"].done():
+                name = waiter["key"][0]
+                queued[name] = queued.get(name, 0) + 1
+        return {
+            "slots": self.slots,
+            "running": self.running,
+            "queued": queued,
+            "jobs": [
+                {"file_id": job.job_id, "type": job.kind, "client": job.client, "cancelled": job.cancelled}
+                for job in self._jobs.values()
+            ],
+        }
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Stateless segment worker for distributed video jobs (see broker.py).
+
+Pulls segment tasks from the broker, runs the process_frame pipeline over
+the task's frame range and writes the encoded segment and its detection
+sidecar next to the job's other segments on shared storage. Start as many
+as the hardware allows, on any node that sees the same upload and jobs
+directories at the same paths:
+
+    SCANNON_BROKER_URL=sqlite:////shared/scannon-broker.db python segment_worker.py
+
+A background thread renews the task lease every SCANNON_WORKER_HEARTBEAT
+seconds; if the task is cancelled or reassigned meanwhile the worker drops it.
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from fractions import Fraction
+from pathlib import Path
+
+import cv2
+
+from broker import BROKER_URL, HEARTBEAT_SECONDS, POLL_SECONDS, open_broker
+from budget import video_budget
+from encoder import open_video_writer
+from framepool import frame_pool, read_frame
+from incremental import IncrementalDetector
+from memprofile import MEMORY_PROFILING, memory_profiler
+from sidecar import SidecarWriter
+
+
+class SegmentWorker:
+    def __init__(self, broker, worker_id: str):
+        self.broker = broker
+        self.worker_id = worker_id
+        self.task = None
+        self.frames = 0
+        self.lost = threading.Event()  # current task cancelled or reassigned
+        self.stopping = threading.Event()
+        self.memory = None
+        self._pipeline = None
+
+    @property
+    def pipeline(self):
+        # Imported lazily: loading main loads the models
+        if self._pipeline is None:
+            import main
+            self._pipeline = main
+        return self._pipeline
+
+    def _heartbeat(self):
+        while not self.stopping.wait(HEARTBEAT_SECONDS):
+            task = self.task
+            try:
+                owned = self.broker.heartbeat(self.worker_id, task["task_id"] if task else None, self.frames)
+            except Exception as e:
+                print(f"⚠️ Heartbeat failed: {e}")
+                continue
+            if task is not None and not owned and self.task is task:
+                self.lost.set()
+
+    def run(self, once: bool = False):
+        self.broker.register_worker(self.worker_id, socket.gethostname(), os.getpid())
+        heartbeat = threading.Thread(target=self._heartbeat, name="scannon-heartbeat", daemon=True)
+        heartbeat.start()
+        print(f"👷 Segment worker {self.worker_id} waiting for tasks")
+        try:
+            while not self.stopping.is_set():
+                task = self.broker.claim(self.worker_id)
+                if task is None:
+                    if once:
+                        break
+                    self.stopping.wait(POLL_SECONDS)
+                    continue
+                self.run_task(task)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stopping.set()
+            self.broker.unregister_worker(self.worker_id)
+
+    def run_task(self, task: dict):
+        self.task, self.frames = task, 0
+        self.lost.clear()
+        label = f"{task['job_id']} segment {task['segment']}"
+        print(f"🎬 {label}: frames {task['start_frame']}-{task['end_frame'] or 'end'} (attempt {task['attempts']})")
+        started = time.perf_counter()
+        self.memory = memory_profiler.track(label, "segment")
+        try:
+            outcome = self._process(task)
+            if outcome is None:
+                print(f"↩️ {label}: dropped (cancelled or reassigned)")
+                return
+            frames, segment_file, sidecar_file, encoder_backend, stats = outcome
+            if not self.broker.complete(self.worker_id, task["task_id"], frames, segment_file, sidecar_file,
+                                        encoder_backend, stats):
+                print(f"↩️ {label}: finished after the task was taken away")
+                return
+            elapsed = time.perf_counter() - started
+            print(f"✅ {label}: {frames} frames in {elapsed:.1f}s ({frames / elapsed if elapsed else 0:.1f} fps)")
+        except Exception as e:
+            print(f"❌ {label}: {e}")
+            self.broker.fail(self.worker_id, task["task_id"], str(e))
+        finally:
+            memory = memory_profiler.finish(self.memory)
+            if memory is not None:
+                print(f"🧠 {label}: peak RSS {memory['rss_peak_mb']} MB (+{memory['rss_growth_mb']} MB), "
+                      f"traced +{memory.get('traced_peak_growth_mb', '-')} MB, top growth {memory.get('top_growth', [])[:3]}")
+            self.memory = None
+            self.task = None
+
+    def _process(self, task: dict):
+        """Encode the task's frame range. Returns None when the task was lost midway"""
+        pipeline = self.pipeline
+        options = dict(task["options"])
+        changes = IncrementalDetector() if options.pop("incremental", False) else None
+        segment_dir = Path(task["segment_dir"])
+        segment_dir.mkdir(parents=True, exist_ok=True)
+        # Per-worker names: a slow worker whose task was reassigned cannot clobber the new owner's file
+        stem = f"segment_{task['segment']:05d}.{self.worker_id}"
+
+        cap = cv2.VideoCapture(task["input_path"])
+        if not cap.isOpened():
+            raise RuntimeError(f"Could not open {task['input_path']}")
+        out = None
+        try:
+            frame_index = task["start_frame"]
+            if frame_index:
+                pipeline.seek_capture(cap, frame_index)
+            out, segment_file, encoder_backend = open_video_writer(
+                str(segment_dir / f"{stem}.mp4"), Fraction(task["fps"]), (task["width"], task["height"])
+            )
+            sidecar = SidecarWriter()
+            regions = []
+            stats = {}
+            budget = video_budget()
+            end = task["end_frame"]
+            while end is None or frame_index < end:
+                if self.lost.is_set():
+                    getattr(out, "abort", out.release)()
+                    out = None
+                    Path(segment_file).unlink(missing_ok=True)
+                    return None
+                frame_started = time.perf_counter()
+                frame = read_frame(cap, (task["height"], task["width"], 3))
+                if frame is None:
+                    break
+                try:
+                    processed, frame_stats = pipeline.process_frame(frame, regions_out=regions, budget=budget,
+                                                                    incremental=changes, **options)
+                    sidecar.add(frame_index, regions)
+                    regions.clear()
+                    out.write(processed)
+                finally:
+                    frame_pool.release(frame)
+                if budget is not None:
+                    budget.end_frame(time.perf_counter() - frame_started)
+                for key, value in frame_stats.items():
+                    stats[key] = stats.get(key, 0) + value
+                frame_index += 1
+                self.frames += 1
+                if self.memory is not None:
+                    self.memory.sample()
+
+            out.release()
+            if getattr(out, "error", None):
+                raise RuntimeError(out.error)
+            out = None
+            if self.frames == 0:
+                # Header frame count was too high: nothing left for this segment
+                Path(segment_file).unlink(missing_ok=True)
+                return 0, None, None, encoder_backend, stats
+            sidecar_file = str(segment_dir / f"{stem}.npz")
+            sidecar.save(sidecar_file, {"segment": task["segment"]})
+            return self.frames, segment_file, sidecar_file, encoder_backend, stats
+        finally:
+            cap.release()
+            if out is not None:
+                getattr(out, "abort", out.release)()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SCANNON.AI distributed segment worker")
+    parser.add_argument("--broker", default=BROKER_URL, help="broker URL (default: SCANNON_BROKER_URL)")
+    parser.add_argument("--worker-id", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    if MEMORY_PROFILING not in ("", "0"):
+        memory_profiler.enable(MEMORY_PROFILING)
+    broker = open_broker(args.broker)
+    if broker is None:
+        print("❌ No broker configured: set SCANNON_BROKER_URL or pass --broker sqlite:///path/to/broker.db")
+        return 2
+    SegmentWorker(broker, args.worker_id).run(once=args.once)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Detection sidecars: the per-frame blur regions of a job, saved next to it.
+
+A sidecar lets a job be re-rendered with a different blur style, padding or
+region filter without running any detector again. It is a compressed NumPy
+archive holding only frames that have regions:
+
+    frame_index  int32[F]     frame numbers with at least one region
+    offsets      int64[F + 1] boxes of frame_index[i] are boxes[offsets[i]:offsets[i + 1]]
+    boxes        int32[N, 4]  (x, y, w, h) before merging
+    labels       uint8[N]     index into LABELS
+    meta         str          JSON: source file, type, size, fps, frame count, options
+"""
+import json
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Region categories, in label-code order
+LABELS = ('faces', 'documents', 'plates', 'screens', 'text')
+LABEL_CODES = {name: code for code, name in enumerate(LABELS)}
+
+
+class SidecarWriter:
+    """Accumulates labelled regions frame by frame, then saves them as .npz"""
+
+    def __init__(self):
+        self._frames: List[int] = []
+        self._counts: List[int] = []
+        self._boxes: List[Tuple[int, int, int, int]] = []
+        self._labels: List[int] = []
+
+    def add(self, frame_index: int, regions: Iterable[Tuple[int, int, int, int, str]]):
+        count = 0
+        for x, y, w, h, label in regions:
+            self._boxes.append((x, y, w, h))
+            self._labels.append(LABEL_CODES[label])
+            count += 1
+        if count:
+            self._frames.append(frame_index)
+            self._counts.append(count)
+
+    def extend(self, sidecar: "Sidecar"):
+        """Append every frame of a saved sidecar (e.g. one segment of a checkpointed job)"""
+        for position, frame in enumerate(sidecar.frame_index):
+            start, end = sidecar.offsets[position], sidecar.offsets[position + 1]
+            self._frames.append(int(frame))
+            self._counts.append(int(end - start))
+            self._boxes.extend(tuple(int(v) for v in box) for box in sidecar.boxes[start:end])
+            self._labels.extend(int(code) for code in sidecar.labels[start:end])
+
+    def save(self, path: str, meta: dict):
+        offsets = np.zeros(len(self._counts) + 1, dtype=np.int64)
+        np.cumsum(self._counts, out=offsets[1:])
+        boxes = np.asarray(self._boxes, dtype=np.int32).reshape(-1, 4)
+        # np.savez appends .npz unless the path already ends with it
+        np.savez_compressed(
+            path,
+            frame_index=np.asarray(self._frames, dtype=np.int32),
+            offsets=offsets,
+            boxes=boxes,
+            labels=np.asarray(self._labels, dtype=np.uint8),
+            meta=np.array(json.dumps(meta)),
+        )
+
+
+class Sidecar:
+    """Read-only view of a saved sidecar"""
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            self.frame_index = data["frame_index"]
+            self.offsets = data["offsets"]
+            self.boxes = data["boxes"]
+            self.labels = data["labels"]
+            self.meta = json.loads(str(data["meta"]))
+        self._positions = {int(frame): i for i, frame in enumerate(self.frame_index)}
+
+    @property
+    def region_count(self) -> int:
+        return len(self.boxes)
+
+    def regions_for(self, frame_index: int, categories: Optional[Sequence[str]] = None):
+        """
+        Boxes of one frame as a list of (x, y, w, h), optionally restricted to
+        some categories (e.g. ['faces', 'plates'])
+        """
+        position = self._positions.get(frame_index)
+        if position is None:
+            return []
+        start, end = self.offsets[position], self.offsets[position + 1]
+        boxes = self.boxes[start:end]
+        if categories is not None:
+            codes = [LABEL_CODES[c] for c in categories]
+            boxes = boxes[np.isin(self.labels[start:end], codes)]
+        return [tuple(int(v) for v in box) for box in boxes]
@@ -0,0 +1,294 @@
+"""
+Disk quota management for uploads, processed files, sidecars and job directories.
+
+StorageManager scans the managed directories with os.scandir, deletes files
+older than the retention period and, while total usage is above the quota,
+evicts the least recently used files first. Files that belong to running
+jobs are registered with `protect()` and are never touched. With a `shared`
+registry (jobstate.JobStateStore) the protected set is published for the
+other worker processes, and files they protect are left alone too: the
+janitor runs in one worker only. The janitor loop runs every scan/eviction
+in a worker thread so the event loop never blocks.
+
+In unit directories (jobs/<file_id>/ checkpoints and segments, chunked
+upload sessions) every
+subdirectory is one entry: its size is the total of the files below it, it
+is as recent as its newest file and it is deleted as a whole. Each unit
+directory can come with an `in_use(path)` check for owners that live in
+other processes (a job's lease, a broker job).
+
+Data that is about to be written can be admitted with `reserve()`: it counts
+against the quota until the next scan sees it on disk, and least recently
+used files are evicted to make room for it. `housekeeping` callables (e.g.
+expiring stale upload sessions) run at the start of every janitor pass.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from logs import log_event, logger
+
+STORAGE_QUOTA_MB = int(os.getenv("SCANNON_STORAGE_QUOTA_MB", "10240"))
+RETENTION_HOURS = float(os.getenv("RETENTION_HOURS", "24"))
+JANITOR_INTERVAL_SECONDS = int(os.getenv("SCANNON_JANITOR_INTERVAL", "300"))
+
+
+class StorageManager:
+    def __init__(self, directories: Iterable[Path], quota_bytes: int, max_age_seconds: float,
+                 unit_directories: Optional[Dict[Path, Optional[Callable[[str], bool]]]] = None,
+                 housekeeping: Iterable[Callable[[], object]] = (), shared=None):
+        """`shared`: registry with set_protected(paths) and is_protected(path)"""
+        self.directories = [Path(d) for d in directories]
+        self.unit_directories = {Path(d): in_use for d, in_use in (unit_directories or {}).items()}
+        self.housekeeping = list(housekeeping)
+        self.shared = shared
+        self._reserved = 0  # admitted with reserve() since the last scan
+        self.quota_bytes = quota_bytes
+        self.max_age_seconds = max_age_seconds
+        self._active: Dict[str, int] = {}
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._usage = {"scanned_at": None, "directories": {}, "total_bytes": 0, "total_files": 0}
+        self._deleted_files = 0
+        self._deleted_bytes = 0
+
+    # Active job protection -------------------------------------------------
+
+    def protect(self, *paths):
+        """Mark files as in use by a running job (reference counted)"""
+        with self._lock:
+            for path in paths:
+                key = os.path.abspath(path)
+                self._active[key] = self._active.get(key, 0) + 1
+        self._publish()
+
+    def release(self, *paths):
+        with self._lock:
+            for path in paths:
+                key = os.path.abspath(path)
+                count = self._active.get(key, 0) - 1
+                if count > 0:
+                    self._active[key] = count
+                else:
+                    self._active.pop(key, None)
+        self._publish()
+
+    def _publish(self):
+        if self.shared is None:
+            return
+        with self._lock:
+            paths = list(self._active)
+        try:
+            self.shared.set_protected(paths)
+        except Exception as e:
+            logger.warning(f"Could not publish the protected files: {e}")
+
+    def is_active(self, path) -> bool:
+        """In use by a running job of this or (with `shared`) another process. May block on `shared`"""
+        key = os.path.abspath(path)
+        if key in self._active:
+            return True
+        return self.shared is not None and self.shared.is_protected(key)
+
+    def touch(self, path):
+        """Record an access (downloads) - atime is unreliable on noatime mounts"""
+        self._last_access[os.path.abspath(path)] = time.time()
+
+    # Scanning / eviction ---------------------------------------------------
+
+    @staticmethod
+    def _tree(path: str):
+        """(files, bytes, newest mtime) of everything below `path`"""
+        files = size = 0
+        newest = os.stat(path, follow_symlinks=False).st_mtime
+        for root, _, names in os.walk(path):
+            for name in names:
+                try:
+                    stat = os.stat(os.path.join(root, name), follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                files += 1
+                size += stat.st_size
+                newest = max(newest, stat.st_mtime)
+        return files, size, newest
+
+    def _scan(self) -> List[dict]:
+        entries = []
+        directories = {}
+        for directory in self.directories:
+            files = size = 0
+            if directory.exists():
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                        path = os.path.abspath(entry.path)
+                        last_used = max(stat.st_mtime, stat.st_atime, self._last_access.get(path, 0))
+                        entries.append({"path": path, "size": stat.st_size,
+                                        "mtime": stat.st_mtime, "last_used": last_used})
+                        files += 1
+                        size += stat.st_size
+            directories[str(directory)] = {"files": files, "bytes": size}
+        for directory, in_use in self.unit_directories.items():
+            files = size = units = 0
+            if directory.exists():
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if not entry.is_dir(follow_symlinks=False):
+                            continue
+                        path = os.path.abspath(entry.path)
+                        try:
+                            unit_files, unit_size, mtime = self._tree(path)
+                        except FileNotFoundError:
+                            continue  # finished meanwhile
+                        entries.append({"path": path, "size": unit_size, "files": unit_files, "mtime": mtime,
+                                        "last_used": max(mtime, self._last_access.get(path, 0)),
+                                        "tree": True, "in_use": in_use})
+                        units += 1
+                        files += unit_files
+                        size += unit_size
+            directories[str(directory)] = {"files": files, "bytes": size, "units": units}
+
+        with self._lock:
+            self._reserved = 0
+        self._usage = {
+            "scanned_at": time.time(),
+            "directories": directories,
+            "total_bytes": sum(d["bytes"] for d in directories.values()),
+            "total_files": sum(d["files"] for d in directories.values()),
+        }
+        return entries
+
+    def _delete(self, entry) -> bool:
+        in_use = entry.get("in_use")
+        try:
+            if in_use is not None and in_use(entry["path"]):
+                return False
+        except Exception as e:
+            logger.warning(f"Could not tell whether {entry['path']} is in use, keeping it: {e}")
+            return False
+        try:
+            if self.shared is not None and self.shared.is_protected(entry["path"]):
+                return False
+        except Exception as e:
+            logger.warning(f"Could not tell whether {entry['path']} is protected elsewhere, keeping it: {e}")
+            return False
+        with self._lock:
+            if entry["path"] in self._active:
+                return False
+            try:
+                if entry.get("tree"):
+                    shutil.rmtree(entry["path"])
+                else:
+                    os.unlink(entry["path"])
+            except FileNotFoundError:
+                return True
+            except OSError as e:
+                logger.warning(f"Could not delete {entry['path']}: {e}")
+                return False
+        self._last_access.pop(entry["path"], None)
+        self._deleted_files += entry.get("files", 1)
+        self._deleted_bytes += entry["size"]
+        return True
+
+    def enforce(self, headroom: int = 0) -> dict:
+        """
+        Delete expired files, then LRU-evict until under quota (with `headroom`
+        bytes to spare). Blocking - run off the event loop
+        """
+        started = time.perf_counter()
+        for task in self.housekeeping:
+            try:
+                task()
+            except Exception as e:
+                logger.exception(f"Storage housekeeping failed: {e}")
+        entries = self._scan()
+        now = time.time()
+        expired = evicted = freed = 0
+
+        remaining = []
+        for entry in entries:
+            if self.max_age_seconds and now - entry["mtime"] > self.max_age_seconds and self._delete(entry):
+                expired += 1
+                freed += entry["size"]
+            else:
+                remaining.append(entry)
+
+        total = sum(e["size"] for e in remaining)
+        if self.quota_bytes and total + headroom > self.quota_bytes:
+            for entry in sorted(remaining, key=lambda e: e["last_used"]):
+                if total + headroom <= self.quota_bytes:
+                    break
+                if self._delete(entry):
+                    evicted += 1
+                    freed += entry["size"]
+                    total -= entry["size"]
+
+        if expired or evicted:
+            self._scan()
+        result = {"expired": expired, "evicted": evicted, "freed_bytes": freed,
+                  "seconds": round(time.perf_counter() - started, 3)}
+        if expired or evicted:
+            log_event(logger, logging.INFO, "storage_janitor", **result,
+                      total_bytes=self._usage["total_bytes"], quota_bytes=self.quota_bytes)
+        return result
+
+    def reserve(self, nbytes: int) -> bool:
+        """
+        Admit `nbytes` of data about to be written, evicting least recently used
+        files if that is what it takes. False if it does not fit. Blocking
+        """
+        if not self.quota_bytes:
+            return True
+        if self._usage["scanned_at"] is None:
+            self._scan()
+        for attempt in range(2):
+            with self._lock:
+                if self._usage["total_bytes"] + self._reserved + nbytes <= self.quota_bytes:
+                    self._reserved += nbytes
+                    return True
+            if attempt == 0:
+                self.enforce(headroom=nbytes)
+        return False
+
+    def clear(self) -> dict:
+        """Delete every file that is not in use by a running job. Blocking"""
+        deleted = skipped = 0
+        for entry in self._scan():
+            if self._delete(entry):
+                deleted += 1
+            else:
+                skipped += 1
+        self._scan()
+        return {"deleted": deleted, "skipped_active": skipped}
+
+    def usage(self) -> dict:
+        """Last scanned usage (no filesystem access)"""
+        usage = dict(self._usage)
+        usage.update(
+            quota_bytes=self.quota_bytes,
+            quota_used=round(usage["total_bytes"] / self.quota_bytes, 4) if self.quota_bytes else None,
+            reserved_bytes=self._reserved,
+            retention_hours=round(self.max_age_seconds / 3600, 2) if self.max_age_seconds else None,
+            active_files=len(self._active),
+            deleted_files=self._deleted_files,
+            deleted_bytes=self._deleted_bytes,
+        )
+        return usage
+
+    async def run_janitor(self, interval: float = JANITOR_INTERVAL_SECONDS):
+        """Background task: enforce quotas every `interval` seconds in a worker thread"""
+        while True:
+            try:
+                await asyncio.to_thread(self.enforce)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Storage janitor failed: {e}")
+            await asyncio.sleep(interval)
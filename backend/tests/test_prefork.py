@@ -0,0 +1,180 @@
+"""
+Requests about one job can reach any prefork worker, so job status, cancel
+requests and protected files are shared between workers (jobstate.py).
+These tests ask every worker the master starts about the same job.
+
+    cd backend && python -m pytest tests
+"""
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork.py needs os.fork")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def request(port: int, method: str, path: str, body: bytes = None, headers: dict = None):
+    """One request on a fresh connection (a new connection may be accepted by any worker)"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        conn.close()
+
+
+def worker_and_progress(port: int, file_id: str):
+    """Worker index and that worker's progress for `file_id`, over one keep-alive connection"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request("GET", "/api/health")
+        worker = json.loads(conn.getresponse().read())["process"]["worker"]
+        conn.request("GET", f"/api/progress/{file_id}")
+        return worker, json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def on_worker(port: int, wanted, method: str, path: str, attempts: int = 200):
+    """(worker, status, payload) of a request served by a worker `wanted(worker, health)` accepts"""
+    for _ in range(attempts):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        try:
+            conn.request("GET", "/api/health")
+            health = json.loads(conn.getresponse().read())
+            worker = health["process"]["worker"]
+            if not wanted(worker, health):
+                continue
+            conn.request(method, path)
+            response = conn.getresponse()
+            return worker, response.status, json.loads(response.read() or b"null")
+        finally:
+            conn.close()
+    pytest.fail("no worker accepted the request")
+
+
+def upload(port: int, filename: str, content_type: str, data: bytes) -> str:
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: {content_type}\r\n\r\n").encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    status, payload = request(port, "POST", "/api/upload", body,
+                              {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert status == 200, payload
+    return payload["file_id"]
+
+
+def upload_image(port: int) -> str:
+    frame = np.full((240, 320, 3), 127, dtype=np.uint8)
+    return upload(port, "probe.jpg", "image/jpeg", cv2.imencode(".jpg", frame)[1].tobytes())
+
+
+def upload_video(port: int, tmp_path: Path, frames: int = 100) -> str:
+    path = tmp_path / "probe.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 25, (160, 120))
+    for index in range(frames):
+        writer.write(np.full((120, 160, 3), index % 255, dtype=np.uint8))
+    writer.release()
+    return upload(port, "probe.avi", "video/x-msvideo", path.read_bytes())
+
+
+@pytest.fixture
+def spawn_prefork(tmp_path):
+    processes = []
+
+    def spawn(workers=None, **settings):
+        port = free_port()
+        env = dict(os.environ, PYTHONPATH=str(BACKEND_DIR), SCANNON_STUB_DETECTORS="1",
+                   SCANNON_MEMORY_REPORT_INTERVAL="0", **settings)
+        env.pop("SCANNON_WORKERS", None)
+        env.pop("SCANNON_BROKER_URL", None)
+        args = [sys.executable, str(BACKEND_DIR / "prefork.py"), "--host", "127.0.0.1", "--port", str(port),
+                "--log-level", "warning"]
+        if workers is not None:
+            args += ["--workers", str(workers)]
+        process = subprocess.Popen(args, cwd=tmp_path, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        processes.append(process)
+        deadline = time.time() + 120
+        while True:
+            assert process.poll() is None, "prefork.py exited during startup"
+            try:
+                _, health = request(port, "GET", "/api/health")
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.5)
+        return port
+
+    yield spawn
+    for process in processes:
+        process.terminate()
+        try:
+            process.wait(timeout=45)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def poll_every_worker(port: int, file_id: str, workers: int, timeout: float = 60) -> dict:
+    """Progress for `file_id` as seen by each worker index"""
+    seen = {}
+    deadline = time.time() + timeout
+    while len(seen) < workers:
+        assert time.time() < deadline, f"only workers {sorted(seen)} answered"
+        worker, progress = worker_and_progress(port, file_id)
+        seen.setdefault(worker, progress)
+    return seen
+
+
+def test_default_launcher_answers_progress_from_every_worker(spawn_prefork):
+    port = spawn_prefork()
+    file_id = upload_image(port)
+
+    seen = poll_every_worker(port, file_id, workers=2)
+    assert {worker: progress["status"] for worker, progress in seen.items()} == {"0": "completed", "1": "completed"}
+    for worker in ("0", "1"):
+        _, status, payload = on_worker(port, lambda w, _: w == worker, "GET", f"/api/status/{file_id}")
+        assert status == 200 and payload["ready"], (worker, payload)
+
+
+def test_job_is_cancelled_through_another_worker(spawn_prefork, tmp_path):
+    port = spawn_prefork(workers=2, SCANNON_STUB_DETECTOR_MS="50")
+    file_id = upload_video(port, tmp_path)
+
+    def running_elsewhere(worker, health):
+        return file_id not in {job["file_id"] for job in health["scheduler"]["jobs"]}
+
+    # Wait until the job runs, then cancel it on the worker that does not run it
+    deadline = time.time() + 60
+    while request(port, "GET", f"/api/progress/{file_id}")[1]["status"] != "processing":
+        assert time.time() < deadline, "video job did not start"
+        time.sleep(0.2)
+    worker, status, payload = on_worker(port, running_elsewhere, "DELETE", f"/api/jobs/{file_id}")
+    assert status == 200 and payload["status"] == "cancelling", (worker, payload)
+
+    deadline = time.time() + 30
+    while True:
+        progress = request(port, "GET", f"/api/progress/{file_id}")[1]
+        if progress["status"] != "processing":
+            break
+        assert time.time() < deadline, progress
+        time.sleep(0.2)
+    assert progress["status"] == "cancelled", progress
@@ -0,0 +1,97 @@
+"""
+Tiled multi-scale detection for high-resolution frames.
+
+Detectors downscale their input (MediaPipe face detection works on a
+192x192 view, YOLO on 640x640), so on a 4K group photo small faces shrink
+below what the model can see. Instead of upscaling, the frame is cut into
+overlapping tiles of roughly the detector's input size. Each tile is run
+through the detector in parallel, together with one full-frame pass for
+objects larger than a tile. The boxes are shifted back to frame
+coordinates and duplicates from overlapping tiles are dropped.
+
+Tiles are views into the frame (no copies). The overlap must be larger
+than the objects to catch: anything cut by one tile border is whole in a
+neighbouring tile.
+"""
+import os
+from concurrent.futures import Executor
+from typing import Callable, List, Sequence, Tuple
+
+TILE_MODE = os.getenv("SCANNON_TILE_MODE", "images")  # off | images | all
+TILE_SIZE = int(os.getenv("SCANNON_TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.getenv("SCANNON_TILE_OVERLAP", "0.25"))
+TILE_MIN_SIDE = int(os.getenv("SCANNON_TILE_MIN_SIDE", "1600"))  # frames with a longer side are tiled
+TILE_WORKERS = int(os.getenv("SCANNON_TILE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+Box = Tuple[int, int, int, int]
+
+
+def should_tile(frame, source: str, mode: str = TILE_MODE, min_side: int = TILE_MIN_SIDE) -> bool:
+    if mode == "off":
+        return False
+    if mode == "images" and source not in ("image", "batch"):
+        return False
+    return max(frame.shape[:2]) > min_side
+
+
+def _starts(length: int, tile: int, stride: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    starts.append(length - tile)
+    return starts
+
+
+def tile_grid(width: int, height: int, tile_size: int = TILE_SIZE, overlap: float = TILE_OVERLAP) -> List[Box]:
+    """Overlapping (x, y, w, h) tiles covering the frame, edge tiles flush with the border"""
+    stride = max(1, int(tile_size * (1 - overlap)))
+    return [
+        (x, y, min(tile_size, width), min(tile_size, height))
+        for y in _starts(height, tile_size, stride)
+        for x in _starts(width, tile_size, stride)
+    ]
+
+
+def run_tiled(frame, detect: Callable, executor: Executor, tile_size: int = TILE_SIZE,
+              overlap: float = TILE_OVERLAP, full_frame: bool = True):
+    """
+    Run `detect(view)` on every tile (and the whole frame when `full_frame`)
+    in parallel. Returns [(offset_x, offset_y, result), ...]
+    """
+    height, width = frame.shape[:2]
+    tiles = tile_grid(width, height, tile_size, overlap)
+    if full_frame and tiles != [(0, 0, width, height)]:
+        tiles.append((0, 0, width, height))
+    futures = [(x, y, executor.submit(detect, frame[y:y + h, x:x + w])) for x, y, w, h in tiles]
+    return [(x, y, future.result()) for x, y, future in futures]
+
+
+def offset_box(box: Box, dx: int, dy: int) -> Box:
+    x, y, w, h = box
+    return (x + dx, y + dy, w, h)
+
+
+def dedupe_boxes(items: Sequence, box: Callable = lambda item: item, containment: float = 0.6) -> list:
+    """
+    Drop detections that are mostly inside a larger one (the same object seen
+    by two tiles, or cut in half by a tile border). Largest boxes win.
+    """
+    def area(b):
+        return b[2] * b[3]
+
+    kept = []
+    for item in sorted(items, key=lambda i: area(box(i)), reverse=True):
+        x, y, w, h = box(item)
+        if w <= 0 or h <= 0:
+            continue
+        duplicate = False
+        for other in kept:
+            ox, oy, ow, oh = box(other)
+            ix = min(x + w, ox + ow) - max(x, ox)
+            iy = min(y + h, oy + oh) - max(y, oy)
+            if ix > 0 and iy > 0 and ix * iy >= containment * w * h:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(item)
+    return kept
@@ -0,0 +1,63 @@
+"""
+Streaming ZIP writer.
+
+zipfile.ZipFile can write to a non-seekable stream (it then emits data
+descriptors after each member), so we give it a write-only buffer and hand
+out whatever has been written after every member. The archive is produced
+incrementally and never held fully in memory.
+"""
+import io
+import time
+import zipfile
+
+
+class _DrainableBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink whose contents can be drained as bytes"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """
+    Incremental ZIP archive:
+        stream = ZipStream()
+        yield stream.add("a.jpg", data)
+        yield stream.close()
+    Each call returns the bytes produced so far.
+    """
+
+    def __init__(self, compression=zipfile.ZIP_STORED):
+        self._buffer = _DrainableBuffer()
+        self._zip = zipfile.ZipFile(self._buffer, mode="w", compression=compression, allowZip64=True)
+
+    def add(self, name: str, data: bytes, compression=None) -> bytes:
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = self._zip.compression if compression is None else compression
+        self._zip.writestr(info, data)
+        return self._buffer.drain()
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._buffer.drain()
@@ -147,10 +147,67 @@ class ScannonManager:
         
         return success
     
-    def run_tests(self):
-        """Run tests for the application"""
-        self.print_header("Running Tests")
-        self.print_info("No tests configured yet")
+    def get_backend_python(self):
+        """Python interpreter of the backend venv, or the current one if not set up"""
+        if sys.platform == "win32":
+            python_exe = self.backend_dir / "venv" / "Scripts" / "python.exe"
+        else:
+            python_exe = self.backend_dir / "venv" / "bin" / "python"
+        return str(python_exe) if python_exe.exists() else sys.executable
+    
+    def run_tests(self, extra_args=None):
+        """Run the benchmark suite and flag performance regressions"""
+        self.print_header("Running Benchmarks")
+        
+        self.print_info("Timing detectors and pipelines on synthetic media...")
+        result = subprocess.run(
+            [self.get_backend_python(), "-m", "benchmarks", *(extra_args or [])],
+            cwd=self.backend_dir
+        )
+        
+        if result.returncode == 0:
+            self.print_success("Benchmarks passed - no performance regressions")
+        else:
+            self.print_error("Benchmarks flagged performance regressions!")
+        return result.returncode == 0
+    
+    def load_test(self, extra_args=None):
+        """Put the API under concurrent upload, polling and realtime load"""
+        self.print_header("Load Test")
+        
+        self.print_info("Replaying image uploads, video jobs and realtime sessions...")
+        result = subprocess.run(
+            [self.get_backend_python(), "-m", "benchmarks.loadtest", *(extra_args or ["--spawn"])],
+            cwd=self.backend_dir
+        )
+        
+        if result.returncode == 0:
+            self.print_success("Load test completed!")
+        else:
+            self.print_error("Load test failed!")
+        return result.returncode == 0
+    
+    def redact(self, input_dir, output_dir, extra_args=None):
+        """Redact a directory of images/videos offline, in parallel and resumable"""
+        self.print_header("Batch Redaction")
+        
+        input_path = Path(input_dir).resolve()
+        output_path = Path(output_dir).resolve()
+        if not input_path.is_dir():
+            self.print_error(f"Input directory not found: {input_path}")
+            return False
+        
+        self.print_info(f"Redacting {input_path} -> {output_path}")
+        result = subprocess.run(
+            [self.get_backend_python(), "batch_redact.py", str(input_path), str(output_path), *(extra_args or [])],
+            cwd=self.backend_dir
+        )
+        
+        if result.returncode == 0:
+            self.print_success("Batch redaction completed!")
+        else:
+            self.print_error("Batch redaction finished with errors (re-run to resume)")
+        return result.returncode == 0
     
     def show_status(self):
         """Show the current status of the project"""
@@ -181,11 +238,16 @@ def main():
     parser.add_argument(
         'command',
         choices=['setup', 'setup-backend', 'setup-frontend', 'start-backend', 
-                 'start-frontend', 'build', 'test', 'status'],
+                 'start-frontend', 'build', 'test', 'loadtest', 'status', 'redact'],
         help='Command to execute'
     )
+    parser.add_argument(
+        'paths',
+        nargs='*',
+        help='redact: <input_dir> <output_dir>'
+    )
     
-    args = parser.parse_args()
+    args, extra_args = parser.parse_known_args()
     manager = ScannonManager()
     
     try:
@@ -203,9 +265,21 @@ def main():
         elif args.command == 'build':
             manager.build_frontend()
         elif args.command == 'test':
-            manager.run_tests()
+            # Extra flags are passed through to the benchmark suite (e.g. --quick, --save-baseline)
+            if not manager.run_tests(extra_args):
+                sys.exit(1)
+        elif args.command == 'loadtest':
+            # Extra flags are passed through to benchmarks/loadtest.py (default: --spawn)
+            if not manager.load_test(extra_args):
+                sys.exit(1)
         elif args.command == 'status':
             manager.show_status()
+        elif args.command == 'redact':
+            if len(args.paths) != 2:
+                parser.error("redact requires <input_dir> <output_dir>")
+            # Extra flags are passed through to batch_redact.py (e.g. --workers 4 --blur-type pixelate)
+            if not manager.redact(args.paths[0], args.paths[1], extra_args):
+                sys.exit(1)
     except KeyboardInterrupt:
         print(f"\n{Colors.WARNING}Operation cancelled by user{Colors.ENDC}")
         sys.exit(0)